@@ -0,0 +1,45 @@
+# bench_cell6.py -- Benchmark de cell6.build_batches sobre carteras de pedidos sintéticas grandes
+# Uso: python bench_cell6.py [n_sitios ...]   (por defecto 1000 10000 100000)
+import io
+import sys
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+
+import cell6
+
+
+def order_book(n_sites, n_plants=4, n_days=5, seed=0):
+    """Pedidos de n_sites obras repartidas en plantas y días, con las columnas de construction_sites.csv."""
+    rng = np.random.default_rng(seed)
+    plant = rng.integers(1, n_plants + 1, n_sites)
+    day = rng.integers(1, n_days + 1, n_sites)
+    start_h = rng.integers(7, 16, n_sites)
+    return pd.DataFrame({
+        "site_id": [f"pl{p}_d{d}_s{i}" for i, (p, d) in enumerate(zip(plant, day))],
+        "demand_m3": rng.choice([4, 7, 9, 11, 16, 23, 31, 45], n_sites) + rng.integers(0, 3, n_sites) * 0.5,
+        "tw_start_h": [f"{h}:00" for h in start_h],
+        "tw_end_h": [f"{h + 1}:00" for h in start_h],
+        "concrete_type": rng.choice(["p1", "p3", "p5", "p6", "p8"], n_sites),
+        "dist_km": rng.integers(5, 40, n_sites),
+        "travel_time_min": rng.integers(10, 45, n_sites),
+    })
+
+
+def main(sizes):
+    df_trucks = pd.read_csv("trucks.csv")
+    print(f"{'sitios':>8} {'lotes':>9} {'fusionados':>10} {'segundos':>9}")
+    for n_sites in sizes:
+        df_sites = order_book(n_sites)
+        start = time.time()
+        # Los mensajes por lote de cell6 no cuentan en la medición
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            df_batches, _ = cell6.build_batches(df_sites, df_trucks.copy())
+        elapsed = time.time() - start
+        n_merged = sum(1 for line in log.getvalue().splitlines() if line.startswith("('"))
+        print(f"{n_sites:>8} {len(df_batches):>9} {n_merged:>10} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
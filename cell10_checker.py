@@ -4,6 +4,8 @@
 import data
 import pandas as pd
 
+from cell5 import batch_view
+
 
 # ================================================================
 # Utilidades robustas
@@ -18,34 +20,6 @@ def safe_val(v):
         return 0.0
 
 
-def time_to_minutes(x):
-    """
-    Convierte:
-    - '9:00'  -> 540
-    - '14:30' -> 870
-    - '8'     -> 480 (asume 8 horas)
-    - 8.0     -> 480
-    - 480     -> 480 (ya está en minutos)
-    - 480.0   -> 480
-    """
-    if isinstance(x, (int, float)):
-        return int(float(x) * 60) if float(x) < 60 else int(x)
-
-    x = str(x).strip()
-
-    if ":" in x:
-        h, m = x.split(":")
-        return int(h) * 60 + int(m)
-
-    # Caso: valor numérico expresado como texto
-    try:
-        val = float(x)
-        return int(val * 60) if val < 60 else int(val)
-    except ValueError:
-        print(f"ADVERTENCIA: No se pudo convertir a tiempo: {x}")
-        return 0
-
-
 # ================================================================
 # CHECKER PRINCIPAL
 # ================================================================
@@ -61,7 +35,7 @@ def run():
     # Variables externas
     X, Y, T_tard, V_used = {}, {}, {}, {}
     units_list, batches, trucks = [], [], []
-    site_map, params = {}, {}
+    params = {}
 
     # 2. Recuperación de datos
     try:
@@ -73,18 +47,26 @@ def run():
         units_list = data.shared['units_list']
         batches = data.shared['batches_list']
         trucks = data.shared['trucks_list']
-        site_map = data.shared['site_map']
         params = data.shared['params']
+        # Viaje, fin de ventana y setting time por lote: instancia normalizada de cell5
+        view = batch_view(batches)
 
         # Extracción de valores
-        X_sol = [(b, u, s) for (b, u, s), var in X.items()
-                 if safe_val(getattr(var, 'varValue', None)) > 0.5]
-
-        Y_sol = [(b, v, t) for (b, v, t), var in Y.items()
-                 if safe_val(getattr(var, 'varValue', None)) > 0.5]
-
-        Vused_sol = {v: safe_val(getattr(V_used[v], 'varValue', None)) for v in V_used}
-        Tt_sol = {b: safe_val(getattr(T_tard[b], 'varValue', None)) for b in T_tard}
+        if 'chosen_X' in data.shared and 'chosen_Y' in data.shared:
+            # Solución ya decodificada por el solver (cell11 / cell7_matrix)
+            X_sol = list(data.shared['chosen_X'].values())
+            Y_sol = list(data.shared['chosen_Y'].values())
+            Vused_sol = {v: safe_val(val) for v, val in data.shared.get('V_used_frac', {}).items()}
+            Tt_sol = {b: safe_val(val) for b, val in data.shared.get('Tt_frac', {}).items()}
+        else:
+            X_sol = [(b, u, s) for (b, u, s), var in X.items()
+                     if safe_val(getattr(var, 'varValue', None)) > 0.5]
+
+            Y_sol = [(b, v, t) for (b, v, t), var in Y.items()
+                     if safe_val(getattr(var, 'varValue', None)) > 0.5]
+
+            Vused_sol = {v: safe_val(getattr(V_used[v], 'varValue', None)) for v in V_used}
+            Tt_sol = {b: safe_val(getattr(T_tard[b], 'varValue', None)) for b in T_tard}
 
     except KeyError as e:
         print("ERROR: variable no encontrada en data.shared:", e)
@@ -137,13 +119,7 @@ def run():
     truck_sched = []
     for (b, v, t) in Y_sol:
         site = batches[b]["site_id"]
-
-        travel = site_map[site].get("travel_time_min", None)
-        if travel is None:
-            print(f"ADVERTENCIA: travel_time_min faltante para sitio {site}")
-            travel = 0
-
-        travel = float(travel)
+        travel = float(view["travel"][b])
         
         # --- CAMBIO: Calcular inicio y fin de descarga ---
         arrive = t + travel
@@ -237,11 +213,9 @@ def run():
 
     for r in truck_sched:
         b = r["batch"]
-        site = r["site"]
 
         # Determinar time window final
-        tw_end_val = site_map[site].get("tw_end_h", params.get("T2"))
-        tw_end = time_to_minutes(tw_end_val)
+        tw_end = int(view["tw_end"][b])
 
         # --- CAMBIO: La tardanza se mide sobre el FIN de la descarga [cite: 413] ---
         recomputed = max(0, r["unload_finish"] - tw_end)
@@ -293,12 +267,6 @@ def run():
     # ============================================================
     setting_time_viol = []
     
-    # Mapa de Setting Time (basado en el paper, igual que cell8) 
-    setting_time_map = {
-        "p1": 108, "p2": 108, "p3": 114, "p4": 114,
-        "p5": 114, "p6": 90,  "p7": 108, "p8": 126
-    }
-    
     # Unir producción y transporte
     df_prod_indexed = df_prod.set_index("batch")
     df_tr_indexed = df_tr.set_index("batch")
@@ -315,10 +283,8 @@ def run():
         unload_finish = row["unload_finish"]
         
         # --- Lógica Corregida ---
-        # Obtener el tipo de concreto para este lote
-        site = row["site_prod"] # "site_prod" es el 'site' de df_prod
-        ctype = site_map.get(site, {}).get("concrete_type", "p6").strip().lower()
-        setting_time = setting_time_map.get(ctype, 90) # Usar el mapa 
+        # Setting time del tipo de concreto del lote (SETTING_TIME_MAP de cell5)
+        setting_time = int(view["setting"][b])
         
         duration = unload_finish - prod_finish
         
@@ -5,6 +5,79 @@ import time
 import shutil
 import os
 import cell9_report
+import numpy as np
+import cell11_anytime
+import cell11_portfolio
+import cell11_telemetry
+from cell7_fleet import decode_fleet
+from cell7_matrix import solver_profile, DEFAULT_THREADS
+from cell8_warmstart import log_offset, report_acceptance
+
+
+class HiGHSWarmStart(pulp.HiGHS):
+    """
+    pulp.HiGHS no pasa los valores iniciales a highspy: se cargan con setSolution antes de run().
+    Con anytime=(decoder, params) publica los incumbentes y aplica las reglas de corte de cell11_anytime;
+    decoder() arma el decodificador de columnas cuando PuLP ya indexó las variables (p. ej. pulp_decoder).
+    Con portfolio=params el modelo armado por PuLP se resuelve con la carrera de cell11_portfolio.
+    Con telemetry=params registra el progreso del solve (cell11_telemetry).
+    """
+
+    def __init__(self, *args, anytime=None, portfolio=None, telemetry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.anytime = anytime
+        self.portfolio = portfolio
+        self.telemetry = telemetry
+        self.race = None
+
+    def callSolver(self, lp):
+        start = [(var.index, var.varValue) for var in lp.variables() if var.varValue is not None]
+        if self.portfolio:
+            cols, values = zip(*start) if start else (None, None)
+            self.race = cell11_portfolio.race(lp.solverModel, self.portfolio,
+                                              self.portfolio.get("portfolio_time_sec", self.timeLimit),
+                                              (cols, values) if start else None)
+            return
+        if start:
+            cols, values = zip(*start)
+            lp.solverModel.setSolution(len(cols), np.array(cols, dtype=np.int32), np.array(values, dtype=np.float64))
+        state = None
+        if self.anytime:
+            decoder, params = self.anytime
+            state = cell11_anytime.attach(lp.solverModel, decoder(), params)
+        telemetry = cell11_telemetry.attach(lp.solverModel, self.telemetry, "pulp_highspy") if self.telemetry else None
+        lp.solverModel.run()
+        cell11_telemetry.detach(lp.solverModel, telemetry)
+        if state:
+            cell11_anytime.detach(lp.solverModel, state)
+
+    def findSolutionValues(self, lp):
+        if self.race is None:
+            return super().findSolutionValues(lp)
+        if self.race["infeasible"]:
+            return pulp.LpStatusInfeasible, pulp.LpSolutionInfeasible
+        if self.race["col_value"] is None:
+            return pulp.LpStatusNotSolved, pulp.LpSolutionNoSolutionFound
+        for var in lp.variables():
+            var.varValue = self.race["col_value"][var.index]
+        return pulp.LpStatusOptimal, (pulp.LpSolutionOptimal if self.race["proven"] else pulp.LpSolutionIntegerFeasible)
+
+
+def highs_options(profile):
+    """Opciones de pulp.HiGHS (van a setOptionValue): DEFAULT_THREADS hilos y presolve, con el perfil encima."""
+    return {"threads": DEFAULT_THREADS, "presolve": "on", **profile}
+
+
+def solve_status(prob):
+    """
+    Estado del solve con el criterio de HiGHS: PuLP informa "Optimal" también para el incumbente de un
+    solve cortado por time limit (sol_status = LpSolutionIntegerFeasible), que aquí es "Time limit reached".
+    """
+    status = pulp.LpStatus[prob.status]
+    if status == "Optimal" and prob.sol_status == pulp.LpSolutionIntegerFeasible:
+        return "Time limit reached"
+    return status
+
 
 def run():
     print("\n=== CELDA 11: INICIO SOLVE MILP COMPLETO (HIGHS 4-CORES) ===")
@@ -35,30 +108,44 @@ def run():
     solver = None
     log_path = "solver_highs.log"
     time_limit_sec = 7200 # 2 horas es suficiente para el modelo compacto
+    params = data.shared['params']
+    # "highspy": solve en proceso aunque haya ejecutable (incumbentes publicados y reglas de corte anytime)
+    interface = params.get("solver_interface", "auto")
+    # solver_portfolio: varias configuraciones en carrera sobre el modelo highspy (cell11_portfolio)
+    portfolio = params.get("solver_portfolio", False)
+    # solver_profile: opciones de HiGHS recomendadas por tune_highs.py, sobre las de abajo
+    profile = solver_profile(params)
+    if profile:
+        print(f"Perfil de solver '{params['solver_profile']}': {profile}")
 
     # Estrategia de Selección de Solver Robusta
-    if shutil.which("highs"):
+    if shutil.which("highs") and interface != "highspy" and not portfolio:
         print("✅ Ejecutable 'highs' detectado en sistema.")
         # Highs CMD soporta threads y log path
         solver = pulp.HiGHS_CMD(
             timeLimit=time_limit_sec,
-            threads=4,
+            threads=profile.get("threads", DEFAULT_THREADS),
             path="highs",
-            options=[f"--log_file={log_path}"] # Opción nativa de Highs para log
+            warmStart=True,   # escribe el warm start de cell8 como archivo de solución
+            # Opción nativa de Highs para log; las del perfil van al archivo de opciones
+            options=[f"--log_file={log_path}"] + [f"{k}={str(v).lower() if isinstance(v, bool) else v}"
+                                                  for k, v in profile.items() if k != "threads"]
         )
+        if any(k in params for k in ("stop_gap", "stop_stall_sec", "stop_sla_sec", "incumbent_file")):
+            print("ADVERTENCIA: el ejecutable no expone callbacks; las reglas anytime requieren solver_interface = 'highspy'.")
     else:
         try:
             import highspy
             print("✅ Librería Python 'highspy' detectada.")
             # La API de Highs es rápida pero a veces el log es por stdout
-            solver = pulp.HiGHS(
+            solver = HiGHSWarmStart(
                 timeLimit=time_limit_sec,
                 msg=True, # Mostrar progreso en consola
-                options={
-                    "threads": 4,      # Forzar hilos aquí
-                    "parallel": "on",  # Refuerzo explícito
-                    "presolve": "on"
-                }
+                log_file=log_path, # El log confirma si HiGHS aceptó el warm start
+                anytime=(lambda: cell11_anytime.pulp_decoder(X, Y), params),
+                portfolio=params if portfolio else None,
+                telemetry=params,
+                **highs_options(profile)   # pulp.HiGHS pasa a setOptionValue solo las opciones dadas como kwargs
             )
         except ImportError:
             print("⚠️ Highs no encontrado. Usando CBC (Fallback Single-Thread).")
@@ -68,19 +155,30 @@ def run():
                 logPath="solver_cbc.log"
             )
 
-    print(f"Iniciando optimización con 4 hilos (si Highs está disponible)...")
+    print(f"Iniciando optimización con {profile.get('threads', DEFAULT_THREADS)} hilos (si Highs está disponible)...")
     
     # ---------------------------
     # 3. Resolver
     # ---------------------------
-    # El solver tomará los valores .setInitialValue() de las variables automáticamente
+    # El solver toma los valores .setInitialValue() de las variables (warm start de cell8)
+    log_start = log_offset(log_path)
+    # El ejecutable no tiene callbacks: la telemetría sale de leer su log a medida que se escribe
+    tail = cell11_telemetry.tail_log(log_path, log_start, params) if isinstance(solver, pulp.HiGHS_CMD) else None
     prob.solve(solver)
+    cell11_telemetry.stop_tail(tail, pulp.LpStatus[prob.status])
+    if not isinstance(solver, pulp.PULP_CBC_CMD) and not getattr(solver, "race", None):
+        report_acceptance(data.shared.get('warm_start_report'), log_path, log_start)
     # ---------------------------
     # 4. Procesar Resultados
     # ---------------------------
     end_time = time.time()
-    status = pulp.LpStatus[prob.status]
+    status = solve_status(prob)
     obj_val = pulp.value(prob.objective)
+    if getattr(solver, "anytime", None) and not solver.race and data.shared['anytime_report']["stop_reason"]:
+        # PuLP informa "Optimal" para cualquier solución de un solve interrumpido
+        status = "Interrupted"
+    if getattr(solver, "race", None) and not solver.race["proven"] and not solver.race["infeasible"]:
+        status = "Time limit reached"
 
     print("✅ Solver finalizado. Generando reporte de cell9_report.py inmediato...")
     cell9_report.run()
@@ -118,6 +216,13 @@ def run():
     new_Tt_frac = {b: get_val(var) for b, var in T_tard.items()}
     new_V_used_frac = {v: get_val(var) for v, var in V_used.items()}
 
+    fleet_classes = data.shared.get('fleet_classes')
+    if fleet_classes:
+        # Modo agregado: Y es por clase -> IDs de camión concretos por coloreo de intervalos
+        new_chosen_Y, new_V_used_frac = decode_fleet(new_chosen_Y, fleet_classes, data.shared['batches_list'],
+                                                     data.shared['params'])
+        used_trucks_set = {key[1] for key in new_chosen_Y.values()}
+
     # Sobrescribir datos compartidos para reportes
     data.shared["chosen_X"] = new_chosen_X
     data.shared["chosen_Y"] = new_chosen_Y
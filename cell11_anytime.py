@@ -0,0 +1,133 @@
+# cell11_anytime.py -- Incumbentes publicados durante el solve highspy en proceso y reglas de corte anytime
+import data
+import json
+import time
+import numpy as np
+
+from cell7_fleet import assign_trucks
+
+
+def pulp_decoder(X, Y):
+    """Vector de columnas de HiGHS -> (chosen_X, chosen_Y) para las variables PuLP ya indexadas (var.index)."""
+    x_keys, y_keys = list(X), list(Y)
+    x_cols = np.array([X[k].index for k in x_keys], dtype=np.int64)
+    y_cols = np.array([Y[k].index for k in y_keys], dtype=np.int64)
+
+    def decode(col_value):
+        chosen_X = {x_keys[i][0]: x_keys[i] for i in np.flatnonzero(col_value[x_cols] > 0.5)}
+        chosen_Y = {y_keys[i][0]: y_keys[i] for i in np.flatnonzero(col_value[y_cols] > 0.5)}
+        return chosen_X, chosen_Y
+    return decode
+
+
+def continuous_decoder(model):
+    """
+    Como pulp_decoder para el modelo de cell7_continuous: las asignaciones (b, u) / (b, v) llevan el
+    arranque S[b] y la salida D[b] continuos, con el mismo formato (b, u, s) / (b, v, t) que solve().
+    """
+    a_keys, w_keys = list(model["A"]), list(model["W"])
+    a_cols = np.array([model["A"][k].index for k in a_keys], dtype=np.int64)
+    w_cols = np.array([model["W"][k].index for k in w_keys], dtype=np.int64)
+    S, D = model["S"], model["D"]
+
+    def decode(col_value):
+        chosen_X, chosen_Y = {}, {}
+        for i in np.flatnonzero(col_value[a_cols] > 0.5):
+            b, u = a_keys[i]
+            chosen_X[b] = (b, u, round(float(col_value[S[b].index]), 3))
+        for i in np.flatnonzero(col_value[w_cols] > 0.5):
+            b, v = w_keys[i]
+            chosen_Y[b] = (b, v, round(float(col_value[D[b].index]), 3))
+        return chosen_X, chosen_Y
+    return decode
+
+
+def plain(value):
+    """Entero si no tiene parte fraccionaria (los tiempos continuos se mantienen)."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def publish(incumbent):
+    """
+    Consumidor por defecto: guarda el incumbente en data.shared['incumbents'], lo imprime y, con
+    incumbent_file, agrega una línea JSON con el plan para que un despachador lo lea mientras se resuelve.
+    """
+    data.shared.setdefault('incumbents', []).append(incumbent)
+    gap = f"{incumbent['gap'] * 100:.2f}%" if incumbent["gap"] is not None else "sin cota"
+    print(f"  Incumbente {len(data.shared['incumbents'])}: objetivo {incumbent['objective']:.1f}, "
+          f"gap {gap} a los {incumbent['elapsed_sec']:.1f} s ({len(incumbent['chosen_Y'])} lotes).")
+    path = data.shared['params'].get("incumbent_file")
+    if path:
+        record = {key: incumbent[key] for key in ("objective", "gap", "elapsed_sec")}
+        record["X"] = [list(map(plain, key)) for key in incumbent["chosen_X"].values()]
+        record["Y"] = [list(map(plain, key)) for key in incumbent["chosen_Y"].values()]
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def attach(h, decode, params, consumer=None):
+    """
+    Suscribe callbacks MIP al objeto Highs h antes de run():
+    - cbMipImprovingSolution: cada solución que mejora se decodifica (decode(col_value) -> chosen_X,
+      chosen_Y; con clases de flota se asignan camiones concretos) y se pasa a consumer
+      (por defecto data.shared['incumbent_consumer'] o publish).
+    - cbMipInterrupt: corta el solve con la primera regla que se cumpla: gap relativo <= stop_gap,
+      stop_stall_sec segundos sin mejorar el incumbente o stop_sla_sec segundos desde la carga de
+      datos (cell5). Devuelve el estado para detach().
+    """
+    consumer = consumer or data.shared.get('incumbent_consumer') or publish
+    start = time.time()
+    state = {"start": start, "last_improvement": start, "incumbents": 0, "stop_reason": None,
+             "first_incumbent_sec": None, "best": None}
+    gap_target = params.get("stop_gap")
+    stall = params.get("stop_stall_sec")
+    sla = params.get("stop_sla_sec")
+    sla_deadline = data.shared.get('load_time', start) + sla if sla else None
+    fleet_classes = data.shared.get('fleet_classes')
+
+    def on_incumbent(e):
+        objective = e.data_out.objective_function_value
+        if state["best"] is not None and objective >= state["best"] - 1e-9:
+            return
+        now = time.time()
+        state["best"], state["last_improvement"] = objective, now
+        state["incumbents"] += 1
+        if state["first_incumbent_sec"] is None:
+            state["first_incumbent_sec"] = now - start
+        chosen_X, chosen_Y = decode(np.asarray(e.data_out.mip_solution))
+        if fleet_classes:
+            chosen_Y = assign_trucks(chosen_Y, fleet_classes, data.shared['batches_list'], params)
+        gap = e.data_out.mip_gap
+        # Antes de la primera cota dual HiGHS informa gap infinito
+        consumer({"objective": objective, "gap": gap if np.isfinite(gap) else None, "elapsed_sec": now - start,
+                  "chosen_X": chosen_X, "chosen_Y": chosen_Y})
+
+    def on_interrupt(e):
+        now = time.time()
+        if gap_target is not None and state["incumbents"] and e.data_out.mip_gap <= gap_target:
+            state["stop_reason"] = f"gap {e.data_out.mip_gap * 100:.2f}% <= {gap_target * 100:.2f}%"
+        elif stall and state["incumbents"] and now - state["last_improvement"] >= stall:
+            state["stop_reason"] = f"{stall} s sin mejorar el incumbente"
+        elif sla_deadline is not None and now >= sla_deadline:
+            state["stop_reason"] = f"SLA de {sla} s desde la carga de datos"
+        if state["stop_reason"]:
+            e.interrupt()
+
+    state["callbacks"] = (on_incumbent, on_interrupt)
+    h.cbMipImprovingSolution.subscribe(on_incumbent)
+    h.cbMipInterrupt.subscribe(on_interrupt)
+    return state
+
+
+def detach(h, state):
+    """Quita los callbacks (el Highs del modelo matricial se reutiliza) y deja el reporte en data.shared."""
+    on_incumbent, on_interrupt = state["callbacks"]
+    h.cbMipImprovingSolution.unsubscribe(on_incumbent)
+    h.cbMipInterrupt.unsubscribe(on_interrupt)
+    report = {"incumbents": state["incumbents"], "first_incumbent_sec": state["first_incumbent_sec"],
+              "last_improvement_sec": state["last_improvement"] - state["start"], "stop_reason": state["stop_reason"]}
+    if state["stop_reason"]:
+        print(f"Corte anytime: {state['stop_reason']} ({state['incumbents']} incumbentes publicados).")
+    data.shared['anytime_report'] = report
+    return report
@@ -0,0 +1,263 @@
+# cell11_colgen.py -- Generación de columnas sobre jornadas de camión (set partitioning + price-and-branch)
+import data
+import math
+import time
+import numpy as np
+import scipy.sparse as sp
+
+from cell5 import batch_view
+from cell7 import PENALTY
+from cell7_fleet import truck_classes
+from cell7_matrix import configure_highs
+import cell7_matrix
+
+# Costo de una salida "artificial" (viaje sin camión de la flota): solo para que el maestro sea factible
+ARTIFICIAL_COST = 100 * PENALTY
+
+
+def trip_nodes(model, classes, batches, params):
+    """
+    Viajes candidatos por clase de camión: columnas Y (b, v_rep, t) del modelo de cell7_matrix.
+    Cada viaje bloquea el camión en [t - wash, t + 2*travel + unload) redondeado a slots
+    (el mismo intervalo que las filas Cap_Truck). Devuelve por clase (columnas Y, b, t, inicio, fin).
+    """
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    k_before = int(math.ceil(wash / delta)) * delta
+    travel_b = batch_view(batches)["travel"]
+
+    by_truck = {}
+    for (b, v, t), j in model["col_index"]["Y"].items():
+        by_truck.setdefault(v, []).append((t, b, j))
+
+    nodes = []
+    for cls in classes:
+        keys = sorted(by_truck.get(cls["members"][0], []))
+        nb = np.array([b for (_, b, _) in keys], dtype=np.int64)
+        nt = np.array([t for (t, _, _) in keys], dtype=np.int64)
+        travel = travel_b[nb].astype(float)
+        trip = np.ceil((2 * travel + unload) / delta).astype(np.int64) * delta
+        nodes.append({
+            "cols": np.array([j for (_, _, j) in keys], dtype=np.int64),
+            "b": nb, "t": nt, "start": nt - k_before, "end": nt + trip,
+        })
+    return nodes
+
+
+def price_class(node, w, max_cols):
+    """
+    Camino de menor costo reducido en el DAG de viajes ordenados por salida (q-rutas: se prohíbe
+    repetir el lote en viajes consecutivos). w: costo reducido de cada viaje.
+    Devuelve hasta max_cols jornadas [(costo reducido sin el dual de clase, [nodos])].
+    """
+    n = len(w)
+    best = np.zeros(n)
+    pred = np.full(n, -1, dtype=np.int64)
+    by_end = np.argsort(node["end"], kind="stable")
+    b1 = (0.0, -1, -1)   # (valor, lote, nodo): mejor etiqueta insertada
+    b2 = (0.0, -1, -1)   # mejor etiqueta de un lote distinto al de b1
+    p = 0
+    for i in np.argsort(node["t"], kind="stable"):
+        # Se insertan los viajes que terminan antes de que este empiece (lavado incluido)
+        while p < n and node["end"][by_end[p]] <= node["start"][i]:
+            k = by_end[p]
+            val, bk = best[k], node["b"][k]
+            if val < b1[0]:
+                if b1[1] != bk:
+                    b2 = b1
+                b1 = (val, bk, k)
+            elif bk != b1[1] and val < b2[0]:
+                b2 = (val, bk, k)
+            p += 1
+        cand = b1 if b1[1] != node["b"][i] else b2
+        best[i] = w[i] + cand[0]
+        pred[i] = cand[2]
+
+    duties = []
+    seen = set()
+    for i in np.argsort(best):
+        if best[i] >= -1e-6 or len(duties) >= max_cols:
+            break
+        path = []
+        k = i
+        while k >= 0:
+            path.append(int(k))
+            k = pred[k]
+        path = tuple(reversed(path))
+        if path not in seen:
+            seen.add(path)
+            duties.append((float(best[i]), list(path)))
+    return duties
+
+
+def seed_duties(warm_Y, classes, nodes):
+    """Jornadas iniciales a partir del warm start de cell8 (se cortan donde dos viajes se solapan)."""
+    class_of = {v: c for c, cls in enumerate(classes) for v in cls["members"]}
+    pos = [{(int(b), int(t)): i for i, (b, t) in enumerate(zip(node["b"], node["t"]))} for node in nodes]
+    trips = {}
+    for (b, v, t) in warm_Y.values():
+        c = class_of[v]
+        if (b, t) in pos[c]:
+            trips.setdefault((c, v), []).append(pos[c][(b, t)])
+
+    duties = []
+    for (c, v), idx in trips.items():
+        node = nodes[c]
+        idx.sort(key=lambda i: node["t"][i])
+        current = [idx[0]]
+        for i in idx[1:]:
+            if node["end"][current[-1]] <= node["start"][i]:
+                current.append(i)
+            else:
+                duties.append((c, current))
+                current = [i]
+        duties.append((c, current))
+    return duties
+
+
+def run():
+    import highspy
+
+    print("\n=== CELDA 11 (GENERACIÓN DE COLUMNAS): JORNADAS DE CAMIÓN ===")
+    start_time = time.time()
+
+    try:
+        model = data.shared['matrix_model']
+    except KeyError as e:
+        print(f"Error crítico: Falta {e} en data.shared. Ejecuta cell7_matrix.run() primero.")
+        return
+    if "row_index" not in model or data.shared.get('fleet_classes'):
+        print("Error: la generación de columnas requiere el modelo por camión de cell7_matrix.run().")
+        return
+
+    params = data.shared['params']
+    batches = data.shared['batches_list']
+    trucks = data.shared['trucks_list']
+    max_iter = params.get("colgen_max_iter", 100)
+    cg_time = params.get("colgen_time_sec", 300)
+    cols_per_class = params.get("colgen_cols_per_class", 10)
+    mip_time = params.get("colgen_mip_time_sec", 7200)
+
+    # 1. Maestro: modelo de cell7_matrix sin columnas Y ni filas Cap_Truck (las jornadas las reemplazan)
+    A = model["A"].tocsc()
+    idx = model["col_index"]
+    y_cols = np.fromiter(idx["Y"].values(), dtype=np.int64)
+    truck_rows = np.fromiter(model["row_index"].get("Cap_Truck", {}).values(), dtype=np.int64)
+    keep_rows = np.setdiff1d(np.arange(A.shape[0]), truck_rows)
+    keep_cols = np.setdiff1d(np.arange(A.shape[1]), y_cols)
+    A_rows = A[keep_rows, :]
+    A_base = A_rows[:, keep_cols].tocsc()
+
+    classes = truck_classes(trucks)
+    nodes = trip_nodes(model, classes, batches, params)
+    # Coeficientes de cada viaje en las filas del maestro (One_Trip, Eq7, Eq8, Def_Tard, Eq13, Eq14)
+    for node in nodes:
+        node["A"] = A_rows[:, node["cols"]].tocsc()
+        node["cost"] = model["cost"][node["cols"]]
+
+    h = highspy.Highs()
+    h.passModel(
+        A_base.shape[1], A_base.shape[0], A_base.nnz, 1, 1, 0.0,
+        model["cost"][keep_cols], model["col_lower"][keep_cols], model["col_upper"][keep_cols],
+        model["row_lower"][keep_rows], model["row_upper"][keep_rows],
+        A_base.indptr.astype(np.int32), A_base.indices.astype(np.int32), A_base.data.astype(np.float64),
+        np.zeros(A_base.shape[1], dtype=np.int32)
+    )
+    # Fila de convexidad por clase: a lo sumo count jornadas
+    n_rows = h.getNumRow()
+    class_row = np.arange(n_rows, n_rows + len(classes))
+    h.addRows(len(classes), np.full(len(classes), -np.inf), np.array([float(c["count"]) for c in classes]),
+              0, np.zeros(len(classes) + 1, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0))
+    h.silent()
+    configure_highs(h, cg_time, log_file="solver_highs_colgen.log")
+
+    duties = []   # (clase, [nodos]) o (None, [nodo]) para las artificiales
+
+    def add_duties(new):
+        """Agrega jornadas como columnas: suma de sus viajes + 1 en la fila de su clase."""
+        blocks, costs = [], []
+        for (c, path) in new:
+            node = nodes[c if c is not None else art_class]
+            col = sp.csc_matrix(node["A"][:, path].sum(axis=1))
+            if c is not None:
+                col = sp.vstack([col, sp.csc_matrix(([1.0], ([c], [0])), shape=(len(classes), 1))]).tocsc()
+                costs.append(float(node["cost"][path].sum()))
+            else:
+                col = sp.vstack([col, sp.csc_matrix((len(classes), 1))]).tocsc()
+                costs.append(float(node["cost"][path].sum()) + ARTIFICIAL_COST)
+            blocks.append(col)
+            duties.append((c, path))
+        M = sp.hstack(blocks).tocsc()
+        h.addCols(M.shape[1], np.array(costs), np.zeros(M.shape[1]), np.ones(M.shape[1]), M.nnz,
+                  M.indptr.astype(np.int32), M.indices.astype(np.int32), M.data.astype(np.float64))
+
+    # 2. Columnas iniciales: artificiales (un viaje por salida candidata, de la clase más grande)
+    #    y las jornadas del warm start de cell8 si existe
+    art_class = max(range(len(classes)), key=lambda c: (classes[c]["capacity_m3"], len(nodes[c]["b"])))
+    add_duties([(None, [i]) for i in range(len(nodes[art_class]["b"]))])
+    n_art = len(duties)
+    warm_Y = data.shared.get('warm_Y', {})
+    if warm_Y:
+        add_duties(seed_duties(warm_Y, classes, nodes))
+    print(f"Maestro: {A_base.shape[0] + len(classes)} filas, {A_base.shape[1]} columnas base, "
+          f"{len(classes)} clases de camión, {n_art} salidas artificiales, {len(duties) - n_art} jornadas iniciales.")
+
+    # 3. Generación de columnas sobre la relajación LP del maestro
+    print(f"{'It':>4} {'LP':>14} {'Cota LP':>14} {'Columnas':>9} {'Nuevas':>7} {'Tiempo':>8}")
+    lp_obj, lp_bound = None, -np.inf
+    for it in range(1, max_iter + 1):
+        t_it = time.time()
+        h.run()
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            print(f"ADVERTENCIA: LP maestro {h.modelStatusToString(h.getModelStatus())}; se detiene la generación.")
+            break
+        lp_obj = h.getInfo().objective_function_value
+        row_dual = np.asarray(h.getSolution().row_dual)
+
+        new, min_rc = [], {}
+        for c, node in enumerate(nodes):
+            if len(node["b"]) == 0:
+                continue
+            # Costo reducido de cada viaje = costo - duales de las filas en las que aparece
+            w = node["cost"] - node["A"].T @ row_dual[:len(keep_rows)]
+            found = price_class(node, w, cols_per_class)
+            rc = [val - row_dual[class_row[c]] for (val, _) in found]
+            min_rc[c] = min(rc, default=0.0)
+            new += [(c, path) for (val, path), r in zip(found, rc) if r < -1e-6]
+
+        # Cota de Lagrange: cada clase puede bajar el LP a lo sumo count * (menor costo reducido)
+        lp_bound = max(lp_bound, lp_obj + sum(classes[c]["count"] * min(0.0, r) for c, r in min_rc.items()))
+        if new:
+            add_duties(new)
+        print(f"{it:>4} {lp_obj:>14.1f} {lp_bound:>14.1f} {len(duties) - n_art:>9} {len(new):>7} "
+              f"{time.time() - t_it:>7.2f}s")
+        if not new:
+            print("Sin columnas de costo reducido negativo: LP maestro óptimo.")
+            break
+        if time.time() - start_time > cg_time:
+            print(f"Límite de tiempo de generación ({cg_time} s) alcanzado.")
+            break
+    t_cg = time.time() - start_time
+    data.shared['colgen_report'] = {"lp": lp_obj, "lp_bound": lp_bound, "columns": len(duties) - n_art,
+                                    "iterations": it, "time_sec": t_cg}
+
+    # 4. Price-and-branch: el maestro restringido entero casi no recombina jornadas (las salidas
+    #    quedan atadas a Eq. 7 / Eq. 13), así que la fase entera resuelve el modelo por camión de
+    #    cell7_matrix restringido a los viajes (lote, clase, salida) que aparecen en alguna jornada
+    support = {(int(nodes[c]["b"][i]), c, int(nodes[c]["t"][i]))
+               for (c, path) in duties if c is not None for i in path}
+    class_of = {v: c for c, cls in enumerate(classes) for v in cls["members"]}
+    closed = np.array([j for (b, v, t), j in idx["Y"].items() if (b, class_of[v], t) not in support],
+                      dtype=np.int32)
+    hm = model["highs"]
+    if len(closed):
+        hm.changeColsBounds(len(closed), closed, np.zeros(len(closed)), np.zeros(len(closed)))
+    print(f"Fase entera: {len(idx['Y']) - len(closed)} de {len(idx['Y'])} columnas Y en el soporte de las jornadas.")
+    cell7_matrix.solve(time_limit=mip_time)
+    if len(closed):
+        hm.changeColsBounds(len(closed), closed, np.zeros(len(closed)), np.ones(len(closed)))
+
+    print(f"Cota LP (generación de columnas): {lp_bound:.1f} en {t_cg:.1f} s; "
+          f"total {time.time() - start_time:.1f} s.")
+    print("=== CELDA 11 (GENERACIÓN DE COLUMNAS): FIN ===")
@@ -0,0 +1,104 @@
+# cell11_heuristic.py -- Planificación solo heurística (sin modelo ni MILP) con presupuesto de tiempo
+import data
+import math
+import time
+
+from cell7 import batch_windows, eligible_trucks
+from cell7_fleet import truck_classes
+from cell8 import batch_table, build_plan, grasp, plan_cost
+
+
+def grid_windows(batches, trucks, units, params, prune=False):
+    """
+    Ventanas (X_win, Y_win) de cell8 sin enumerar la grilla: mismas claves extremas que
+    cell7.variable_domains (con o sin prune_domains), redondeadas a los puntos T1 + k*delta.
+    """
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    last = T1 + (T2 - T1) // delta * delta
+    windows = batch_windows(batches, units, params) if prune else {}
+
+    def snap(lo, hi):
+        lo = T1 + max(0, int(math.ceil((lo - T1) / delta))) * delta
+        hi = min(last, T1 + int(math.floor((hi - T1) / delta)) * delta)
+        return (lo, hi) if lo <= hi else None
+
+    X_win, Y_win = {}, {}
+    for b_idx, batch in enumerate(batches):
+        vol = float(batch.get("volume", 0))
+        earliest_dep, latest_dep = windows[b_idx]["dep"] if prune else (T1, T2)
+        prod_windows = windows[b_idx]["prod"] if prune else {}
+
+        X_win[b_idx] = {}
+        for u_idx, unit in enumerate(units):
+            proc = float(unit.get("process_time_min", 0))
+            lo, hi = prod_windows.get(u_idx, (T1, T2 - proc))
+            win = snap(lo, min(hi, T2 - proc))
+            if win:
+                X_win[b_idx][u_idx] = win
+
+        Y_win[b_idx] = {}
+        win = snap(earliest_dep, latest_dep)
+        for v_idx in (eligible_trucks(vol, trucks) if win else []):
+            Y_win[b_idx][v_idx] = win
+    return X_win, Y_win
+
+
+def run():
+    print("\n=== CELDA 11 (HEURÍSTICA): PLAN RÁPIDO SIN MILP ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    budget = params.get("heuristic_budget_sec", 5)
+    deadline = start_time + budget
+    batches = data.shared['df_batches'].to_dict("records")
+    trucks = data.shared['df_trucks'].to_dict("records")
+    units = data.shared['df_units'].to_dict("records")
+    B = len(batches)
+
+    # 1. Dominios (mismas ventanas que cell7) e insumos de cell8, sin construir variables PuLP
+    X_win, Y_win = grid_windows(batches, trucks, units, params, prune=params.get("prune_domains", False))
+    proc_by_ui = {ui: int(unit.get("process_time_min", 0)) for ui, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+    classes = truck_classes(trucks)
+
+    # 2. Construcción de cell8 (los reintentos se cortan al llegar al presupuesto)
+    chosen_X, chosen_Y, forced, passes = build_plan(B, X_win, Y_win, proc_by_ui, batch_info, classes, params,
+                                                    deadline=deadline)
+    score = (len(forced), plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks, params))
+    print(f"Construcción: {len(chosen_X)}/{B} lotes, {passes} pasadas, {len(forced)} con solape forzado, "
+          f"costo {score[1]:.1f} en {time.time() - start_time:.2f} s")
+
+    # 3. Mejora opcional: arranques GRASP con lo que quede del presupuesto
+    if params.get("grasp_starts", 0) > 0 and len(chosen_X) == B and time.time() < deadline:
+        context = (B, X_win, Y_win, proc_by_ui, batch_info, classes, trucks, params)
+        chosen_X, chosen_Y, forced = grasp(context, (score, chosen_X, chosen_Y, forced), params, deadline=deadline)
+        score = (len(forced), plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks, params))
+
+    # 4. Solución en el formato de cell11 (chosen_X / chosen_Y, Tt_frac, V_used_frac) para cell10 y cell12
+    unload = params.get("unload_time", 30)
+    Tt_frac = {b: max(0.0, t + batch_info[b]["travel"] + unload - batch_info[b]["tw_end"])
+               for b, (_, _, t) in chosen_Y.items()}
+    used_trucks = {v for (_, v, _) in chosen_Y.values()}
+
+    data.shared["chosen_X"] = chosen_X
+    data.shared["chosen_Y"] = chosen_Y
+    data.shared["Tt_frac"] = Tt_frac
+    data.shared["V_used_frac"] = {v: (1.0 if v in used_trucks else 0.0) for v in range(len(trucks))}
+    # Sin modelo: no hay variables, pero cell10_checker espera encontrar las claves
+    data.shared['X'], data.shared['Y'], data.shared['T_tard'], data.shared['V_used'] = {}, {}, {}, {}
+    data.shared['units_list'] = units
+    data.shared['batches_list'] = batches
+    data.shared['trucks_list'] = trucks
+    data.shared['time_points'] = list(range(params["T1"], params["T2"] + 1, params.get("delta_min", 10)))
+    data.shared['model_builder'] = "heuristic"
+    data.shared['fleet_classes'] = None
+    data.shared['heuristic_report'] = {"objective": score[1], "forced": score[0], "passes": passes,
+                                       "elapsed_sec": round(time.time() - start_time, 3), "budget_sec": budget}
+
+    elapsed = time.time() - start_time
+    print(f"Plan heurístico: costo {score[1]:.1f} (objetivo de cell7), {score[0]} lotes con solape forzado, "
+          f"{len(used_trucks)} camiones, {elapsed:.2f} s de {budget} s.")
+    if elapsed > budget:
+        print("ADVERTENCIA: la construcción superó el presupuesto (una pasada de cell8 no se interrumpe).")
+    print("=== CELDA 11 (HEURÍSTICA): FIN ===")
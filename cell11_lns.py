@@ -0,0 +1,235 @@
+# cell11_lns.py -- Búsqueda de vecindario grande (fix-and-optimize) con sub-MIPs en paralelo
+import data
+import os
+import time
+import random
+import multiprocessing
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import cell7_matrix
+from cell7_matrix import configure_highs
+from cell7_fleet import class_of_truck, assign_trucks
+
+# Tipos de vecindario, en rotación entre los procesos de cada ronda
+NEIGHBOURHOODS = ("sites", "time", "trucks")
+
+# Modelo highspy de cada proceso del pool (lo arma init_worker una sola vez)
+_worker = {}
+
+
+def lp_arrays(h):
+    """Arrays del modelo en memoria (sirve también para uno recargado de caché o con pedidos insertados)."""
+    import highspy
+    from scipy.sparse import csr_matrix, csc_matrix
+
+    lp = h.getLp()
+    a = lp.a_matrix_
+    shape = (lp.num_row_, lp.num_col_)
+    matrix = (csc_matrix if a.format_ == highspy.MatrixFormat.kColwise else csr_matrix)(
+        (np.asarray(a.value_), np.asarray(a.index_), np.asarray(a.start_)), shape=shape)
+    A = csc_matrix(matrix)   # tras un solve HiGHS puede guardar la matriz por filas
+    return {
+        "cost": np.asarray(lp.col_cost_), "col_lower": np.asarray(lp.col_lower_), "col_upper": np.asarray(lp.col_upper_),
+        "row_lower": np.asarray(lp.row_lower_), "row_upper": np.asarray(lp.row_upper_),
+        "start": A.indptr, "index": A.indices, "value": A.data,
+        "integrality": np.asarray([int(v) for v in lp.integrality_]), "offset": float(lp.offset_),
+    }
+
+
+def highs_from_arrays(arrays):
+    """Highs silencioso de un hilo con el modelo de lp_arrays (en los procesos hijos)."""
+    import highspy
+
+    h = highspy.Highs()
+    h.silent()
+    h.passModel(len(arrays["cost"]), len(arrays["row_lower"]), len(arrays["value"]), 1, 1, arrays["offset"],
+                arrays["cost"], arrays["col_lower"], arrays["col_upper"], arrays["row_lower"], arrays["row_upper"],
+                arrays["start"].astype(np.int32), arrays["index"].astype(np.int32),
+                arrays["value"].astype(np.float64), arrays["integrality"])
+    h.setOptionValue("threads", 1)
+    return h
+
+
+def init_worker(arrays, xy_cols, xy_batch):
+    h = highs_from_arrays(arrays)
+    _worker.update(highs=h, xy_cols=xy_cols, xy_batch=xy_batch)
+
+
+def fix_bounds(h, xy_cols, xy_batch, incumbent, free):
+    """X/Y de los lotes fuera de free quedan fijados al incumbente; los de free quedan libres."""
+    is_free = np.isin(xy_batch, list(free))
+    is_inc = np.isin(xy_cols, incumbent)
+    lower = np.where(~is_free & is_inc, 1.0, 0.0)
+    upper = np.where(is_free | is_inc, 1.0, 0.0)
+    h.changeColsBounds(len(xy_cols), xy_cols, lower, upper)
+
+
+def solve_neighbourhood(task):
+    """Sub-MIP en un proceso: (tipo, lotes libres, incumbente, time limit) -> (objetivo, columnas X/Y) o None."""
+    import highspy
+
+    kind, free, incumbent, time_limit = task
+    h = _worker["highs"]
+    fix_bounds(h, _worker["xy_cols"], _worker["xy_batch"], incumbent, free)
+    h.setSolution(len(incumbent), incumbent, np.ones(len(incumbent)))
+    h.setOptionValue("time_limit", float(time_limit))   # por run(); getRunTime() es acumulado
+    h.run()
+    if h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        return None
+    col_value = np.asarray(h.getSolution().col_value)
+    xy_cols = _worker["xy_cols"]
+    return h.getInfo().objective_function_value, xy_cols[col_value[xy_cols] > 0.5].astype(np.int32)
+
+
+def evaluate(h, xy_cols, xy_batch, incumbent, time_limit):
+    """Objetivo del plan con todas las X/Y fijas (solo quedan tardanzas, slacks y V_used) o None si no es factible."""
+    import highspy
+
+    fix_bounds(h, xy_cols, xy_batch, incumbent, ())
+    configure_highs(h, time_limit, log_file="solver_highs_lns.log")
+    h.setOptionValue("output_flag", False)
+    h.run()
+    h.setOptionValue("output_flag", True)
+    if h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        return None
+    return h.getInfo().objective_function_value
+
+
+def neighbourhoods(n, round_no, batches, departure, truck_of, size, slice_min, rng):
+    """n conjuntos disjuntos de lotes libres: sitios completos, una franja de salidas o los lotes de unos camiones."""
+    by_site, by_truck = defaultdict(list), defaultdict(list)
+    for b, batch in enumerate(batches):
+        by_site[str(batch["site_id"]).strip().lower()].append(b)
+        by_truck[truck_of[b]].append(b)
+
+    taken, out = set(), []
+    for k in range(n):
+        kind = NEIGHBOURHOODS[(round_no * n + k) % len(NEIGHBOURHOODS)]
+        free = []
+        if kind == "time":
+            rest = [b for b in range(len(batches)) if b not in taken]
+            if rest:
+                center = departure[rng.choice(rest)]
+                near = sorted((abs(departure[b] - center), b) for b in rest if abs(departure[b] - center) <= slice_min / 2)
+                free = [b for _, b in near[:size]]
+        else:
+            groups = list((by_site if kind == "sites" else by_truck).values())
+            rng.shuffle(groups)
+            for group in groups:
+                if len(free) >= size:
+                    break
+                if not taken.intersection(group) and len(free) + len(group) <= max(size, len(group)):
+                    free += group
+        if free:
+            taken.update(free)
+            out.append((kind, sorted(free)))
+    return out
+
+
+def run():
+    import highspy
+
+    print("\n=== CELDA 11 (LNS): FIX-AND-OPTIMIZE CON SUB-MIPS EN PARALELO ===")
+    start_time = time.time()
+
+    try:
+        model = data.shared['matrix_model']
+    except KeyError as e:
+        print(f"Error crítico: Falta {e} en data.shared. Ejecuta cell7_matrix.run() primero.")
+        return
+
+    params = data.shared['params']
+    batches = data.shared['batches_list']
+    lns_time = params.get("lns_time_sec", 300)
+    sub_time = params.get("lns_sub_time_sec", 20)
+    workers = max(1, params.get("lns_workers", os.cpu_count() or 1))
+    size = params.get("lns_batches", 10)
+    slice_min = params.get("lns_slice_min", 120)
+    rng = random.Random(params.get("lns_seed", 0))
+
+    h = model["highs"]
+    idx = model["col_index"]
+    key_of = {j: (fam, key) for fam in ("X", "Y") for key, j in idx[fam].items()}
+    xy_cols = np.array(sorted(key_of), dtype=np.int32)
+    xy_batch = np.array([key_of[j][1][0] for j in xy_cols], dtype=np.int64)
+    lp = h.getLp()
+    lower0, upper0 = np.asarray(lp.col_lower_)[xy_cols], np.asarray(lp.col_upper_)[xy_cols]
+
+    # 1. Incumbente inicial: warm start de cell8 (Y por clase si el modelo es agregado)
+    fleet_classes = data.shared.get('fleet_classes')
+    class_of = class_of_truck(fleet_classes) if fleet_classes else None
+    warm_X = data.shared.get('warm_X', {})
+    warm_Y = data.shared.get('warm_Y', {})
+    if fleet_classes:
+        warm_Y = {b: (b, class_of[v], t) for b, (_, v, t) in warm_Y.items()}
+    incumbent = np.array(sorted(idx["X"][k] for k in warm_X.values() if k in idx["X"]) +
+                         sorted(idx["Y"][k] for k in warm_Y.values() if k in idx["Y"]), dtype=np.int32)
+    cost = None
+    if len(warm_X) == len(batches) and len(warm_Y) == len(batches):
+        cost = evaluate(h, xy_cols, xy_batch, incumbent, sub_time)
+    if cost is None:
+        # Warm start incompleto o infactible: primera solución del modelo completo
+        print("ADVERTENCIA: el warm start no es factible; se busca una solución inicial con el modelo completo.")
+        h.changeColsBounds(len(xy_cols), xy_cols, lower0, upper0)
+        configure_highs(h, sub_time * 3, log_file="solver_highs_lns.log")
+        h.run()
+        if h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            print("Error: sin solución inicial para el LNS.")
+            return
+        col_value = np.asarray(h.getSolution().col_value)
+        incumbent = xy_cols[col_value[xy_cols] > 0.5].astype(np.int32)
+        cost = h.getInfo().objective_function_value
+
+    history = [(round(time.time() - start_time, 2), cost)]
+    print(f"Incumbente inicial: {cost:.1f} ({workers} procesos, {size} lotes por vecindario, sub-MIP {sub_time} s)")
+
+    # 2. Rondas: vecindarios disjuntos en paralelo; gana el mejor y se suman los demás si el plan combinado mejora
+    round_no = 0
+    # spawn: un fork heredaría el scheduler de hilos de HiGHS ya iniciado en este proceso
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker,
+                             initargs=(lp_arrays(h), xy_cols, xy_batch)) as pool:
+        while time.time() - start_time + sub_time <= lns_time and round_no < params.get("lns_max_rounds", 1000):
+            departure, truck_of = {}, {}
+            for j in incumbent:
+                fam, key = key_of[j]
+                if fam == "Y":
+                    departure[key[0]], truck_of[key[0]] = key[2], key[1]
+            tasks = [(kind, free, incumbent, sub_time)
+                     for kind, free in neighbourhoods(workers, round_no, batches, departure, truck_of, size, slice_min, rng)]
+            results = [(res, kind, free) for res, (kind, free, _, _) in zip(pool.map(solve_neighbourhood, tasks), tasks)
+                       if res is not None and res[0] < cost - 1e-6]
+            results.sort(key=lambda r: r[0][0])
+
+            accepted = []
+            for (obj, cols), kind, free in results:
+                merged = np.union1d(incumbent[~np.isin(xy_batch[np.searchsorted(xy_cols, incumbent)], free)], cols)
+                if not accepted:
+                    new_cost = obj   # el sub-MIP ya se resolvió con el resto fijo en el incumbente
+                else:
+                    new_cost = evaluate(h, xy_cols, xy_batch, merged.astype(np.int32), sub_time)
+                if new_cost is not None and new_cost < cost - 1e-6:
+                    incumbent, cost = merged.astype(np.int32), new_cost
+                    accepted.append(kind)
+            round_no += 1
+            history.append((round(time.time() - start_time, 2), cost))
+            print(f"  Ronda {round_no}: {len(tasks)} vecindarios ({', '.join(task[0] for task in tasks)}), "
+                  f"{len(accepted)} mejoras aceptadas, costo {cost:.1f} en {time.time() - start_time:.1f} s")
+
+    h.changeColsBounds(len(xy_cols), xy_cols, lower0, upper0)
+    data.shared['lns_report'] = {"rounds": round_no, "history": history}
+    print(f"LNS: {round_no} rondas, costo {history[0][1]:.1f} -> {cost:.1f} en {time.time() - start_time:.1f} s.")
+
+    # 3. El incumbente pasa como warm start; se decodifica con el solve del modelo matricial
+    chosen_X, chosen_Y, _, _ = cell7_matrix.decode_solution(model, np.isin(np.arange(h.getNumCol()), incumbent) * 1.0)
+    if fleet_classes:
+        chosen_Y = assign_trucks(chosen_Y, fleet_classes, batches, params)
+    data.shared['warm_X'], data.shared['warm_Y'] = chosen_X, chosen_Y
+    if params.get("lns_then_full", False):
+        cell7_matrix.solve(time_limit=params.get("lns_full_time_sec", 7200))
+    else:
+        fix_bounds(h, xy_cols, xy_batch, incumbent, ())
+        cell7_matrix.solve(time_limit=sub_time)
+        h.changeColsBounds(len(xy_cols), xy_cols, lower0, upper0)
@@ -0,0 +1,205 @@
+# cell11_multires.py -- Discretización multi-resolución: solve en grilla gruesa y refinamiento local en la fina
+import data
+import time
+import numpy as np
+
+from cell7 import variable_domains, prune_report
+from cell7_fleet import truck_classes
+from cell7_matrix import build_arrays, to_highs, configure_highs, decode_solution, unsupported_options
+from cell8 import key_windows, batch_table, build_plan, plan_cost
+from cell8_warmstart import repair_plan, start_values, matrix_start
+import cell7_matrix
+
+
+def heuristic_plan(X_dom, Y_dom, batches, trucks, units, params):
+    """Construcción de cell8 sobre unos dominios (reparada si quedan solapes). (chosen_X, chosen_Y, forzados) o None."""
+    X_win, Y_win = key_windows([(b, u, t) for b, keys in X_dom.items() for (u, t) in keys],
+                               [(b, v, t) for b, keys in Y_dom.items() for (v, t) in keys])
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+    chosen_X, chosen_Y, forced, _ = build_plan(len(batches), X_win, Y_win, proc_by_ui, batch_info,
+                                               truck_classes(trucks), params)
+    if forced:
+        rep_X, rep_Y, _, stuck = repair_plan(chosen_X, chosen_Y, X_win, Y_win, proc_by_ui, batch_info, params)
+        if len(stuck) < len(forced):
+            chosen_X, chosen_Y, forced = rep_X, rep_Y, stuck
+    if len(chosen_X) < len(batches) or len(chosen_Y) < len(batches):
+        return None
+    return chosen_X, chosen_Y, forced
+
+
+def coarse_solve(batches, trucks, units, params, coarse_delta, time_limit):
+    """
+    Resuelve el modelo completo con delta_min = coarse_delta, con la construcción de cell8 sobre los
+    dominios gruesos como warm start (sin solapes en slots gruesos también cumple la capacidad en minutos;
+    los lotes que no se pudieron reparar se dejan a HiGHS).
+    Devuelve (chosen_X, chosen_Y): el incumbente de HiGHS o, si no encontró ninguno, esa construcción;
+    None solo si tampoco hay construcción completa.
+    """
+    import highspy
+
+    coarse_params = dict(params, delta_min=coarse_delta)
+    T1, T2 = params["T1"], params["T2"]
+    time_points = list(range(T1, T2 + 1, coarse_delta))
+    X_dom, Y_dom = variable_domains(batches, trucks, units, coarse_params, time_points,
+                                    prune=params.get("prune_domains", False))
+    # Capacidad en minutos: con slots enteros la grilla gruesa sobreestima la ocupación y puede ser infactible
+    model = build_arrays(batches, trucks, units, coarse_params, X_dom, Y_dom,
+                         occupancy_delta=params.get("delta_min", 10))
+
+    h = to_highs(model)
+    configure_highs(h, time_limit, log_file="solver_highs_coarse.log")
+    seed = heuristic_plan(X_dom, Y_dom, batches, trucks, units, coarse_params)
+    if seed is not None:
+        # Los lotes con solape forzado quedan fuera: HiGHS completa la solución parcial con un sub-MIP
+        forced = set(seed[2])
+        part_X = {b: key for b, key in seed[0].items() if b not in forced}
+        part_Y = {b: key for b, key in seed[1].items() if b not in forced}
+        values = start_values(seed[0], seed[1], batches, trucks, units, coarse_params)
+        ws = matrix_start(model["col_index"], part_X, part_Y, values)
+        h.setSolution(len(ws), np.fromiter(ws.keys(), dtype=np.int32, count=len(ws)),
+                      np.fromiter(ws.values(), dtype=np.float64, count=len(ws)))
+        print(f"Etapa gruesa: warm start de cell8 ({len(part_Y)} lotes, {len(forced)} sin reparar quedan libres).")
+    h.run()
+
+    status = h.modelStatusToString(h.getModelStatus())
+    print(f"Etapa gruesa (delta = {coarse_delta} min): {model['A'].shape[1]} columnas, {status}, "
+          f"objetivo {h.getInfo().objective_function_value:.1f}")
+    if h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        if seed is None:
+            return None
+        print("ADVERTENCIA: la etapa gruesa no encontró incumbente; se refina la construcción de cell8.")
+        return seed[:2]
+    chosen_X, chosen_Y, _, _ = decode_solution(model, np.asarray(h.getSolution().col_value))
+    return chosen_X, chosen_Y
+
+
+def neighbourhood_domains(X_dom, Y_dom, chosen_X, chosen_Y, radius):
+    """
+    Restringe los dominios de la grilla fina a +-radius minutos del arranque y la salida del plan de
+    referencia (el warm start de fine_start). La decisión del plan se conserva siempre para que el
+    warm start sea una solución del vecindario.
+    """
+    X_near, Y_near = {}, {}
+    for b in X_dom:
+        _, u_c, s_c = chosen_X[b]
+        _, v_c, t_c = chosen_Y[b]
+        X_near[b] = [(u, t) for (u, t) in X_dom[b] if abs(t - s_c) <= radius]
+        Y_near[b] = [(v, t) for (v, t) in Y_dom[b] if abs(t - t_c) <= radius]
+        if (u_c, s_c) not in X_near[b]: X_near[b].append((u_c, s_c))
+        if (v_c, t_c) not in Y_near[b]: Y_near[b].append((v_c, t_c))
+    return X_near, Y_near
+
+
+def fine_start(coarse, X_dom, Y_dom, batches, trucks, units, params):
+    """
+    Warm start para la grilla fina: el plan grueso reparado en la grilla fina (repair_plan de
+    cell8_warmstart; la ocupación fraccional de la etapa gruesa puede solapar en slots enteros) y la
+    construcción de cell8 sobre los dominios finos. Gana el de menos lotes sin reparar y, a igualdad,
+    el de menor objetivo de cell7. Devuelve (chosen_X, chosen_Y, origen, lotes sin reparar).
+    """
+    X_win, Y_win = key_windows([(b, u, t) for b, keys in X_dom.items() for (u, t) in keys],
+                               [(b, v, t) for b, keys in Y_dom.items() for (v, t) in keys])
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+
+    candidates = []
+    heur = heuristic_plan(X_dom, Y_dom, batches, trucks, units, params)
+    if heur is not None:
+        heur_X, heur_Y, forced = heur
+        candidates.append((len(forced), plan_cost(heur_X, heur_Y, proc_by_ui, batch_info, trucks, params),
+                           "heurística de cell8", heur_X, heur_Y, forced))
+    if coarse is not None:
+        rep_X, rep_Y, moved, stuck = repair_plan(*coarse, X_win, Y_win, proc_by_ui, batch_info, params)
+        candidates.append((len(stuck), plan_cost(rep_X, rep_Y, proc_by_ui, batch_info, trucks, params),
+                           f"plan grueso reparado ({len(moved)} lotes movidos)", rep_X, rep_Y, stuck))
+    if not candidates:
+        return None
+    for n_stuck, cost, origin, *_ in candidates:
+        print(f"  Warm start fino candidato: {origin}, objetivo {cost:.1f}, {n_stuck} lotes sin reparar.")
+    _, _, origin, chosen_X, chosen_Y, stuck = min(candidates, key=lambda c: (c[0], c[1]))
+    return chosen_X, chosen_Y, origin, stuck
+
+
+def run():
+    import highspy
+
+    print("\n=== CELDA 11 (MULTI-RESOLUCIÓN): GRILLA GRUESA -> FINA ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    batches = data.shared['df_batches'].to_dict("records")
+    trucks = data.shared['df_trucks'].to_dict("records")
+    units = data.shared['df_units'].to_dict("records")
+
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    coarse_delta = params.get("multires_coarse_delta_min", 30)
+    radius = params.get("multires_radius_min", 2 * coarse_delta)
+    prune = params.get("prune_domains", False)
+    unsupported_options(params)
+    if coarse_delta % delta != 0:
+        # La grilla gruesa debe estar contenida en la fina para reutilizar la solución
+        coarse_delta = max(delta, (coarse_delta // delta) * delta)
+        print(f"ADVERTENCIA: delta grueso ajustado a {coarse_delta} min (múltiplo de delta_min = {delta}).")
+
+    coarse = coarse_solve(batches, trucks, units, params, coarse_delta,
+                          params.get("multires_coarse_time_sec", 120))
+    t_coarse = time.time() - start_time
+
+    time_points = list(range(T1, T2 + 1, delta))
+    X_dom, Y_dom = variable_domains(batches, trucks, units, params, time_points, prune=prune)
+    if prune:
+        data.shared['prune_report'] = prune_report(batches, trucks, units, params, time_points, X_dom, Y_dom)
+    n_full = sum(len(k) for k in X_dom.values()) + sum(len(k) for k in Y_dom.values())
+
+    if coarse is None or len(coarse[0]) < len(batches) or len(coarse[1]) < len(batches):
+        print("ADVERTENCIA: la etapa gruesa no dio solución completa; el vecindario fino se arma "
+              "alrededor de la heurística de cell8.")
+        coarse = None
+    # Warm start verificado en la grilla fina: lo inyecta cell7_matrix.solve() y centra los vecindarios
+    start = fine_start(coarse, X_dom, Y_dom, batches, trucks, units, params)
+    radii = [None]
+    data.shared['warm_X'], data.shared['warm_Y'] = ({}, {}) if start is None else start[:2]
+    if start is not None:
+        print(f"Warm start fino: {start[2]} ({len(start[3])} lotes sin reparar).")
+        radii = [radius, 2 * radius, None]
+
+    # Un solo presupuesto para todos los radios: cada ampliación usa lo que dejó la anterior
+    fine_budget = params.get("multires_fine_time_sec", 7200)
+    fine_start_time = time.time()
+    for r in radii:
+        remaining = fine_budget - (time.time() - fine_start_time)
+        if remaining <= 0:
+            print("ADVERTENCIA: presupuesto de la grilla fina agotado; no se amplía el vecindario.")
+            break
+        if r is None:
+            X_fine, Y_fine = X_dom, Y_dom
+        else:
+            X_fine, Y_fine = neighbourhood_domains(X_dom, Y_dom, *start[:2], r)
+            n_near = sum(len(k) for k in X_fine.values()) + sum(len(k) for k in Y_fine.values())
+            print(f"Vecindario fino (+-{r} min): X+Y {n_full} -> {n_near} variables.")
+
+        model = build_arrays(batches, trucks, units, params, X_fine, Y_fine)
+        model["highs"] = to_highs(model)
+
+        idx = model["col_index"]
+        data.shared['matrix_model'] = model
+        data.shared['X'] = idx["X"]
+        data.shared['Y'] = idx["Y"]
+        data.shared['T_tard'] = idx["T_tard"]
+        data.shared['V_used'] = idx["V_used"]
+        data.shared['units_list'] = units
+        data.shared['batches_list'] = batches
+        data.shared['trucks_list'] = trucks
+        data.shared["time_points"] = time_points
+        data.shared['model_builder'] = "matrix"
+        data.shared['fleet_classes'] = None
+
+        cell7_matrix.solve(time_limit=remaining)
+        if model["highs"].getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+            break
+        if r is not None:
+            print(f"ADVERTENCIA: sin solución en el vecindario de +-{r} min; se amplía.")
+
+    print(f"Multi-resolución: etapa gruesa {t_coarse:.1f} s, total {time.time() - start_time:.1f} s.")
@@ -0,0 +1,283 @@
+# cell11_portfolio.py -- Carrera de configuraciones de solver en procesos separados sobre el mismo modelo
+import data
+import os
+import math
+import time
+import queue
+import signal
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+import numpy as np
+
+from cell11_lns import lp_arrays, highs_from_arrays
+
+# Configuraciones por defecto: HiGHS con otra semilla, más esfuerzo heurístico, sin presolve, y CBC.
+# Las claves que no son "name" / "solver" son opciones de HiGHS o argumentos de CBC (-clave valor)
+DEFAULT_PORTFOLIO = [
+    {"name": "highs_s0", "solver": "highs", "random_seed": 0},
+    {"name": "highs_s1_heur", "solver": "highs", "random_seed": 1, "mip_heuristic_effort": 0.3},
+    {"name": "highs_s2_nopre", "solver": "highs", "random_seed": 2, "presolve": "off"},
+    {"name": "cbc", "solver": "cbc"},
+]
+
+# Segundos antes de time_limit en que se pide el corte limpio (interrupt / SIGINT) para que cada proceso
+# entregue su incumbente; a time_limit los que sigan vivos se matan (CBC puede tardar en atender SIGINT
+# mientras genera cortes en la raíz). Nunca más de un 10% del límite
+STOP_MARGIN_SEC = 2.0
+
+
+def highs_worker(name, arrays, options, start, time_limit, shared, results):
+    """
+    Una configuración HiGHS en su propio proceso. Cada incumbente que mejora el mejor global se copia
+    al buffer compartido; en cbMipUserSolution se inyecta el mejor global si es de otro proceso.
+    Corta cuando el proceso principal activa stop. Al final envía ("done", ...) con su solución y la
+    hora (time.time()) en que llegó a su mejor objetivo, para el desempate de race.
+    """
+    import highspy
+
+    best_obj, best_sol, version, stop = shared
+    h = highs_from_arrays(arrays)
+    for key, value in options.items():
+        h.setOptionValue(key, value)
+    h.setOptionValue("time_limit", float(time_limit))
+    if start is not None:
+        h.setSolution(len(start[0]), start[0], start[1])
+    own = {"best": math.inf, "seen": 0, "found": None}
+
+    def on_improving(e):
+        objective = e.data_out.objective_function_value
+        if objective < own["best"] - 1e-9:
+            own["best"], own["found"] = objective, time.time()
+        with best_obj.get_lock():
+            if objective < best_obj.value - 1e-9:
+                best_obj.value = objective
+                np.frombuffer(best_sol)[:] = e.data_out.mip_solution
+                version.value += 1
+                own["seen"] = version.value
+                results.put(("incumbent", name, objective))
+
+    def on_user_solution(e):
+        if version.value == own["seen"]:
+            return
+        with best_obj.get_lock():
+            own["seen"] = version.value
+            if best_obj.value < own["best"] - 1e-9:
+                own["best"], own["found"] = best_obj.value, time.time()
+                e.data_in.setSolution(np.frombuffer(best_sol).copy())
+
+    def on_interrupt(e):
+        if stop.is_set():
+            e.interrupt()
+
+    h.cbMipImprovingSolution.subscribe(on_improving)
+    h.cbMipUserSolution.subscribe(on_user_solution)
+    h.cbMipInterrupt.subscribe(on_interrupt)
+    h.run()
+    status = h.getModelStatus()
+    proven = status == highspy.HighsModelStatus.kOptimal
+    if h.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+        results.put(("done", name, h.modelStatusToString(status), proven,
+                     h.getInfo().objective_function_value, np.asarray(h.getSolution().col_value), own["found"]))
+    else:
+        results.put(("done", name, h.modelStatusToString(status), proven, None, None, None))
+
+
+def start_cbc(h, name, options, start, time_limit, work_dir):
+    """Lanza el ejecutable CBC de PuLP sobre el MPS del modelo (warm start con -mips). Devuelve (proceso, solución)."""
+    import pulp
+
+    mps_path = os.path.join(work_dir, "model.mps")
+    if not os.path.exists(mps_path):
+        h.writeModel(mps_path)
+    sol_path = os.path.join(work_dir, f"{name}.sol")
+    args = [pulp.PULP_CBC_CMD().path, mps_path]
+    if start is not None:
+        # Sin nombres en el modelo, HiGHS escribe las columnas como c0, c1, ...
+        mst_path = os.path.join(work_dir, f"{name}.mst")
+        with open(mst_path, "w") as f:
+            for i, (j, value) in enumerate(zip(*start)):
+                f.write(f"{i} c{j} {value}\n")
+        args += ["-mips", mst_path]
+    args += ["-sec", str(time_limit), "-threads", str(options.pop("threads", 1))]
+    for key, value in options.items():
+        args += [f"-{key}", str(value)]
+    args += ["-solve", "-solu", sol_path]
+    with open(f"solver_cbc_{name}.log", "w") as log:
+        return subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT), sol_path
+
+
+def read_cbc_solution(sol_path, n_cols):
+    """
+    Archivo -solu de CBC -> (estado, probado, objetivo, col_value) o None si no hay archivo.
+    probado = óptimo probado; la inviabilidad se lee del estado (infeasible()), no es un plan.
+    """
+    if not os.path.exists(sol_path):
+        return None
+    with open(sol_path) as f:
+        header = f.readline()
+        col_value = np.zeros(n_cols)
+        for line in f:
+            parts = line.replace("**", " ").split()
+            if len(parts) >= 3:
+                col_value[int(parts[0])] = float(parts[2])
+    status = header.split(" - ")[0].strip()
+    proven = status.startswith("Optimal")
+    objective = float(header.rsplit(" ", 1)[1]) if "objective value" in header else math.inf
+    # Sin incumbente CBC informa objetivo 1e50 o, cortado con SIGINT, la relajación continua
+    if status.startswith("Infeasible") or objective >= 1e49 or "no integer solution" in header:
+        return status, proven, None, None
+    return status, proven, objective, col_value
+
+
+def infeasible(run):
+    """El miembro probó que el modelo no tiene solución (HiGHS "Infeasible", CBC "Infeasible - ...")."""
+    return run["status"].startswith("Infeasible")
+
+
+def finished(run):
+    """Solo un óptimo probado con solución termina la carrera como ganador."""
+    return run["proven"] and run["col_value"] is not None
+
+
+def race(h, params, time_limit, start=None):
+    """
+    Resuelve el modelo de h con las configuraciones de solver_portfolio_configs en procesos paralelos.
+    Los procesos HiGHS comparten el mejor incumbente (buffer en memoria compartida); CBC arranca con
+    el warm start y entrega su solución al terminar. Gana el primer resultado probado óptimo o, si no
+    hay, el mejor incumbente; si un miembro prueba que el modelo es infactible la carrera termina sin
+    ganador y el reporte lo indica (infeasible). time_limit es de reloj de pared para toda la carrera: los miembros corren
+    hasta STOP_MARGIN_SEC antes, se cortan limpio (interrupt / SIGINT) y a time_limit se matan los que
+    sigan vivos. Empates en el objetivo: gana el que llegó antes a ese valor (HiGHS informa la hora de su
+    mejor incumbente; de CBC solo se conoce cuándo terminó) y, si persiste, el primero en
+    solver_portfolio_configs. start es el warm start (columnas, valores). Devuelve el reporte de la
+    carrera con col_value.
+    """
+    configs = params.get("solver_portfolio_configs", DEFAULT_PORTFOLIO)
+    n_cols = h.getNumCol()
+    arrays = lp_arrays(h)
+    if start is not None:
+        start = (np.asarray(start[0], dtype=np.int32), np.asarray(start[1], dtype=np.float64))
+
+    # spawn: un fork heredaría el scheduler de hilos de HiGHS ya iniciado en este proceso
+    ctx = multiprocessing.get_context("spawn")
+    best_obj = ctx.Value("d", math.inf)
+    shared = (best_obj, ctx.RawArray("d", n_cols), ctx.RawValue("i", 0), ctx.Event())
+    results = ctx.Queue()
+    work_dir = tempfile.mkdtemp(prefix="portfolio_")
+    margin = min(STOP_MARGIN_SEC, 0.1 * time_limit)
+    member_limit = time_limit - margin
+
+    start_time = time.time()
+    order = {}
+    workers, cbc = {}, {}
+    for k, config in enumerate(configs):
+        options = {key: value for key, value in config.items() if key not in ("name", "solver")}
+        name = config.get("name", f"{config.get('solver', 'highs')}_{k}")
+        order[name] = k
+        if config.get("solver", "highs") == "cbc":
+            cbc[name] = start_cbc(h, name, options, start, member_limit, work_dir)
+        else:
+            workers[name] = ctx.Process(target=highs_worker, daemon=True,
+                                        args=(name, arrays, options, start, member_limit, shared, results))
+            workers[name].start()
+    print(f"Portafolio: {len(configs)} configuraciones en carrera ({', '.join([*workers, *cbc])}), "
+          f"límite {time_limit:.0f} s.")
+
+    runs, winner, proof = {}, None, None
+    best_name, best_found = None, None
+
+    def collect(message):
+        nonlocal best_name, best_found, proof
+        if message[0] == "incumbent":
+            _, name, objective = message
+            best_name, best_found = name, round(time.time() - start_time, 2)
+            print(f"  Incumbente compartido: {objective:.1f} de {name} a los {best_found:.1f} s")
+            return None
+        _, name, status, proven, objective, col_value, *found = message
+        seconds = round(time.time() - start_time, 2)
+        found = round(found[0] - start_time, 2) if found and found[0] is not None else seconds
+        runs[name] = {"status": status, "proven": proven, "objective": objective,
+                      "seconds": seconds, "found": found, "col_value": col_value}
+        if infeasible(runs[name]) and proof is None:
+            proof = name
+        return name if finished(runs[name]) else None
+
+    # 1. Carrera: hasta el primer resultado probado (óptimo o infactible), el corte de los miembros o que terminen todos
+    while (winner is None and proof is None and len(runs) < len(configs)
+           and time.time() - start_time < member_limit):
+        try:
+            winner = collect(results.get(timeout=0.2))
+        except queue.Empty:
+            pass
+        for name, (proc, sol_path) in cbc.items():
+            if winner is None and proof is None and name not in runs and proc.poll() is not None:
+                winner = collect(("done", name, *(read_cbc_solution(sol_path, n_cols) or ("Error", False, None, None))))
+
+    # 2. Corte limpio del resto: interrupt de HiGHS en su próximo callback, SIGINT a CBC (escribe su incumbente)
+    shared[3].set()
+    for name, (proc, _) in cbc.items():
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGINT)
+    # Sin ganador probado se espera a los incumbentes hasta time_limit; con ganador, solo hasta el margen
+    deadline = start_time + time_limit if winner is None and proof is None else min(start_time + time_limit, time.time() + margin)
+    while len(runs) < len(configs) and time.time() < deadline:
+        for name, (proc, sol_path) in cbc.items():
+            if name not in runs and proc.poll() is not None:
+                collect(("done", name, *(read_cbc_solution(sol_path, n_cols) or ("Error", False, None, None))))
+        try:
+            collect(results.get(timeout=0.2))
+        except queue.Empty:
+            pass
+    for name, proc in workers.items():
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(timeout=1)
+            runs.setdefault(name, {"status": "Terminated", "proven": False, "objective": None,
+                                   "seconds": round(time.time() - start_time, 2), "found": None, "col_value": None})
+    for name, (proc, _) in cbc.items():
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+            runs.setdefault(name, {"status": "Terminated", "proven": False, "objective": None,
+                                   "seconds": round(time.time() - start_time, 2), "found": None, "col_value": None})
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    # 3. Resultado: el probado o el mejor incumbente (de un proceso o del buffer compartido), con el
+    # desempate determinista (objetivo, hora en que se alcanzó, orden en la configuración)
+    if winner is None:
+        done = [(round(run["objective"], 6), run["found"], order[name], False, name)
+                for name, run in runs.items() if run["objective"] is not None]
+        if best_name is not None:
+            done.append((round(best_obj.value, 6), best_found, order[best_name], True, best_name))
+        if done:
+            *_, from_buffer, winner = min(done)
+            if from_buffer:
+                # El mejor valor solo quedó en el buffer compartido (su proceso no llegó a entregarlo)
+                winner = best_name
+                runs[winner] = dict(runs.get(winner, {"status": "Terminated", "proven": False, "seconds": None}),
+                                    objective=best_obj.value, found=best_found,
+                                    col_value=np.frombuffer(shared[1]).copy())
+    report = {
+        "winner": winner,
+        "proven": bool(winner and runs[winner]["proven"]),
+        "infeasible": winner is None and proof is not None,
+        "objective": runs[winner]["objective"] if winner else None,
+        "col_value": runs[winner]["col_value"] if winner else None,
+        "seconds": round(time.time() - start_time, 2),
+        "runs": {name: {key: value for key, value in run.items() if key != "col_value"} for name, run in runs.items()},
+    }
+    for name, run in report["runs"].items():
+        objective = f"{run['objective']:.1f}" if run["objective"] is not None else "sin solución"
+        print(f"  {name}: {run['status']}, {objective} ({run['seconds']} s)")
+    if winner:
+        objective = f"{report['objective']:.1f}" if report["objective"] is not None else "sin objetivo"
+        print(f"Portafolio: gana {winner} con {objective} "
+              f"({'óptimo probado' if report['proven'] else 'mejor incumbente al límite'}) en {report['seconds']} s.")
+    elif report["infeasible"]:
+        print(f"Portafolio: {proof} probó que el modelo es infactible en {report['seconds']} s.")
+    else:
+        print("Portafolio: ninguna configuración encontró solución.")
+    data.shared['portfolio_report'] = {key: value for key, value in report.items() if key != "col_value"}
+    return report
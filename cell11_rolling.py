@@ -0,0 +1,276 @@
+# cell11_rolling.py -- Horizonte rodante: sub-MILPs por ventana de tiempo con prefijo congelado
+import data
+import math
+import time
+import numpy as np
+from collections import defaultdict
+
+from cell5 import batch_view
+from cell7 import batch_windows, variable_domains
+from cell7_fleet import truck_classes
+from cell7_matrix import build_arrays, to_highs, configure_highs, decode_solution, unsupported_options
+from cell8 import key_windows, batch_table, build_plan
+from cell8_warmstart import repair_plan
+
+
+def release_times(batches, units, params):
+    """
+    Instante de liberación de cada lote: inicio de su ventana de salida (cell7.batch_windows),
+    forzado a ser no decreciente dentro de cada sitio para respetar el orden de Eq. 13.
+    """
+    windows = batch_windows(batches, units, params)
+    release, last_by_site = {}, {}
+    for b_idx, batch in enumerate(batches):
+        site_id = str(batch["site_id"]).strip().lower()
+        release[b_idx] = max(windows[b_idx]["dep"][0], last_by_site.get(site_id, -math.inf))
+        last_by_site[site_id] = release[b_idx]
+    return release
+
+
+def frozen_context(active, committed_X, committed_Y, batches, units, params, X_dom, Y_dom):
+    """
+    Lotes congelados que siguen interactuando con la ventana:
+    - ocupan una unidad o un camión más allá del primer instante posible de los lotes activos,
+    - o son el último lote congelado de un sitio con lotes activos (Eq. 13 / Eq. 14).
+    Por sitio se completa el sufijo para no romper la cadena de Eq. 14 entre congelados.
+    """
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    k_wash = int(math.ceil(wash / delta))
+
+    horizon_lo = min(
+        min([t for (_, t) in X_dom[b]] + [t - k_wash * delta for (_, t) in Y_dom[b]] or [math.inf])
+        for b in active
+    )
+
+    frozen_by_site = defaultdict(list)
+    for b in sorted(committed_X):
+        frozen_by_site[str(batches[b]["site_id"]).strip().lower()].append(b)
+    active_sites = {str(batches[b]["site_id"]).strip().lower() for b in active}
+
+    travel_b = batch_view(batches)["travel"]
+    keep = set()
+    for site, members in frozen_by_site.items():
+        travel = float(travel_b[members[0]])
+        first = None
+        for pos, b in enumerate(members):
+            (_, u, s), t = committed_X[b], committed_Y[b][2]
+            unit_end = s + float(units[u]["process_time_min"])
+            truck_end = t + int(math.ceil((2 * travel + unload) / delta)) * delta
+            if max(unit_end, truck_end) > horizon_lo:
+                first = pos
+                break
+        if site in active_sites and first is None:
+            first = len(members) - 1
+        if first is not None:
+            keep.update(members[first:])
+    return sorted(keep)
+
+
+def tardiness_of(b, depart, batches, params):
+    """Tardanza exacta del lote fijado (con time limit, T_tard del sub-MILP puede quedar holgada)."""
+    site = batch_view([batches[b]])
+    tw_end, travel = int(site["tw_end"][0]), float(site["travel"][0])
+    return max(0.0, depart + travel + params.get("unload_time", 30) - tw_end)
+
+
+def window_start(active, frozen_plan, domains, proc_by_ui, batch_info, classes, params):
+    """
+    Warm start de la ventana: construcción de cell8 sobre los lotes activos y reparación en la grilla
+    contra las decisiones congeladas (repair_plan con fixed). Devuelve ({b: ((b,u,t), (b,v,t))}, lotes
+    sin reparar) o (None, None) si algún activo no tiene dominio.
+    """
+    X_win, Y_win = key_windows([(b, u, t) for b in active for (u, t) in domains[0][b]],
+                               [(b, v, t) for b in active for (v, t) in domains[1][b]])
+    if any(not X_win.get(b) or not Y_win.get(b) for b in active):
+        return None, None
+    # build_plan recorre los índices globales y salta los lotes sin ventana (los no activos)
+    chosen_X, chosen_Y, _, _ = build_plan(len(batch_info), X_win, Y_win, proc_by_ui, batch_info, classes, params)
+    chosen_X, chosen_Y, _, stuck = repair_plan(chosen_X, chosen_Y, X_win, Y_win, proc_by_ui, batch_info, params,
+                                               fixed=frozen_plan)
+    return {b: (chosen_X[b], chosen_Y[b]) for b in active}, stuck
+
+
+def solve_window(sub, batches, trucks, units, params, domains, time_limit, warm=None):
+    """
+    Construye y resuelve el sub-MILP de la ventana (índices locales 0..len(sub)-1).
+    warm: {b: ((b,u,t), (b,v,t))} de la ventana anterior; se pasa como solución parcial
+    y HiGHS completa el resto de los lotes.
+    """
+    import highspy
+
+    X_dom = {i: list(domains[0][b]) for i, b in enumerate(sub)}
+    Y_dom = {i: list(domains[1][b]) for i, b in enumerate(sub)}
+    model = build_arrays([batches[b] for b in sub], trucks, units, params, X_dom, Y_dom)
+
+    h = to_highs(model)
+    h.silent()
+    configure_highs(h, time_limit)
+    if warm:
+        idx = model["col_index"]
+        cols = []
+        for i, b in enumerate(sub):
+            if b in warm:
+                (_, u, s), (_, v, t) = warm[b]
+                if (i, u, s) in idx["X"] and (i, v, t) in idx["Y"]:
+                    cols += [idx["X"][(i, u, s)], idx["Y"][(i, v, t)]]
+        if cols:
+            h.setSolution(len(cols), np.array(cols, dtype=np.int32), np.ones(len(cols)))
+    h.run()
+
+    info = h.getInfo()
+    if info.primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        return None, h.modelStatusToString(h.getModelStatus()), model["A"].shape[1]
+    chosen_X, chosen_Y, _, _ = decode_solution(model, np.asarray(h.getSolution().col_value))
+    solution = {
+        "X": {sub[i]: (sub[i], u, t) for i, (_, u, t) in chosen_X.items()},
+        "Y": {sub[i]: (sub[i], v, t) for i, (_, v, t) in chosen_Y.items()},
+    }
+    return solution, h.modelStatusToString(h.getModelStatus()), model["A"].shape[1]
+
+
+def run():
+    print("\n=== CELDA 11 (HORIZONTE RODANTE): SOLVE POR VENTANAS ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    batches = data.shared['df_batches'].to_dict("records")
+    trucks = data.shared['df_trucks'].to_dict("records")
+    units = data.shared['df_units'].to_dict("records")
+
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    time_points = list(range(T1, T2 + 1, delta))
+    prune = params.get("prune_domains", False)
+    unsupported_options(params)
+
+    window_len = params.get("rolling_window_min", 240)
+    step = params.get("rolling_step_min", 120)
+    window_time = params.get("rolling_window_time_sec", 120)
+    budget = params.get("rolling_time_budget_sec")
+    if params.get("transport_model", "per_truck") != "per_truck":
+        print("ADVERTENCIA: el horizonte rodante usa el modelo por camión (transport_model ignorado).")
+
+    domains = variable_domains(batches, trucks, units, params, time_points, prune=prune)
+    # Semilla de cada ventana: construcción de cell8 (índices globales)
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+    classes = truck_classes(trucks)
+    full_domains = None  # red completa, solo si una ventana podada resulta infactible
+    release = release_times(batches, units, params)
+
+    B = len(batches)
+    print(f"{B} lotes, ventanas de {window_len} min con paso {step} min "
+          f"(solape {window_len - step} min), {window_time} s por ventana.")
+
+    committed_X, committed_Y, committed_T = {}, {}, {}
+    previous = {}  # última solución de cada lote aún no fijado
+    pending = set(range(B))
+    w0 = T1
+    n_window = 0
+    while pending:
+        w_end = w0 + window_len
+        active = sorted(b for b in pending if release[b] < w_end)
+        last = len(active) == len(pending)
+        if not active:
+            w0 += step
+            continue
+        n_window += 1
+
+        limit = window_time
+        if budget is not None:
+            remaining = budget - (time.time() - start_time)
+            n_left = max(1, int(math.ceil((max(release[b] for b in pending) - w0) / step)) + 1)
+            limit = max(1.0, min(window_time, remaining / n_left))
+
+        frozen = frozen_context(active, committed_X, committed_Y, batches, units, params, *domains)
+        # Lotes congelados: dominio de un único (u, t) / (v, t) con la decisión ya tomada
+        fixed_X = {b: [committed_X[b][1:]] for b in frozen}
+        fixed_Y = {b: [committed_Y[b][1:]] for b in frozen}
+        sub = sorted(frozen + active)
+
+        # Warm start: decisiones congeladas + construcción de cell8 reparada para los activos (completa y
+        # sin solapes); si quedan lotes sin reparar, la solución de la ventana anterior para los que siguen
+        frozen_plan = {b: (committed_X[b], committed_Y[b]) for b in frozen}
+        seed, stuck = window_start(active, frozen_plan, domains, proc_by_ui, batch_info, classes, params)
+        warm = dict(frozen_plan)
+        if seed is not None and not stuck:
+            warm.update(seed)
+        else:
+            warm.update({b: key for b, key in previous.items() if b in pending})
+
+        t_win = time.time()
+        solution, status, n_cols = solve_window(
+            sub, batches, trucks, units, params,
+            ({**domains[0], **fixed_X}, {**domains[1], **fixed_Y}), limit, warm)
+        if solution is None and prune and status == "Infeasible":
+            print(f"  Ventana {n_window}: sin solución con dominios podados ({status}), se reintenta con la red completa.")
+            if full_domains is None:
+                full_domains = variable_domains(batches, trucks, units, params, time_points, prune=False)
+            # Con la red completa los activos pueden ir antes: se recalcula el contexto congelado
+            frozen = frozen_context(active, committed_X, committed_Y, batches, units, params, *full_domains)
+            fixed_X = {b: [committed_X[b][1:]] for b in frozen}
+            fixed_Y = {b: [committed_Y[b][1:]] for b in frozen}
+            sub = sorted(frozen + active)
+            frozen_plan = {b: (committed_X[b], committed_Y[b]) for b in frozen}
+            seed, stuck = window_start(active, frozen_plan, full_domains, proc_by_ui, batch_info, classes, params)
+            warm = dict(frozen_plan)
+            warm.update(seed if seed is not None and not stuck else
+                        {b: key for b, key in previous.items() if b in pending})
+            solution, status, n_cols = solve_window(
+                sub, batches, trucks, units, params,
+                ({**full_domains[0], **fixed_X}, {**full_domains[1], **fixed_Y}), limit, warm)
+        if solution is None and seed is not None and not stuck:
+            # Sin incumbente en el tiempo de la ventana: se fija la semilla (factible en las filas duras)
+            # para que el conjunto activo no crezca hasta el monolito
+            solution = {"X": {b: seed[b][0] for b in active}, "Y": {b: seed[b][1] for b in active}}
+            status += " (semilla de cell8)"
+
+        committed = []
+        if solution is not None:
+            previous = {b: (solution["X"][b], solution["Y"][b]) for b in active}
+            # Se fija el prefijo que sale antes del fin del paso (la última ventana fija todo)
+            for b in active:
+                if last or solution["Y"][b][2] < w0 + step:
+                    committed_X[b] = solution["X"][b]
+                    committed_Y[b] = solution["Y"][b]
+                    committed_T[b] = tardiness_of(b, committed_Y[b][2], batches, params)
+                    committed.append(b)
+            pending.difference_update(committed)
+
+        print(f"  Ventana {n_window} [{w0}, {w_end}): {len(active)} activos, {len(frozen)} congelados, "
+              f"{n_cols} columnas, {status} en {time.time() - t_win:.1f} s -> {len(committed)} fijados.")
+
+        if solution is None and last:
+            print("ADVERTENCIA: la última ventana no encontró solución; el cronograma queda incompleto.")
+            break
+        w0 += step
+
+    used_trucks_set = {key[1] for key in committed_Y.values()}
+    tardiness = sum(committed_T.values())
+    print("\n--- HORIZONTE RODANTE FINALIZADO ---")
+    print(f"Ventanas resueltas: {n_window}")
+    print(f"Tiempo Total: {time.time() - start_time:.2f} segundos")
+    print(f"Tardanza total: {tardiness:.1f} min")
+
+    # No hay modelo global: X / Y quedan como las claves de la solución fijada
+    data.shared['X'] = {key: 1.0 for key in committed_X.values()}
+    data.shared['Y'] = {key: 1.0 for key in committed_Y.values()}
+    data.shared['T_tard'] = dict(committed_T)
+    data.shared['V_used'] = {v: (1.0 if v in used_trucks_set else 0.0) for v in range(len(trucks))}
+    data.shared['units_list'] = units
+    data.shared['batches_list'] = batches
+    data.shared['trucks_list'] = trucks
+    data.shared["time_points"] = time_points
+    data.shared['model_builder'] = "rolling"
+    data.shared['fleet_classes'] = None
+
+    data.shared["chosen_X"] = dict(committed_X)
+    data.shared["chosen_Y"] = dict(committed_Y)
+    data.shared["Tt_frac"] = dict(committed_T)
+    data.shared["V_used_frac"] = dict(data.shared['V_used'])
+
+    print(f"Resumen Solución: {len(committed_X)} lotes producidos, {len(committed_Y)} lotes transportados.")
+    print(f"Flota utilizada: {len(used_trucks_set)} camiones.")
+    print("=== CELDA 11 (HORIZONTE RODANTE): FIN ===")
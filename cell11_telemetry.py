@@ -0,0 +1,179 @@
+# cell11_telemetry.py -- Serie de tiempo del progreso del solve (cotas, gap, nodos) en JSON Lines y Prometheus
+import data
+import os
+import re
+import json
+import math
+import time
+import threading
+
+# Fila de la tabla de progreso del log de HiGHS (la misma con highspy y con el ejecutable)
+LOG_ROW = re.compile(r"^\s*[A-Za-z]?\s+(\d+)\s+\d+\s+\d+\s+[\d.]+%\s+(\S+)\s+(\S+)\s+([\d.]+%|Large|inf)"
+                     r"\s+\d+\s+\d+\s+\d+\s+\d+\s+([\d.]+)s\s*$")
+
+# Gauges del textfile de Prometheus: (nombre, campo del registro, ayuda)
+PROM_METRICS = [
+    ("concrete_solver_primal_bound", "primal", "Objetivo del mejor incumbente"),
+    ("concrete_solver_dual_bound", "dual", "Cota dual del MIP"),
+    ("concrete_solver_gap", "gap", "Gap relativo primal-dual"),
+    ("concrete_solver_nodes", "nodes", "Nodos de branch-and-bound explorados"),
+    ("concrete_solver_elapsed_seconds", "t", "Segundos desde el inicio del solve"),
+]
+
+
+def finite(x):
+    return float(x) if x is not None and math.isfinite(x) else None
+
+
+def start(params, source):
+    """Estado de una corrida, o None si no hay telemetry_file ni telemetry_prom_file."""
+    if not (params.get("telemetry_file") or params.get("telemetry_prom_file")):
+        return None
+    return {"run_id": f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}", "source": source, "params": params,
+            "interval": params.get("telemetry_interval_sec", 1.0), "last_emit": -math.inf,
+            "samples": 0, "first_incumbent_sec": None, "last": None}
+
+
+def write_prom(state, record, running):
+    """Textfile para el node_exporter (se reemplaza entero con cada registro)."""
+    path = state["params"]["telemetry_prom_file"]
+    labels = f'run_id="{state["run_id"]}",source="{state["source"]}"'
+    lines = []
+    for name, field, help_text in PROM_METRICS + [("concrete_solver_running", "running", "1 mientras el solve sigue")]:
+        value = running if field == "running" else record[field]
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                  f"{name}{{{labels}}} {'NaN' if value is None else value}"]
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def record(state, event, elapsed, primal, dual, gap, nodes, status=None):
+    """Un registro de la serie: JSON Lines (se agrega) y textfile de Prometheus (se reemplaza)."""
+    rec = {"run_id": state["run_id"], "source": state["source"], "event": event, "t": round(elapsed, 3),
+           "wall": round(time.time(), 3), "primal": finite(primal), "dual": finite(dual), "gap": finite(gap),
+           "nodes": int(nodes) if nodes is not None else None}
+    if status is not None:
+        rec["status"] = status
+    if event == "incumbent" and state["first_incumbent_sec"] is None:
+        state["first_incumbent_sec"] = rec["t"]
+    path = state["params"].get("telemetry_file")
+    if path:
+        with open(path, "a") as f:
+            f.write(json.dumps(rec) + "\n")
+    if state["params"].get("telemetry_prom_file"):
+        write_prom(state, rec, 0 if event == "end" else 1)
+    state["samples"] += 1
+    state["last"] = rec
+
+
+def finish(state, status, final=None):
+    """
+    Registro final con el estado del solve y final = (segundos, primal, dual, gap, nodos) si se conocen
+    (si no, los del último registro). Deja el resumen en data.shared['telemetry_report'].
+    """
+    last = state["last"] or {"t": 0.0, "primal": None, "dual": None, "gap": None, "nodes": None}
+    record(state, "end", *(final or (last["t"], last["primal"], last["dual"], last["gap"], last["nodes"])), status)
+    last = state["last"]
+    report = {"run_id": state["run_id"], "samples": state["samples"], "first_incumbent_sec": state["first_incumbent_sec"],
+              "elapsed_sec": last["t"], "final_gap": last["gap"], "nodes": last["nodes"], "status": status}
+    gap = f"{last['gap'] * 100:.2f}%" if last["gap"] is not None else "sin cota"
+    print(f"Telemetría {state['run_id']}: {state['samples']} registros, primer incumbente a los "
+          f"{state['first_incumbent_sec']} s, gap final {gap}, {last['nodes']} nodos en {last['t']:.1f} s.")
+    data.shared['telemetry_report'] = report
+    return report
+
+
+def attach(h, params, source="highspy"):
+    """
+    Callbacks de highspy: cada telemetry_interval_sec un registro de progreso (cbMipInterrupt) y uno por
+    incumbente que mejora (cbMipImprovingSolution). Devuelve el estado para detach() o None si está apagada.
+    """
+    state = start(params, source)
+    if state is None:
+        return None
+
+    def on_interrupt(e):
+        out = e.data_out
+        if out.running_time - state["last_emit"] >= state["interval"]:
+            state["last_emit"] = out.running_time
+            record(state, "progress", out.running_time, out.mip_primal_bound, out.mip_dual_bound, out.mip_gap,
+                   out.mip_node_count)
+
+    def on_incumbent(e):
+        out = e.data_out
+        record(state, "incumbent", out.running_time, out.objective_function_value, out.mip_dual_bound, out.mip_gap,
+               out.mip_node_count)
+
+    state["callbacks"] = (on_interrupt, on_incumbent)
+    h.cbMipInterrupt.subscribe(on_interrupt)
+    h.cbMipImprovingSolution.subscribe(on_incumbent)
+    return state
+
+
+def detach(h, state):
+    if state is None:
+        return None
+    on_interrupt, on_incumbent = state["callbacks"]
+    h.cbMipInterrupt.unsubscribe(on_interrupt)
+    h.cbMipImprovingSolution.unsubscribe(on_incumbent)
+    info = h.getInfo()
+    return finish(state, h.modelStatusToString(h.getModelStatus()),
+                  (h.getRunTime(), info.objective_function_value, info.mip_dual_bound, info.mip_gap, info.mip_node_count))
+
+
+def parse_rows(text, state):
+    """Filas de progreso del log -> registros (un incumbente nuevo cuando baja la mejor solución)."""
+    for line in text.splitlines():
+        match = LOG_ROW.match(line)
+        if not match:
+            continue
+        nodes, dual, primal, gap, elapsed = match.groups()
+        primal, dual = float(primal), float(dual)
+        gap = float(gap[:-1]) / 100 if gap.endswith("%") else None
+        last_primal = state["last"]["primal"] if state["last"] else None
+        event = "incumbent" if finite(primal) is not None and (last_primal is None or primal < last_primal) else "progress"
+        record(state, event, float(elapsed), primal, dual, gap, int(nodes))
+
+
+def tail_log(log_path, offset, params, source="highs_cmd"):
+    """
+    Para el ejecutable (sin callbacks): un hilo lee el log de HiGHS desde offset cada telemetry_interval_sec
+    y registra las filas nuevas de la tabla de progreso. Devuelve el estado para stop_tail() o None.
+    """
+    state = start(params, source)
+    if state is None:
+        return None
+    state["stop"] = threading.Event()
+
+    def follow():
+        position, pending = offset, ""
+        while True:
+            stopping = state["stop"].is_set()
+            try:
+                with open(log_path, "rb") as f:
+                    f.seek(position)
+                    chunk = f.read().decode("utf-8", errors="replace")
+                    position = f.tell()
+            except OSError:
+                chunk = ""
+            # Solo líneas completas; la última parcial espera a la próxima lectura
+            pending += chunk
+            complete, _, pending = pending.rpartition("\n")
+            parse_rows(complete, state)
+            if stopping:
+                parse_rows(pending, state)
+                return
+            state["stop"].wait(state["interval"])
+
+    state["thread"] = threading.Thread(target=follow, daemon=True)
+    state["thread"].start()
+    return state
+
+
+def stop_tail(state, status):
+    if state is None:
+        return None
+    state["stop"].set()
+    state["thread"].join()
+    return finish(state, status)
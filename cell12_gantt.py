@@ -5,6 +5,7 @@ import matplotlib.colors as mcolors
 import pandas as pd
 import numpy as np
 import data
+from cell5 import batch_view
 
 def minutes_to_hhmm(minutes):
     """Convierte minutos absolutos (ej. 480) a formato hora (08:00)."""
@@ -24,16 +25,21 @@ def run():
     print("=== CELDA 12: GENERANDO DIAGRAMA DE GANTT (Carga, Espera, Lavado, Viaje, Descarga) ===")
     
     # 1. Recuperar datos del contexto compartido
-    if 'X' not in data.shared or 'Y' not in data.shared:
+    if 'chosen_X' in data.shared and 'chosen_Y' in data.shared:
+        # Solución ya decodificada por el solver (cell11 / cell7_matrix)
+        X_sol = list(data.shared['chosen_X'].values()) # Producción
+        Y_sol = list(data.shared['chosen_Y'].values()) # Transporte
+    elif 'X' in data.shared and 'Y' in data.shared:
+        X_sol = [key for key, var in data.shared['X'].items() if var.varValue and var.varValue > 0.5]
+        Y_sol = [key for key, var in data.shared['Y'].items() if var.varValue and var.varValue > 0.5]
+    else:
         print("Error: No se encontraron soluciones (X, Y) en data.shared")
         return
 
-    X_vars = data.shared['X'] # Producción
-    Y_vars = data.shared['Y'] # Transporte
     batches = data.shared['batches_list']
     units = data.shared['units_list']
     trucks = data.shared['trucks_list']
-    site_map = data.shared['site_map']
+    view = batch_view(batches)
     params = data.shared['params']
 
     # Parámetros globales
@@ -53,56 +59,44 @@ def run():
     # para dibujar la "Carga" en el camión.
     batch_prod_info = {} # {batch_id: {'start': t, 'end': t+proc, 'duration': proc}}
     
-    for (b_idx, u_idx, t), var in X_vars.items():
-        if var.varValue and var.varValue > 0.5:
-            proc_time = float(units[u_idx]["process_time_min"])
-            site_id = str(batches[b_idx]["site_id"]).strip().lower()
-            
-            schedule_units.append({
-                "unit": u_idx,
-                "start": t,
-                "duration": proc_time,
-                "site": site_id,
-                "batch": b_idx
-            })
-            batch_prod_info[b_idx] = {
-                'start': t,
-                'end': t + proc_time,
-                'duration': proc_time
-            }
+    for (b_idx, u_idx, t) in X_sol:
+        proc_time = float(units[u_idx]["process_time_min"])
+        site_id = str(batches[b_idx]["site_id"]).strip().lower()
+        
+        schedule_units.append({
+            "unit": u_idx,
+            "start": t,
+            "duration": proc_time,
+            "site": site_id,
+            "batch": b_idx
+        })
+        batch_prod_info[b_idx] = {
+            'start': t,
+            'end': t + proc_time,
+            'duration': proc_time
+        }
 
     # B) Procesar Transporte (Y)
     active_trucks = set()
-    for (b_idx, v_idx, t), var in Y_vars.items():
-        if var.varValue and var.varValue > 0.5:
-            site_id = str(batches[b_idx]["site_id"]).strip().lower()
-            site_data = site_map.get(site_id, {})
-            travel_time = float(site_data.get("travel_time_min", 0))
-            tw_end_h = site_data.get("tw_end_h", 17.0)
-            
-            try:
-                if isinstance(tw_end_h, str) and ":" in tw_end_h:
-                    hh, mm = map(int, tw_end_h.split(":"))
-                    tw_end_min = hh * 60 + mm
-                else:
-                    tw_end_min = int(float(tw_end_h) * 60)
-            except:
-                tw_end_min = T2
-
-            # Obtener datos de producción para este lote
-            prod_data = batch_prod_info.get(b_idx, {'start': T1, 'end': T1, 'duration': 0})
-            
-            schedule_trucks.append({
-                "truck": v_idx,
-                "depart": t,
-                "travel": travel_time,
-                "site": site_id,
-                "batch": b_idx,
-                "prod_start": prod_data['start'],   # Inicio Carga
-                "prod_end": prod_data['end'],       # Fin Carga
-                "tw_end": tw_end_min
-            })
-            active_trucks.add(v_idx)
+    for (b_idx, v_idx, t) in Y_sol:
+        site_id = str(batches[b_idx]["site_id"]).strip().lower()
+        travel_time = float(view["travel"][b_idx])
+        tw_end_min = int(view["tw_end"][b_idx])
+
+        # Obtener datos de producción para este lote
+        prod_data = batch_prod_info.get(b_idx, {'start': T1, 'end': T1, 'duration': 0})
+        
+        schedule_trucks.append({
+            "truck": v_idx,
+            "depart": t,
+            "travel": travel_time,
+            "site": site_id,
+            "batch": b_idx,
+            "prod_start": prod_data['start'],   # Inicio Carga
+            "prod_end": prod_data['end'],       # Fin Carga
+            "tw_end": tw_end_min
+        })
+        active_trucks.add(v_idx)
 
     # Filtrar y ordenar camiones usados
     sorted_truck_indices = sorted(list(active_trucks))
@@ -1,28 +1,145 @@
 import data
 import json
+import time
+import numpy as np
 import pandas as pd
 import os
 
-def run():
-    # Celda 5 (nueva): Cargar datos reales desde CSVs y params.json
+# Setting time por tipo de concreto (min), tabla del paper (cell7, cell8 y cell10 la leen de la instancia)
+SETTING_TIME_MAP = {"p1": 108, "p2": 108, "p3": 114, "p4": 114, "p5": 114, "p6": 90, "p7": 108, "p8": 126}
 
-    # Usar directorio del script para rutas relativas
-    base_dir = os.path.dirname(__file__)
-    path_sites = os.path.join(base_dir, "construction_sites.csv")
-    path_trucks = os.path.join(base_dir, "trucks.csv")
-    path_units = os.path.join(base_dir, "units.csv")
+# Formatos de entrada por orden de preferencia: si hay un Parquet / Arrow con el mismo nombre, gana al CSV
+READERS = [(".parquet", pd.read_parquet), (".arrow", pd.read_feather), (".feather", pd.read_feather), (".csv", pd.read_csv)]
+
+
+def get_minutes(val, default):
+    """Convierte 'HH:MM', horas (<= 24) o minutos a minutos absolutos."""
+    if val is None or pd.isna(val): return default
+    s_val = str(val).strip()
+    if ":" in s_val:
+        try:
+            hh, mm = s_val.split(":")
+            return int(hh) * 60 + int(mm)
+        except: pass
+    try:
+        f_val = float(s_val)
+        return int(f_val * 60) if f_val <= 24.0 else int(f_val)
+    except: return default
+
+
+def read_table(base_dir, stem):
+    """Tabla de entrada stem.parquet / .arrow / .feather / .csv (la primera que exista). Devuelve (df, ruta)."""
+    for ext, reader in READERS:
+        path = os.path.join(base_dir, stem + ext)
+        if os.path.exists(path):
+            return reader(path), path
+    return None, None
+
+
+def numeric(df, column, default=0.0):
+    """Columna numérica como float64 (faltantes y 'N/A' -> default)."""
+    if column not in df.columns:
+        return np.full(len(df), float(default))
+    return pd.to_numeric(df[column], errors="coerce").fillna(default).to_numpy(dtype=np.float64)
+
+
+def site_arrays(df_sites, params):
+    """Arrays por sitio: ventanas, viaje y setting time en minutos enteros; distancia y demanda en float."""
+    T1, T2 = params["T1"], params["T2"]
+    ids = [str(s).strip().lower() for s in df_sites["site_id"]]
+    travel = numeric(df_sites, "travel_time_min")
+    if np.any(travel != np.ceil(travel)):
+        print("ADVERTENCIA: travel_time_min con fracciones de minuto; se redondea hacia arriba.")
+    ctypes = [str(c).strip().lower() for c in df_sites.get("concrete_type", pd.Series(["p6"] * len(df_sites)))]
+    return {
+        "site_ids": ids,
+        "tw_start": np.array([get_minutes(v, T1) for v in df_sites.get("tw_start_h", [None] * len(ids))], dtype=np.int64),
+        "tw_end": np.array([get_minutes(v, T2) for v in df_sites.get("tw_end_h", [None] * len(ids))], dtype=np.int64),
+        "travel": np.ceil(travel).astype(np.int64),
+        "dist": numeric(df_sites, "dist_km"),
+        "demand": numeric(df_sites, "demand_m3"),
+        "setting": np.array([SETTING_TIME_MAP.get(c, params.get("setting_time", 90)) for c in ctypes], dtype=np.int64),
+    }
+
+
+def build_instance(df_sites, df_trucks, df_units, params):
+    """
+    Instancia normalizada, armada una sola vez al cargar los datos: arrays NumPy tipados por sitio,
+    camión y unidad (tiempos en minutos enteros) e índices id -> posición. cell6 agrega los lotes.
+    """
+    instance = site_arrays(df_sites, params)
+    instance["site_index"] = {s: i for i, s in enumerate(instance["site_ids"])}
+
+    instance["truck_ids"] = [str(v).strip() for v in df_trucks["truck_id"]]
+    instance["truck_index"] = {v: i for i, v in enumerate(instance["truck_ids"])}
+    instance["capacity"] = numeric(df_trucks, "capacity_m3")
+    instance["min_load"] = numeric(df_trucks, "min_load_m3")
+    instance["fixed_cost"] = numeric(df_trucks, "fixed_cost")
+    instance["var_cost"] = numeric(df_trucks, "var_cost_per_km")
+
+    instance["unit_ids"] = [str(u).strip() for u in df_units["unit_id"]]
+    instance["unit_index"] = {u: i for i, u in enumerate(instance["unit_ids"])}
+    instance["proc"] = np.ceil(numeric(df_units, "process_time_min")).astype(np.int64)
+
+    instance["batch_site"] = np.zeros(0, dtype=np.int64)
+    instance["volume"] = np.zeros(0)
+    return instance
+
+
+def add_sites(instance, df_new, params):
+    """Agrega sitios nuevos (pedidos insertados) a la instancia."""
+    new = site_arrays(df_new, params)
+    for key, values in new.items():
+        instance[key] = instance[key] + values if isinstance(values, list) else np.concatenate([instance[key], values])
+    instance["site_index"] = {s: i for i, s in enumerate(instance["site_ids"])}
+
+
+def attach_batches(instance, df_batches):
+    """Lotes de cell6: índice de sitio y volumen por lote."""
+    keys = df_batches["site_id"].astype(str).str.strip().str.lower()
+    instance["batch_site"] = pd.Index(instance["site_ids"]).get_indexer(keys).astype(np.int64)
+    instance["volume"] = df_batches["volume"].to_numpy(dtype=np.float64)
+
+
+def batch_view(batches, instance=None):
+    """
+    Arrays por lote (índice de sitio, site_id, ventanas, viaje, distancia y setting time) para una
+    lista de lotes cualquiera (todos, los de una ventana o pedidos nuevos), sin volver a parsear horas.
+    """
+    instance = instance if instance is not None else data.shared['instance']
+    site = np.array([instance["site_index"][str(b["site_id"]).strip().lower()] for b in batches], dtype=np.int64)
+    return {
+        "site": site,
+        "site_id": [instance["site_ids"][s] for s in site],
+        "tw_start": instance["tw_start"][site],
+        "tw_end": instance["tw_end"][site],
+        "travel": instance["travel"][site],
+        "dist": instance["dist"][site],
+        "setting": instance["setting"][site],
+    }
+
+
+def run(base_dir=None):
+    # Celda 5 (nueva): Cargar datos reales (CSV, Parquet o Arrow) y params.json
+    # Inicio del reloj de pared del plan (stop_sla_sec de cell11_anytime se mide desde aquí)
+    data.shared['load_time'] = time.time()
+
+    # Usar directorio del script para rutas relativas (tune_highs.py pasa la carpeta de cada instancia)
+    base_dir = base_dir or os.path.dirname(__file__)
     path_params = os.path.join(base_dir, "params.json")
 
-    # Verificar que los archivos existan
-    for path, name in [(path_sites, "construction_sites.csv"), (path_trucks, "trucks.csv"), (path_units, "units.csv"), (path_params, "parameters.json")]:
-        if not os.path.exists(path):
-            print(f"Error: {name} not found in {base_dir}")
+    # Cargar tablas (DataFrames)
+    tables = {}
+    for stem in ["construction_sites", "trucks", "units"]:
+        df, path = read_table(base_dir, stem)
+        if df is None:
+            print(f"Error: {stem}.csv (o .parquet / .arrow) not found in {base_dir}")
             return
-
-    # Cargar CSVs en DataFrames
-    df_sites = pd.read_csv(path_sites)
-    df_trucks = pd.read_csv(path_trucks)
-    df_units = pd.read_csv(path_units)
+        tables[stem] = df
+    if not os.path.exists(path_params):
+        print(f"Error: parameters.json not found in {base_dir}")
+        return
+    df_sites, df_trucks, df_units = tables["construction_sites"], tables["trucks"], tables["units"]
 
     # Cargar parámetros globales
     with open(path_params, "r") as f:
@@ -39,4 +156,5 @@ def run():
     data.shared['df_sites'] = df_sites
     data.shared['df_trucks'] = df_trucks
     data.shared['df_units'] = df_units
-    data.shared['params'] = params
\ No newline at end of file
+    data.shared['params'] = params
+    data.shared['instance'] = build_instance(df_sites, df_trucks, df_units, params)
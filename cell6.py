@@ -1,17 +1,50 @@
 import data
-import math
-from collections import defaultdict
+import numpy as np
 import pandas as pd
+from cell5 import attach_batches
+
+
+def loadable(volume, caps, mins):
+    """Por volumen: alguna clase de camión lo puede cargar (carga mínima <= volumen <= capacidad)."""
+    return ((mins[None, :] <= volume[:, None]) & (volume[:, None] <= caps[None, :])).any(axis=1)
 
-def run():
-    # Nueva Celda 6: generar batches robustos a partir de df_sites y df_trucks
-    df_sites = data.shared['df_sites']
-    df_trucks = data.shared['df_trucks']
-    params = data.shared['params']
 
+def fleet_mix_sizes(demand, df_trucks):
+    """
+    Tamaños de lote con el mínimo de viajes por sitio (ceil(demanda / capacidad máxima)) y cargables
+    por alguna clase de la flota: si el resto no llega a ninguna carga mínima se completa con volumen
+    del lote anterior. Devuelve por sitio (lotes llenos, último lote, penúltimo lote, sin clase).
+    """
+    classes = df_trucks[["capacity_m3", "min_load_m3"]].drop_duplicates().to_numpy(dtype=float)
+    caps, mins = classes[:, 0], classes[:, 1]
+    cap = caps.max()
+
+    n_full = np.where(demand > 0, demand // cap, 0)
+    last = np.where(demand > 0, demand - n_full * cap, 0)
+    prev = np.full(len(demand), cap)
+
+    # Menor volumen >= resto que alguna clase acepta
+    need = np.maximum(last[:, None], mins[None, :])
+    need = np.where(need <= caps[None, :], need, np.inf).min(axis=1)
+    shift = (last > 0) & (need > last) & (n_full > 0)
+    shift &= loadable(cap - (np.where(shift, need, last) - last), caps, mins)
+    prev = np.where(shift, cap - (need - last), prev)
+    last = np.where(shift, need, last)
+    unloadable = (last > 0) & ~loadable(last, caps, mins)
+    return n_full, last, prev, unloadable
+
+
+def build_batches(df_sites, df_trucks, sizing="max_cap"):
+    """
+    Lotes (site_id, batch_id, volume) para las demandas de df_sites con la flota df_trucks (y site_map).
+    Vectorizado por sitio: camiones llenos + resto. Con sizing = "max_cap" los lotes bajo la carga
+    mínima se suman al lote vecino del mismo sitio (el anterior, o el siguiente si es el primero) y
+    se descartan los que superan la capacidad; con "fleet_mix" los tamaños salen de fleet_mix_sizes
+    y no se fusiona ni se descarta demanda.
+    """
     # Asegúrate de tener df_sites y df_trucks cargados
     df_sites["demand_m3"] = pd.to_numeric(df_sites["demand_m3"], errors="coerce").fillna(0)
-    site_map = {str(s["site_id"]).strip(): s.to_dict() for _, s in df_sites.iterrows()}
+    site_map = {str(s["site_id"]).strip(): s for s in df_sites.to_dict("records")}
 
     df_trucks["capacity_m3"] = pd.to_numeric(df_trucks["capacity_m3"], errors="coerce").fillna(0)
     if "min_load_m3" not in df_trucks.columns:
@@ -25,72 +58,76 @@ def run():
     print("Max truck capacity:", max_truck_cap)
     print("Min truck min-load:", min_truck_minload)
 
-    batches = []
-    for _, s in df_sites.iterrows():
-        site_id = s["site_id"]
-        rem = float(s["demand_m3"])
-        if rem <= 0:
-            continue
-        n_full = int(rem // max_truck_cap)
-        chunks = [max_truck_cap] * n_full
-        last = rem - n_full * max_truck_cap
-        if last > 0:
-            if last < min_truck_minload and len(chunks) > 0:
-                if chunks[-1] + last <= max_truck_cap:
-                    chunks[-1] = chunks[-1] + last
-                    last = 0
-            if last > 0:
-                chunks.append(last)
-        for idx, vol in enumerate(chunks, start=1):
-            batches.append({
-                "site_id": site_id,
-                "batch_id": f"{site_id}_b{idx}",
-                "volume": round(float(vol), 6)
-            })
-
-    small_batches = [b for b in batches if b["volume"] < min_truck_minload]
-    if small_batches:
+    # Por sitio: n_full lotes de capacidad máxima y el resto como último lote
+    demand = df_sites["demand_m3"].to_numpy(dtype=float)
+    if sizing == "fleet_mix":
+        n_full, last, prev, unloadable = fleet_mix_sizes(demand, df_trucks)
+        absorbed = np.zeros(len(demand), dtype=bool)
+    else:
+        n_full = np.where(demand > 0, demand // max_truck_cap, 0)
+        last = np.where(demand > 0, demand - n_full * max_truck_cap, 0)
+        prev = np.full(len(demand), max_truck_cap)
+        # Resto despreciable que no cambia el último lote lleno (C + resto == C en float): se absorbe
+        absorbed = (last > 0) & (last < min_truck_minload) & (n_full > 0) & (max_truck_cap + last <= max_truck_cap)
+    has_last = (last > 0) & ~absorbed
+    counts = n_full.astype(np.int64) + has_last
+
+    site_pos = np.repeat(np.arange(len(demand)), counts)
+    starts = np.cumsum(counts) - counts
+    batch_idx = np.arange(len(site_pos)) - starts[site_pos] + 1
+    n_of = counts[site_pos]
+    is_last = batch_idx == n_of
+    volume = np.full(len(site_pos), round(float(max_truck_cap), 6))
+    last_round = np.array([round(float(v), 6) for v in last])
+    absorbed_round = np.array([round(float(max_truck_cap + v), 6) for v in last])
+    prev_round = np.array([round(float(v), 6) for v in prev])
+    volume = np.where((batch_idx == n_of - 1) & has_last[site_pos], prev_round[site_pos], volume)
+    volume = np.where(is_last & has_last[site_pos], last_round[site_pos], volume)
+    volume = np.where(is_last & absorbed[site_pos], absorbed_round[site_pos], volume)
+
+    site_ids = df_sites["site_id"].to_numpy()[site_pos]
+    df_batches = pd.DataFrame({
+        "site_id": site_ids,
+        "batch_id": pd.Series(site_ids).astype(str) + "_b" + pd.Series(batch_idx).astype(str),
+        "volume": volume,
+    })
+
+    if sizing == "fleet_mix":
+        print("Batches generated (fleet_mix):", df_batches.shape[0])
+        for site in df_sites["site_id"].to_numpy()[unloadable]:
+            print("WARNING: ningún camión cumple la carga mínima para la demanda de", site, "(se mantiene el lote)")
+        return df_batches, site_map
+
+    small = volume < min_truck_minload
+    if small.any():
         print("WARNING: Found small batches below the minimum truck min-load. Review these if unexpected:")
-        for b in small_batches:
+        for b in df_batches[small].to_dict("records"):
             print(b)
 
-    df_batches = pd.DataFrame(batches)
     print("Batches generated:", df_batches.shape[0])
 
-    # Paso Previo: Mergear small batches
-    min_truck_minload = df_trucks["min_load_m3"].min() if "min_load_m3" in df_trucks.columns else 0
-    small = df_batches[df_batches["volume"] < min_truck_minload].copy()
-    print("Small batches to merge:", small.shape[0])
-    if not small.empty:
+    # Paso Previo: Mergear small batches (con el volumen original del lote chico)
+    print("Small batches to merge:", int(small.sum()))
+    if small.any():
+        alone = small & (n_of == 1)
+        drop = small & ~alone
+        # Lote 1 chico -> lote 2; lote k > 1 chico -> lote k-1
+        from_prev = np.zeros(len(volume))
+        from_prev[1:] = np.where(small[:-1] & (batch_idx[:-1] == 1) & (batch_idx[1:] == 2), volume[:-1], 0)
+        from_next = np.zeros(len(volume))
+        from_next[:-1] = np.where(small[1:] & (batch_idx[1:] > 1), volume[1:], 0)
+        merged_volume = volume + from_prev + from_next
+
+        batch_ids = df_batches["batch_id"].to_numpy()
         merged = []
-        dfb = df_batches.copy()
-        dfb["batch_idx"] = dfb["batch_id"].str.extract(r"_b(\d+)$").astype(float).fillna(0).astype(int)
-        dfb = dfb.sort_values(["site_id","batch_idx"]).reset_index(drop=True)
-
-        to_drop = []
-        for _, sb in small.iterrows():
-            site = sb["site_id"]
-            bidx = int(sb["batch_id"].split("_b")[-1])
-            prev_mask = (dfb["site_id"]==site) & (dfb["batch_idx"] == (bidx-1))
-            if prev_mask.any():
-                prev_idx = dfb[prev_mask].index[0]
-                dfb.at[prev_idx, "volume"] = float(dfb.at[prev_idx, "volume"]) + float(sb["volume"])
-                to_drop.append(sb["batch_id"])
-                merged.append((sb["batch_id"], dfb.at[prev_idx, "batch_id"], sb["volume"]))
-            else:
-                next_mask = (dfb["site_id"]==site) & (dfb["batch_idx"] == (bidx+1))
-                if next_mask.any():
-                    next_idx = dfb[next_mask].index[0]
-                    dfb.at[next_idx, "volume"] = float(dfb.at[next_idx, "volume"]) + float(sb["volume"])
-                    to_drop.append(sb["batch_id"])
-                    merged.append((sb["batch_id"], dfb.at[next_idx, "batch_id"], sb["volume"]))
-                else:
-                    print("No neighbor to merge for", sb["batch_id"], "site", site)
-
-        if to_drop:
-            dfb = dfb[~dfb["batch_id"].isin(to_drop)].copy()
-        dfb = dfb.drop(columns=["batch_idx"])
-        df_batches = dfb.reset_index(drop=True)
+        for i in np.flatnonzero(drop):
+            target = i + 1 if batch_idx[i] == 1 else i - 1
+            merged.append((batch_ids[i], batch_ids[target], float(volume[i])))
+        for i in np.flatnonzero(alone):
+            print("No neighbor to merge for", batch_ids[i], "site", site_ids[i])
+
+        df_batches = (df_batches.assign(volume=merged_volume, batch_idx=batch_idx)[~drop]
+                      .sort_values(["site_id", "batch_idx"]).drop(columns=["batch_idx"]).reset_index(drop=True))
         print("Merged small batches (source -> target -> vol):")
         for m in merged:
             print(m)
@@ -103,6 +140,14 @@ def run():
     print("Removing oversized batches:", too_big["batch_id"].tolist())
     df_batches = df_batches[df_batches["volume"] <= max_cap].copy()
     df_batches.reset_index(drop=True, inplace=True)
+    return df_batches, site_map
+
 
+def run():
+    # Nueva Celda 6: generar batches robustos a partir de df_sites y df_trucks
+    params = data.shared['params']
+    df_batches, site_map = build_batches(data.shared['df_sites'], data.shared['df_trucks'],
+                                         params.get("batch_sizing", "max_cap"))
     data.shared['df_batches'] = df_batches
-    data.shared['site_map'] = site_map  # Also store site_map for later use
\ No newline at end of file
+    data.shared['site_map'] = site_map  # Also store site_map for later use
+    attach_batches(data.shared['instance'], df_batches)
@@ -2,9 +2,165 @@
 import data
 import pulp
 import math
-import pandas as pd
 from collections import defaultdict
 import shutil
+from cell7_fleet import truck_classes, class_domains
+import cell7_flow
+from cell5 import batch_view
+
+# Lag máximo entre descargas consecutivas de un sitio (Eq. 14, junta fría)
+MAX_LAG = 60
+
+# === OPCIÓN A: AJUSTE DE PENALIZACIÓN ===
+# Reducido de 1,000,000 a 10,000 para estabilidad numérica en el solver.
+PENALTY = 1000
+
+
+def unit_slots(t, proc, delta, T2):
+    """Puntos de tiempo que ocupa una producción que empieza en t (fila Cap_Unit)."""
+    return [t + k * delta for k in range(int(math.ceil(proc / delta))) if t + k * delta <= T2]
+
+
+def truck_slots(t, travel, unload, wash, delta, T1, T2):
+    """Puntos de tiempo que ocupa un camión que sale en t: lavado + ida + descarga + vuelta (fila Cap_Truck)."""
+    trip_len = travel + unload + travel
+    return [t + k * delta for k in range(-int(math.ceil(wash / delta)), int(math.ceil(trip_len / delta)))
+            if T1 <= t + k * delta <= T2]
+
+
+def batch_windows(batches, units, params):
+    """
+    Ventanas factibles por lote (Algoritmos 2 y 3 del paper):
+    - salida: [tw_start - travel + k*unload, tw_end + max_tard - travel - unload - (n-1-k)*unload]
+      siendo k la posición del lote en la secuencia de su sitio (Eq. 13) y n el total de lotes del sitio.
+    - producción por unidad: acotada por Eq. 7 (sync) y Eq. 8 (setting time por tipo de concreto).
+    Si la ventana queda vacía se relaja (se marca 'relaxed') en lugar de dejar el lote sin variables.
+    """
+    T1, T2 = params["T1"], params["T2"]
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    wait = params.get("wait_before_departure", 0)
+    max_tardiness = params.get("max_tardiness_allowed", 120)
+    margin = params.get("prune_margin_min", 0)
+
+    procs = [float(u.get("process_time_min", 0)) for u in units]
+    min_proc = min(procs) if procs else 0
+
+    view = batch_view(batches)
+    pos_in_site = {}
+    count_by_site = defaultdict(int)
+    for b_idx, site in enumerate(view["site"]):
+        pos_in_site[b_idx] = count_by_site[site]
+        count_by_site[site] += 1
+
+    windows = {}
+    for b_idx in range(len(batches)):
+        tw_start, tw_end = int(view["tw_start"][b_idx]), int(view["tw_end"][b_idx])
+        travel, setting = int(view["travel"][b_idx]), int(view["setting"][b_idx])
+        k, n = pos_in_site[b_idx], count_by_site[view["site"][b_idx]]
+
+        dep_floor = T1 + min_proc + wash + wait
+        dep_lo = max(dep_floor, tw_start - travel + k * unload - margin)
+        dep_hi = min(T2, tw_end + max_tardiness - travel - unload - (n - 1 - k) * unload + margin)
+        relaxed = False
+        if dep_hi < dep_lo:
+            # Tardanza máxima inalcanzable: se suelta el límite superior
+            dep_hi, relaxed = T2, True
+        if dep_hi < dep_lo:
+            dep_lo = dep_floor
+
+        prod = {}
+        for u_idx, proc in enumerate(procs):
+            lo = max(T1, dep_lo + travel + unload - setting - proc - margin)
+            hi = min(T2 - proc, dep_hi - proc - wash - wait)
+            prod[u_idx] = (lo, hi)
+        if all(hi < lo for (lo, hi) in prod.values()):
+            # Setting time inalcanzable: solo se conserva la cota de Eq. 7
+            prod = {u_idx: (T1, min(T2 - proc, dep_hi - proc - wash - wait)) for u_idx, proc in enumerate(procs)}
+            relaxed = True
+
+        windows[b_idx] = {"dep": (dep_lo, dep_hi), "prod": prod, "relaxed": relaxed}
+    return windows
+
+
+def eligible_trucks(vol, trucks):
+    """
+    Camiones que pueden llevar un lote de volumen vol: capacidad suficiente y carga mínima cumplida.
+    Si ninguno cumple la carga mínima se conservan los de capacidad suficiente.
+    """
+    fits = [v for v, truck in enumerate(trucks) if float(truck.get("capacity_m3", 0)) >= vol]
+    return [v for v in fits if float(trucks[v].get("min_load_m3", 0)) <= vol] or fits
+
+
+def variable_domains(batches, trucks, units, params, time_points, prune=False):
+    """Claves (u, t) de X y (v, t) de Y que se generan para cada lote."""
+    T1, T2 = params["T1"], params["T2"]
+    windows = batch_windows(batches, units, params) if prune else {}
+
+    X_dom, Y_dom = {}, {}
+    for b_idx, batch in enumerate(batches):
+        vol = float(batch.get("volume", 0))
+        latest_prod = T2
+        earliest_dep, latest_dep = T1, T2
+        prod_windows = {}
+        if prune:
+            earliest_dep, latest_dep = windows[b_idx]["dep"]
+            prod_windows = windows[b_idx]["prod"]
+
+        X_dom[b_idx] = []
+        for u_idx, unit in enumerate(units):
+            proc = float(unit.get("process_time_min", 0))
+            lo, hi = prod_windows.get(u_idx, (T1, latest_prod - proc))
+            for t in time_points:
+                if t + proc <= latest_prod and lo <= t <= hi:
+                    X_dom[b_idx].append((u_idx, t))
+
+        Y_dom[b_idx] = []
+        for v_idx in eligible_trucks(vol, trucks):
+            for t in time_points:
+                if earliest_dep <= t <= latest_dep:
+                    Y_dom[b_idx].append((v_idx, t))
+    return X_dom, Y_dom
+
+
+def domain_stats(X_dom, Y_dom, batches, units, params):
+    """Número de variables X/Y y de filas Cap_Unit/Cap_Truck que generan unos dominios."""
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+
+    travel_b = batch_view(batches)["travel"]
+    unit_rows, truck_rows = set(), set()
+    for b_idx, keys in X_dom.items():
+        for (u, t) in keys:
+            proc = float(units[u]["process_time_min"])
+            unit_rows.update((u, s) for s in unit_slots(t, proc, delta, T2))
+    for b_idx, keys in Y_dom.items():
+        for (v, t) in keys:
+            truck_rows.update((v, s) for s in truck_slots(t, travel_b[b_idx], unload, wash, delta, T1, T2))
+    return {
+        "X": sum(len(k) for k in X_dom.values()),
+        "Y": sum(len(k) for k in Y_dom.values()),
+        "Cap_Unit": len(unit_rows),
+        "Cap_Truck": len(truck_rows),
+    }
+
+
+def prune_report(batches, trucks, units, params, time_points, X_dom, Y_dom):
+    """Compara los dominios podados contra la red completa [T1, T2] y lo imprime por familia."""
+    full_X, full_Y = variable_domains(batches, trucks, units, params, time_points, prune=False)
+    full = domain_stats(full_X, full_Y, batches, units, params)
+    pruned = domain_stats(X_dom, Y_dom, batches, units, params)
+
+    print("Poda de dominios (familia: completo -> podado, eliminados):")
+    report = {}
+    for family in ["X", "Y", "Cap_Unit", "Cap_Truck"]:
+        removed = full[family] - pruned[family]
+        report[family] = {"full": full[family], "pruned": pruned[family], "removed": removed}
+        print(f"  {family:<10} {full[family]:>7} -> {pruned[family]:>7}  (-{removed})")
+    return report
+
 
 def run():
     print("=== CELDA 7: CONSTRUCCIÓN MODELO (OPTIMIZADO: HARD PHYS + LOW M) ===")
@@ -13,8 +169,9 @@ def run():
     batches = data.shared['df_batches'].to_dict("records")
     trucks = data.shared['df_trucks'].to_dict("records")
     units = data.shared['df_units'].to_dict("records")
-    sites_df = data.shared['df_sites']
-    sites_map = {str(row['site_id']).strip().lower(): row for row in sites_df.to_dict("records")}
+    # Viaje, fin de ventana y distancia por lote, ya normalizados por cell5
+    view = batch_view(batches)
+    travel_b, tw_end_b, dist_b = view["travel"].tolist(), view["tw_end"].tolist(), view["dist"].tolist()
 
     T1, T2 = params["T1"], params["T2"]
     delta = params.get("delta_min", 10)
@@ -25,20 +182,9 @@ def run():
     wait = params.get("wait_before_departure", 0)
     max_tardiness = params.get("max_tardiness_allowed", 120)
     setting_time_limit = params.get("setting_time", 90)
-    max_lag = 60 
-
-    def get_minutes(val):
-        if val is None or pd.isna(val): return T1
-        s_val = str(val).strip()
-        if ":" in s_val:
-            try:
-                hh, mm = s_val.split(":")
-                return int(hh) * 60 + int(mm)
-            except: pass
-        try:
-            f_val = float(s_val)
-            return int(f_val * 60) if f_val <= 24.0 else int(f_val)
-        except: return T1
+    max_lag = MAX_LAG
+    prune = params.get("prune_domains", False)
+    strengthen = params.get("strengthen_formulation", False)
 
     prob = pulp.LpProblem("RMC_Robust_Optimization", pulp.LpMinimize)
     
@@ -56,54 +202,58 @@ def run():
 
     print(f"Generando variables para {len(batches)} lotes...")
 
+    # Dominios (u, t) / (v, t) por lote: red completa [T1, T2] o podada por ventanas de tiempo
+    X_dom, Y_dom = variable_domains(batches, trucks, units, params, time_points, prune=prune)
+    if prune:
+        data.shared['prune_report'] = prune_report(batches, trucks, units, params, time_points, X_dom, Y_dom)
+
+    # Agregación de flota: Y por clase de camiones idénticos en lugar de por camión
+    fleet_classes = None
+    transport = params.get("transport_model", "per_truck")
+    if transport in ("fleet_class", "flow"):
+        fleet_classes = truck_classes(trucks)
+        n_y_trucks = sum(len(k) for k in Y_dom.values())
+        Y_dom = class_domains(Y_dom, fleet_classes)
+        print(f"Agregación de flota: {len(trucks)} camiones -> {len(fleet_classes)} clases, "
+              f"Y {n_y_trucks} -> {sum(len(k) for k in Y_dom.values())}")
+    vehicles = fleet_classes if fleet_classes else trucks
+    y_tag = "c" if fleet_classes else "v"
+
     for b_idx, batch in enumerate(batches):
-        site_id = str(batch["site_id"]).strip().lower()
-        site_data = sites_map.get(site_id, {})
-        vol = float(batch.get("volume", 0))
-        
-        tw_start = get_minutes(site_data.get("tw_start_h"))
-        tw_end = get_minutes(site_data.get("tw_end_h"))
-        travel = float(site_data.get("travel_time_min", 0))
-        
         T_tard[b_idx] = pulp.LpVariable(f"T_tard_b{b_idx}", lowBound=0) 
         
         Slacks_Setting[b_idx] = pulp.LpVariable(f"Slack_Setting_b{b_idx}", lowBound=0)
         Slacks_MaxTard[b_idx] = pulp.LpVariable(f"Slack_MaxTard_b{b_idx}", lowBound=0)
 
-        latest_prod = T2 
-        earliest_dep, latest_dep = T1, T2
-        
         # X Vars (Producción)
-        for u_idx, unit in enumerate(units):
-            proc = float(unit.get("process_time_min", 0))
-            for t in time_points:
-                if t + proc <= latest_prod:
-                    var = pulp.LpVariable(f"X_b{b_idx}_u{u_idx}_t{t}", cat="Binary")
-                    X[(b_idx, u_idx, t)] = var
-                    X_sums[b_idx].append((var, t, proc))
+        for (u_idx, t) in X_dom[b_idx]:
+            proc = float(units[u_idx].get("process_time_min", 0))
+            var = pulp.LpVariable(f"X_b{b_idx}_u{u_idx}_t{t}", cat="Binary")
+            X[(b_idx, u_idx, t)] = var
+            X_sums[b_idx].append((var, t, proc))
 
         # Y Vars (Transporte)
         count_y = 0
-        for v_idx, truck in enumerate(trucks):
-            cap = float(truck.get("capacity_m3", 0))
-            if cap >= vol:
-                for t in time_points:
-                    if earliest_dep <= t <= latest_dep:
-                        var = pulp.LpVariable(f"Y_b{b_idx}_v{v_idx}_t{t}", cat="Binary")
-                        Y[(b_idx, v_idx, t)] = var
-                        Y_sums[b_idx].append((var, t, v_idx))
-                        Y_by_v[v_idx].append(var)
-                        count_y += 1
+        for (v_idx, t) in Y_dom[b_idx]:
+            var = pulp.LpVariable(f"Y_b{b_idx}_{y_tag}{v_idx}_t{t}", cat="Binary")
+            Y[(b_idx, v_idx, t)] = var
+            Y_sums[b_idx].append((var, t, v_idx))
+            Y_by_v[v_idx].append(var)
+            count_y += 1
         
         if count_y == 0: # Safety Net
-             v_max = max(range(len(trucks)), key=lambda i: float(trucks[i]["capacity_m3"]))
-             var = pulp.LpVariable(f"Y_b{b_idx}_v{v_max}_t{T1}", cat="Binary")
+             v_max = max(range(len(vehicles)), key=lambda i: float(vehicles[i]["capacity_m3"]))
+             var = pulp.LpVariable(f"Y_b{b_idx}_{y_tag}{v_max}_t{T1}", cat="Binary")
              Y[(b_idx, v_max, T1)] = var
              Y_sums[b_idx].append((var, T1, v_max))
              Y_by_v[v_max].append(var)
 
-    for v_idx in range(len(trucks)):
-        V_used[v_idx] = pulp.LpVariable(f"V_used_v{v_idx}", cat="Binary")
+    for v_idx in range(len(vehicles)):
+        if fleet_classes:
+            # Camiones usados de la clase (entero, acotado por el tamaño de la clase)
+            V_used[v_idx] = pulp.LpVariable(f"N_used_c{v_idx}", lowBound=0, upBound=vehicles[v_idx]["count"], cat="Integer")
+        else:
+            V_used[v_idx] = pulp.LpVariable(f"V_used_v{v_idx}", cat="Binary")
 
     print("Agregando restricciones (Hard Constraints aplicadas)...")
     
@@ -118,14 +268,12 @@ def run():
         prob += finish_prod + wash + wait <= depart_truck, f"Eq7_Sync_b{b}"
         
         # --- Eq 8: Vida útil (Setting Time)
-        site_id = str(batches[b]["site_id"]).strip().lower()
-        travel = float(sites_map.get(site_id, {}).get("travel_time_min", 0))
+        travel = travel_b[b]
         arrival_finish = depart_truck + travel + unload
         prob += arrival_finish - finish_prod <= setting_time_limit + Slacks_Setting[b], f"Eq8_ShelfLife_b{b}"
 
         # Tardanza Def
-        tw_end = get_minutes(sites_map.get(site_id, {}).get("tw_end_h"))
-        prob += T_tard[b] >= (depart_truck + travel + unload) - tw_end, f"Def_Tard_b{b}"
+        prob += T_tard[b] >= (depart_truck + travel + unload) - tw_end_b[b], f"Def_Tard_b{b}"
         
         # Límite Tardanza
         prob += T_tard[b] <= max_tardiness + Slacks_MaxTard[b], f"Limit_Tard_b{b}"
@@ -134,19 +282,81 @@ def run():
     unit_occupancy = defaultdict(list)
     for (b, u, t), var in X.items():
         proc = float(units[u]["process_time_min"])
-        for k in range(int(math.ceil(proc / delta))):
-            if t + k*delta <= T2: unit_occupancy[(u, t + k*delta)].append(var)
+        for s in unit_slots(t, proc, delta, T2): unit_occupancy[(u, s)].append(var)
     for k, vlist in unit_occupancy.items(): prob += pulp.lpSum(vlist) <= 1, f"Cap_Unit_{k}"
 
     # Capacidad Camiones
+    # (con transport_model = "flow" las filas Cap_Truck se reemplazan por la red tiempo-espacio)
     truck_occupancy = defaultdict(list)
+    min_slots_b = {}  # mínimo de slots [T1, T2] que ocupa el viaje de cada lote
     for (b, v, t), var in Y.items():
-        site_id = str(batches[b]["site_id"]).strip().lower()
-        travel = float(sites_map.get(site_id, {}).get("travel_time_min", 0))
-        trip_len = travel + unload + travel
-        for k in range(-int(math.ceil(wash/delta)), int(math.ceil(trip_len/delta))):
-            if T1 <= t + k*delta <= T2: truck_occupancy[(v, t + k*delta)].append(var)
-    for k, vlist in truck_occupancy.items(): prob += pulp.lpSum(vlist) <= 1, f"Cap_Truck_{k}"
+        slots = truck_slots(t, travel_b[b], unload, wash, delta, T1, T2)
+        for s in slots: truck_occupancy[(v, s)].append(var)
+        min_slots_b[b] = min(min_slots_b.get(b, len(slots)), len(slots))
+    flow_inventory = None
+    if transport == "flow":
+        flow_inventory, arcs = cell7_flow.add_flow_rows(prob, Y, V_used, fleet_classes, batches,
+                                                        params, time_points)
+        stats = cell7_flow.network_stats(arcs, fleet_classes, time_points, batches, params)
+        print(f"Red tiempo-espacio: {stats['rows']} filas de flujo ({stats['nnz']} no-ceros) en lugar de "
+              f"{stats['clique_rows']} filas Cap_Truck ({stats['clique_nnz']} no-ceros).")
+        truck_occupancy = {}
+    for k, vlist in truck_occupancy.items():
+        # En modo agregado la capacidad de la clase es el número de camiones usados;
+        # en modo reforzado la fila además enlaza Y con V_used del camión
+        cap = V_used[k[0]] if (fleet_classes or strengthen) else 1
+        prob += pulp.lpSum(vlist) <= cap, f"Cap_Truck_{k}"
+
+    # --- Formulación reforzada: desigualdades válidas para una relajación LP más fuerte ---
+    if strengthen:
+        n_rows_before = len(prob.constraints)
+
+        # 1. Linking por camión: ningún viaje sin V_used, a lo sumo n_max viajes por camión
+        #    (viajes completos disjuntos dentro de [T1, T2] + como mucho uno recortado en cada borde)
+        n_slots = len(time_points)
+        full_trip = min(
+            len(truck_slots(0, travel, unload, wash, delta, -math.inf, math.inf)) for travel in travel_b
+        ) if batches else 1
+        n_max = n_slots // max(1, full_trip) + 2
+        for v_idx in range(len(vehicles)):
+            if Y_by_v[v_idx]:
+                prob += pulp.lpSum(Y_by_v[v_idx]) <= n_max * V_used[v_idx], f"Link_Used_{y_tag}{v_idx}"
+
+        # 2. Cota inferior combinatoria de camiones: por carga total y por punto de tiempo
+        #    (en cada t, los lotes cuyo viaje ocupa t para toda salida posible de su dominio)
+        lb_total = int(math.ceil(sum(min_slots_b.values()) / n_slots)) if n_slots else 0
+        mandatory = defaultdict(int)
+        for b in range(len(batches)):
+            deps = [t for (_, t, _) in Y_sums[b]]
+            travel = travel_b[b]
+            common = set(truck_slots(min(deps), travel, unload, wash, delta, T1, T2)) & \
+                     set(truck_slots(max(deps), travel, unload, wash, delta, T1, T2))
+            for s in common: mandatory[s] += 1
+        lb_trucks = max([lb_total] + list(mandatory.values()))
+        prob += pulp.lpSum(V_used.values()) >= lb_trucks, "Fleet_LB"
+
+        if not fleet_classes:
+            # 3. Simetría lexicográfica entre camiones idénticos: se usan y cargan en orden de ID
+            for cls in truck_classes(trucks):
+                members = cls["members"]
+                for v_a, v_b in zip(members, members[1:]):
+                    prob += V_used[v_a] >= V_used[v_b], f"Sym_Used_v{v_a}_v{v_b}"
+                    prob += pulp.lpSum(Y_by_v[v_a]) >= pulp.lpSum(Y_by_v[v_b]), f"Sym_Trips_v{v_a}_v{v_b}"
+
+        # 4. Cover agregado de unidades: arranques en ventanas disjuntas de largo L <= capacidad total
+        unit_k = [int(math.ceil(float(u["process_time_min"]) / delta)) for u in units]
+        if unit_k:
+            L = math.lcm(*unit_k) if math.lcm(*unit_k) <= 4 * max(unit_k) else max(unit_k)
+            cover_rhs = sum(int(math.ceil(L / k)) for k in unit_k)
+            starts_by_window = defaultdict(list)
+            for (b, u, t), var in X.items():
+                starts_by_window[(t - T1) // (L * delta)].append(var)
+            for w, vlist in starts_by_window.items():
+                if len(vlist) > cover_rhs:
+                    prob += pulp.lpSum(vlist) <= cover_rhs, f"Cover_Unit_w{w}"
+
+        print(f"Formulación reforzada: +{len(prob.constraints) - n_rows_before} filas "
+              f"(cota inferior de camiones = {lb_trucks}, máx. viajes por camión = {n_max}).")
 
     # Secuencia
     batches_by_site = defaultdict(list)
@@ -155,7 +365,7 @@ def run():
     for site, b_indices in batches_by_site.items():
         for i in range(len(b_indices) - 1):
             b_curr, b_next = b_indices[i], b_indices[i+1]
-            travel = float(sites_map.get(site, {}).get("travel_time_min", 0))
+            travel = travel_b[b_curr]
             
             dep_curr = pulp.lpSum([t * y for (y, t, _) in Y_sums[b_curr]])
             dep_next = pulp.lpSum([t * y for (y, t, _) in Y_sums[b_next]])
@@ -176,18 +386,13 @@ def run():
     alpha = params.get("alpha", 1.0)
     beta = params.get("beta", 1.0)
     
-    # === OPCIÓN A: AJUSTE DE PENALIZACIÓN ===
-    # Reducido de 1,000,000 a 10,000 para estabilidad numérica en el solver.
-    PENALTY = 1000  
-    
     transp_cost = 0
     for (b, v, t), var in Y.items():
-        site_id = str(batches[b]["site_id"]).strip().lower()
-        dist = float(sites_map.get(site_id, {}).get("dist_km", 0))
-        cost = float(trucks[v].get("var_cost_per_km", 0))
+        dist = dist_b[b]
+        cost = float(vehicles[v].get("var_cost_per_km", 0))
         transp_cost += var * (2 * dist * cost)
 
-    fixed_costs = pulp.lpSum([V_used[v] * float(trucks[v].get("fixed_cost", 0)) for v in range(len(trucks))])
+    fixed_costs = pulp.lpSum([V_used[v] * float(vehicles[v].get("fixed_cost", 0)) for v in range(len(vehicles))])
 
     # Suma de Slacks restantes (Solo Setting, Lag y MaxTard)
     slack_cost = PENALTY * (
@@ -206,7 +411,9 @@ def run():
     data.shared['units_list'] = units
     data.shared['batches_list'] = batches
     data.shared['trucks_list'] = trucks
-    data.shared['site_map'] = sites_map
     data.shared["time_points"] = time_points
+    data.shared['model_builder'] = "pulp"
+    data.shared['fleet_classes'] = fleet_classes
+    data.shared['flow_inventory'] = flow_inventory
     
     print("Modelo Optimizado Guardado (M=10k, HardSync, HardSeq).")
\ No newline at end of file
@@ -0,0 +1,235 @@
+# cell7_cache.py -- Caché de modelos MILP direccionada por contenido (MPS comprimido + índices)
+import data
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+
+import cell5
+import cell7
+import cell7_fleet
+import cell7_flow
+import cell7_matrix
+
+# Formato de las entradas (MPS + índices pickled): subir si cambia store/load
+CACHE_VERSION = 3
+
+# Módulos que arman el modelo: su código fuente entra en la clave, así cualquier cambio de la
+# formulación invalida las entradas viejas sin tener que acordarse de subir CACHE_VERSION
+BUILD_MODULES = [cell5, cell7, cell7_fleet, cell7_flow, cell7_matrix]
+
+# Lecturas de params.json en esos módulos: solo estas claves entran en el hash (las opciones de
+# solve de otros módulos no invalidan la caché y no hay que listarlas a mano; solver_profile, que
+# lee cell7_matrix.solver_profile, también entra y a lo sumo cuesta una reconstrucción)
+PARAM_READ = re.compile(r"""params(?:\.get\(|\[)["'](\w+)["']""")
+
+
+def builder_source():
+    """Hash del código fuente de BUILD_MODULES y las claves de params.json que leen."""
+    digest, keys = hashlib.sha256(), set()
+    for module in BUILD_MODULES:
+        source = inspect.getsource(module)
+        digest.update(source.encode("utf-8"))
+        keys.update(PARAM_READ.findall(source))
+    return digest.hexdigest(), keys
+
+
+BUILDER_HASH, BUILD_KEYS = builder_source()
+
+# Estructuras de data.shared que acompañan al modelo
+SHARED_KEYS = ["units_list", "batches_list", "trucks_list", "time_points", "fleet_classes", "prune_report"]
+
+
+def model_key(params):
+    """Hash SHA-256 de las tablas normalizadas (post cell6), de las opciones de construcción y del código del builder."""
+    build_params = {k: v for k, v in params.items() if k in BUILD_KEYS}
+    payload = {
+        "version": CACHE_VERSION,
+        "source": BUILDER_HASH,
+        "params": build_params,
+        "builder": params.get("model_builder", "pulp"),
+    }
+    for name in ["df_sites", "df_trucks", "df_units", "df_batches"]:
+        df = data.shared[name]
+        payload[name] = df.sort_index(axis=1).to_csv(index=False)
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def cache_dir(params):
+    path = params.get("model_cache_dir", "model_cache")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def entry_paths(directory, key):
+    return os.path.join(directory, f"{key}.mps.gz"), os.path.join(directory, f"{key}.idx.pkl")
+
+
+def evict(directory, max_bytes, keep=None):
+    """Elimina las entradas usadas hace más tiempo (mtime) hasta quedar bajo max_bytes."""
+    entries = {}
+    for name in os.listdir(directory):
+        key = name.split(".")[0]
+        path = os.path.join(directory, name)
+        size, mtime = os.path.getsize(path), os.path.getmtime(path)
+        total, last = entries.get(key, (0, 0))
+        entries[key] = (total + size, max(last, mtime))
+
+    used = sum(size for size, _ in entries.values())
+    for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+        if used <= max_bytes:
+            break
+        if key == keep:
+            continue
+        for path in entry_paths(directory, key):
+            if os.path.exists(path):
+                os.remove(path)
+        used -= size
+        print(f"Caché: entrada {key[:12]} eliminada ({size / 1e6:.1f} MB).")
+
+
+def store(directory, key):
+    """
+    Escribe el modelo recién construido como MPS comprimido + mapas de índices: con el builder matricial
+    todos los índices de columnas y filas (load rearma la matriz y cell8 verifica el warm start igual que
+    tras construir); con PuLP los nombres de las variables de cada familia, incluido el inventario de la
+    red de flujo (las filas conservan su nombre en el MPS).
+    """
+    mps_path, idx_path = entry_paths(directory, key)
+    builder = data.shared['model_builder']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, "model.mps")
+        if builder == "matrix":
+            model = data.shared['matrix_model']
+            model['highs'].writeModel(raw)
+            # Sin nombres de columna: el orden del MPS es el orden de columnas y filas del modelo
+            index = {"col_index": model["col_index"], "row_index": model["row_index"]}
+            sense = None
+        else:
+            data.shared['prob'].writeMPS(raw)
+            index = {fam: {key: var.name for key, var in data.shared[fam].items()}
+                     for fam in ["X", "Y", "T_tard", "V_used"]}
+            index["flow_inventory"] = {key: var.name for key, var in (data.shared.get('flow_inventory') or {}).items()}
+            sense = data.shared['prob'].sense
+        with open(raw, "rb") as f_in, gzip.open(mps_path + ".tmp", "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+    meta = {"version": CACHE_VERSION, "builder": builder, "sense": sense, "index": index,
+            "shared": {k: data.shared.get(k) for k in SHARED_KEYS}}
+    with open(idx_path + ".tmp", "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Renombrado atómico: nunca queda una entrada a medio escribir
+    os.replace(mps_path + ".tmp", mps_path)
+    os.replace(idx_path + ".tmp", idx_path)
+    return os.path.getsize(mps_path) + os.path.getsize(idx_path)
+
+
+def load_matrix(mps_path, index):
+    """MPS -> highspy con la matriz, cotas e índices completos, igual que cell7_matrix.run()."""
+    import highspy
+    from scipy.sparse import csc_matrix
+    from cell11_lns import lp_arrays   # cell11_lns importa cell7_matrix
+
+    h = highspy.Highs()
+    h.silent()
+    if h.readModel(mps_path) != highspy.HighsStatus.kOk:
+        return False
+    h.setOptionValue("output_flag", True)
+
+    arrays = lp_arrays(h)
+    A = csc_matrix((arrays["value"], arrays["index"], arrays["start"]),
+                   shape=(len(arrays["row_lower"]), len(arrays["cost"])))
+    model = {key: arrays[key] for key in ["cost", "col_lower", "col_upper", "row_lower", "row_upper", "integrality"]}
+    model.update(A=A, highs=h, col_index=index["col_index"], row_index=index["row_index"])
+    data.shared['matrix_model'] = model
+    for fam in ["X", "Y", "T_tard", "V_used"]:
+        data.shared[fam] = model["col_index"][fam]
+    data.shared['flow_inventory'] = None
+    return True
+
+
+def load_pulp(mps_path, index, sense):
+    """MPS -> LpProblem (variables y filas con sus nombres): se resuelve y se reporta como tras cell7.run()."""
+    import pulp
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, "model.mps")
+        with gzip.open(mps_path, "rb") as f_in, open(raw, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        variables, prob = pulp.LpProblem.fromMPS(raw, sense=sense)
+
+    data.shared['prob'] = prob
+    for fam in ["X", "Y", "T_tard", "V_used"]:
+        data.shared[fam] = {k: variables[name] for k, name in index[fam].items()}
+    data.shared['flow_inventory'] = {k: variables[name] for k, name in index["flow_inventory"].items()} or None
+    return True
+
+
+def load(directory, key):
+    """
+    Recarga el modelo por el mismo camino con el que se construyó (meta["builder"]): highspy con la
+    matriz completa para "matrix", LpProblem para "pulp" (cell9 / cell11 como en una construcción).
+    """
+    mps_path, idx_path = entry_paths(directory, key)
+    with open(idx_path, "rb") as f:
+        meta = pickle.load(f)
+    if meta.get("version") != CACHE_VERSION:
+        return False
+
+    if meta["builder"] == "matrix":
+        if not load_matrix(mps_path, meta["index"]):
+            return False
+    else:
+        load_pulp(mps_path, meta["index"], meta["sense"])
+    for k, v in meta["shared"].items():
+        data.shared[k] = v
+    data.shared['model_builder'] = meta["builder"]
+
+    now = time.time()
+    os.utime(mps_path, (now, now))
+    os.utime(idx_path, (now, now))
+    return True
+
+
+def run():
+    print("=== CELDA 7 (CACHÉ): BUSCANDO MODELO EN CACHÉ ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    directory = cache_dir(params)
+    key = model_key(params)
+    mps_path, idx_path = entry_paths(directory, key)
+    print(f"Clave del modelo: {key[:12]}")
+
+    if os.path.exists(mps_path) and os.path.exists(idx_path):
+        if load(directory, key):
+            if data.shared['model_builder'] == "matrix":
+                h = data.shared['matrix_model']['highs']
+                n_cols, n_rows = h.getNumCol(), h.getNumRow()
+            else:
+                n_cols, n_rows = len(data.shared['prob'].variables()), len(data.shared['prob'].constraints)
+            print(f"✅ Caché HIT ({data.shared['model_builder']}): {n_cols} columnas, {n_rows} filas "
+                  f"recargadas en {time.time() - start_time:.2f} s (sin reconstruir).")
+            return
+        print("Entrada de caché inválida, se reconstruye el modelo.")
+
+    print("Caché MISS: construyendo modelo...")
+    if params.get("model_builder", "pulp") == "matrix":
+        cell7_matrix.run()
+    else:
+        cell7.run()
+
+    size = store(directory, key)
+    print(f"Modelo guardado en caché ({size / 1e6:.1f} MB) en {time.time() - start_time:.2f} s.")
+    evict(directory, params.get("model_cache_max_mb", 512) * 1e6, keep=key)
@@ -0,0 +1,322 @@
+# cell7_continuous.py -- Formulación de tiempo continuo (secuenciamiento disyuntivo con big-M acotado)
+import data
+import pulp
+import time
+import cell11_anytime
+from collections import defaultdict
+
+from cell5 import batch_view
+from cell7 import batch_windows, eligible_trucks, variable_domains, domain_stats, MAX_LAG, PENALTY
+from cell7_fleet import truck_classes
+from cell7_matrix import solver_profile
+from cell8 import key_windows, batch_table, build_plan
+from cell8_warmstart import start_values, repair_plan
+from cell11 import HiGHSWarmStart, highs_options, solve_status
+
+
+def time_bounds(batches, units, params, prune):
+    """
+    Intervalos [lo, hi] del arranque por unidad y de la salida de cada lote.
+    Con prune_domains son las ventanas de cell7.batch_windows (big-M ajustados);
+    sin poda, el horizonte [T1, T2] con las mismas cotas físicas que la red completa.
+    """
+    T1, T2 = params["T1"], params["T2"]
+    wash = params.get("wash_time", 10)
+    wait = params.get("wait_before_departure", 0)
+    procs = [float(u.get("process_time_min", 0)) for u in units]
+
+    if prune:
+        windows = batch_windows(batches, units, params)
+        return {b: (w["prod"], w["dep"]) for b, w in windows.items()}
+
+    dep_lo = T1 + (min(procs) if procs else 0) + wash + wait
+    prod = {u: (T1, T2 - p) for u, p in enumerate(procs)}
+    return {b: (dict(prod), (dep_lo, T2)) for b in range(len(batches))}
+
+
+def run():
+    print("=== CELDA 7 (TIEMPO CONTINUO): CONSTRUCCIÓN MODELO DE SECUENCIAMIENTO ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    batches = data.shared['df_batches'].to_dict("records")
+    trucks = data.shared['df_trucks'].to_dict("records")
+    units = data.shared['df_units'].to_dict("records")
+
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    time_points = list(range(T1, T2 + 1, delta))
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    wait = params.get("wait_before_departure", 0)
+    max_tardiness = params.get("max_tardiness_allowed", 120)
+    setting_time_limit = params.get("setting_time", 90)
+    prune = params.get("prune_domains", False)
+    strengthen = params.get("strengthen_formulation", False)
+    if params.get("transport_model", "per_truck") != "per_truck":
+        print("ADVERTENCIA: el modelo de tiempo continuo usa camiones individuales (transport_model ignorado).")
+
+    B = len(batches)
+    view = batch_view(batches)
+    site_ids = view["site_id"]
+    travel, tw_end_b, dist_b = view["travel"].tolist(), view["tw_end"].tolist(), view["dist"].tolist()
+    procs = [float(u.get("process_time_min", 0)) for u in units]
+    bounds = time_bounds(batches, units, params, prune)
+
+    prob = pulp.LpProblem("RMC_Continuous_Time", pulp.LpMinimize)
+
+    # --- Variables ---
+    # A[b,u] / W[b,v]: asignación a unidad / camión; S[b] / D[b]: arranque y salida (min, continuos)
+    A, W, S, D, T_tard, V_used = {}, {}, {}, {}, {}, {}
+    Slacks_Setting, Slacks_MaxTard, Slacks_Lag = {}, {}, {}
+    units_of, trucks_of = {}, {}
+    for b in range(B):
+        prod, (dep_lo, dep_hi) = bounds[b]
+        units_of[b] = [u for u, (lo, hi) in prod.items() if lo <= hi]
+        if not units_of[b]:  # Safety Net: ventana vacía en todas las unidades -> horizonte completo
+            prod.update({u: (T1, T2 - p) for u, p in enumerate(procs)})
+            units_of[b] = list(range(len(units)))
+        vol = float(batches[b].get("volume", 0))
+        trucks_of[b] = eligible_trucks(vol, trucks)
+        if not trucks_of[b]:  # Safety Net: camión más grande
+            trucks_of[b] = [max(range(len(trucks)), key=lambda i: float(trucks[i]["capacity_m3"]))]
+
+        S[b] = pulp.LpVariable(f"S_b{b}", lowBound=min(prod[u][0] for u in units_of[b]),
+                               upBound=max(prod[u][1] for u in units_of[b]))
+        D[b] = pulp.LpVariable(f"D_b{b}", lowBound=dep_lo, upBound=dep_hi)
+        for u in units_of[b]:
+            A[(b, u)] = pulp.LpVariable(f"A_b{b}_u{u}", cat="Binary")
+        for v in trucks_of[b]:
+            W[(b, v)] = pulp.LpVariable(f"W_b{b}_v{v}", cat="Binary")
+        T_tard[b] = pulp.LpVariable(f"T_tard_b{b}", lowBound=0)
+        Slacks_Setting[b] = pulp.LpVariable(f"Slack_Setting_b{b}", lowBound=0)
+        Slacks_MaxTard[b] = pulp.LpVariable(f"Slack_MaxTard_b{b}", lowBound=0)
+    for v in range(len(trucks)):
+        V_used[v] = pulp.LpVariable(f"V_used_v{v}", cat="Binary")
+
+    # --- Restricciones por lote (mismas ecuaciones que cell7 con tiempos continuos) ---
+    finish = {}
+    for b in range(B):
+        prob += pulp.lpSum(A[(b, u)] for u in units_of[b]) == 1, f"One_Prod_b{b}"
+        prob += pulp.lpSum(W[(b, v)] for v in trucks_of[b]) == 1, f"One_Trip_b{b}"
+
+        # Ventana de arranque de la unidad elegida
+        prod = bounds[b][0]
+        prob += S[b] >= pulp.lpSum(prod[u][0] * A[(b, u)] for u in units_of[b]), f"Win_Lo_b{b}"
+        prob += S[b] <= pulp.lpSum(prod[u][1] * A[(b, u)] for u in units_of[b]), f"Win_Hi_b{b}"
+
+        finish[b] = S[b] + pulp.lpSum(procs[u] * A[(b, u)] for u in units_of[b])
+        prob += finish[b] + wash + wait <= D[b], f"Eq7_Sync_b{b}"
+        prob += D[b] + travel[b] + unload - finish[b] <= setting_time_limit + Slacks_Setting[b], f"Eq8_ShelfLife_b{b}"
+
+        prob += T_tard[b] >= D[b] + travel[b] + unload - tw_end_b[b], f"Def_Tard_b{b}"
+        prob += T_tard[b] <= max_tardiness + Slacks_MaxTard[b], f"Limit_Tard_b{b}"
+
+    # --- Secuencia por sitio (Eq. 13 dura, Eq. 14 blanda): lineal, sin big-M ---
+    batches_by_site = defaultdict(list)
+    for b, site in enumerate(site_ids): batches_by_site[site].append(b)
+    for site, members in batches_by_site.items():
+        for i in range(len(members) - 1):
+            b_curr, b_next = members[i], members[i + 1]
+            Slacks_Lag[(site, i)] = pulp.LpVariable(f"Slack_Lag_{site}_{i}", lowBound=0)
+            prob += D[b_next] >= D[b_curr] + unload, f"Eq13_Seq_{site}_{i}"
+            prob += D[b_next] - D[b_curr] - unload <= MAX_LAG + Slacks_Lag[(site, i)], f"Eq14_Lag_{site}_{i}"
+
+    # --- Disyunciones en unidades: O[b,b2] = 1 si b arranca antes que b2 (compartida entre unidades) ---
+    # M = hi(b) + p_u - lo(b2): el menor valor que desactiva la fila dentro de las ventanas de u;
+    # si algún lote está en otra unidad la fila se desactiva con las cotas de S
+    O, n_unit_rows = {}, 0
+    for b in range(B):
+        for b2 in range(b + 1, B):
+            for u in set(units_of[b]) & set(units_of[b2]):
+                (lo1, hi1), (lo2, hi2), p = bounds[b][0][u], bounds[b2][0][u], procs[u]
+                m_12 = hi1 + p - lo2        # b antes que b2
+                m_21 = hi2 + p - lo1        # b2 antes que b
+                if m_12 <= 0 or m_21 <= 0:
+                    continue                # las ventanas ya ordenan el par en esta unidad
+                if (b, b2) not in O:
+                    O[(b, b2)] = pulp.LpVariable(f"O_b{b}_b{b2}", cat="Binary")
+                both = 2 - A[(b, u)] - A[(b2, u)]
+                off_12 = max(m_12, S[b].upBound + p - S[b2].lowBound)
+                off_21 = max(m_21, S[b2].upBound + p - S[b].lowBound)
+                prob += S[b] + p <= S[b2] + m_12 * (1 - O[(b, b2)]) + off_12 * both, f"Seq_Unit_u{u}_b{b}_b{b2}"
+                prob += S[b2] + p <= S[b] + m_21 * O[(b, b2)] + off_21 * both, f"Seq_Unit_u{u}_b{b2}_b{b}"
+                n_unit_rows += 2
+
+    # --- Disyunciones en camiones: Z[b,b2] = 1 si ambos van en el mismo camión y b sale antes ---
+    # El camión queda ocupado desde D - wash hasta D + 2*travel + unload (mismo intervalo que Cap_Truck)
+    Z, n_truck_rows = {}, 0
+    for b in range(B):
+        for b2 in range(b + 1, B):
+            common = set(trucks_of[b]) & set(trucks_of[b2])
+            if not common:
+                continue
+            (lo1, hi1), (lo2, hi2) = bounds[b][1], bounds[b2][1]
+            trip1 = 2 * travel[b] + unload + wash
+            trip2 = 2 * travel[b2] + unload + wash
+            m_12 = hi1 + trip1 - lo2
+            m_21 = hi2 + trip2 - lo1
+            if m_12 <= 0 or m_21 <= 0:
+                continue                    # nunca se solapan: cualquier camión sirve para ambos
+            order = []
+            # Cada orden solo si cabe en las ventanas; en un mismo sitio Eq. 13 ya fija b antes que b2
+            if lo1 + trip1 <= hi2:
+                order.append((b, b2, trip1, m_12))
+            if lo2 + trip2 <= hi1 and site_ids[b] != site_ids[b2]:
+                order.append((b2, b, trip2, m_21))
+            same = []
+            for (first, second, trip, m) in order:
+                Z[(first, second)] = pulp.LpVariable(f"Z_b{first}_b{second}", cat="Binary")
+                prob += D[first] + trip <= D[second] + m * (1 - Z[(first, second)]), f"Seq_Truck_b{first}_b{second}"
+                same.append(Z[(first, second)])
+                n_truck_rows += 1
+            for v in sorted(common):
+                prob += W[(b, v)] + W[(b2, v)] <= 1 + pulp.lpSum(same), f"Same_Truck_v{v}_b{b}_b{b2}"
+                n_truck_rows += 1
+
+    if strengthen:
+        # Enlace de camión usado (como Cap_Truck <= V_used en el modelo reforzado de cell7)
+        for (b, v), var in W.items():
+            prob += var <= V_used[v], f"Link_Used_b{b}_v{v}"
+
+    alpha = params.get("alpha", 1.0)
+    beta = params.get("beta", 1.0)
+    transp_cost = pulp.lpSum(
+        var * (2 * dist_b[b] * float(trucks[v].get("var_cost_per_km", 0)))
+        for (b, v), var in W.items()
+    )
+    fixed_costs = pulp.lpSum(V_used[v] * float(trucks[v].get("fixed_cost", 0)) for v in range(len(trucks)))
+    slack_cost = PENALTY * (
+        pulp.lpSum(Slacks_Setting.values()) +
+        pulp.lpSum(Slacks_Lag.values()) +
+        pulp.lpSum(Slacks_MaxTard.values())
+    )
+    prob += alpha * (transp_cost + fixed_costs) + beta * pulp.lpSum(T_tard.values()) + slack_cost
+
+    # Tamaño comparado con el modelo indexado en el tiempo (mismos dominios de cell7)
+    X_dom, Y_dom = variable_domains(batches, trucks, units, params, time_points, prune=prune)
+    grid = domain_stats(X_dom, Y_dom, batches, units, params)
+    n_bin = len(A) + len(W) + len(O) + len(Z) + len(V_used)
+    print(f"Tiempo continuo: {n_bin} binarias (A {len(A)}, W {len(W)}, orden unidades {len(O)}, "
+          f"orden camiones {len(Z)}), {len(prob.constraints)} restricciones "
+          f"({n_unit_rows} disyuntivas en unidades, {n_truck_rows} en camiones).")
+    print(f"Indexado en el tiempo (delta = {delta}): X+Y {grid['X'] + grid['Y']} binarias, "
+          f"Cap_Unit+Cap_Truck {grid['Cap_Unit'] + grid['Cap_Truck']} filas.")
+    print(f"Tiempo de construcción: {time.time() - start_time:.2f} s")
+
+    data.shared['prob'] = prob
+    # Dominios de la grilla: solve() arma sobre ellos el warm start de cell8
+    data.shared['continuous_model'] = {"A": A, "W": W, "S": S, "D": D, "O": O, "Z": Z,
+                                       "Slack_Setting": Slacks_Setting, "Slack_MaxTard": Slacks_MaxTard,
+                                       "Slack_Lag": Slacks_Lag, "X_dom": X_dom, "Y_dom": Y_dom}
+    data.shared['X'] = A                  # (b, u) -> variable de asignación
+    data.shared['Y'] = W                  # (b, v) -> variable de asignación
+    data.shared['T_tard'] = T_tard
+    data.shared['V_used'] = V_used
+    data.shared['units_list'] = units
+    data.shared['batches_list'] = batches
+    data.shared['trucks_list'] = trucks
+    data.shared["time_points"] = time_points
+    data.shared['model_builder'] = "continuous"
+    data.shared['fleet_classes'] = None
+
+
+def warm_start(model, batches, trucks, units, params):
+    """
+    Plan de cell8 (construcción sobre los dominios de la grilla, reparado si quedan lotes forzados)
+    cargado como valores iniciales: A/W/S/D del plan, O y Z según el orden de arranques y salidas,
+    T_tard, slacks y V_used con las definiciones de start_values. Devuelve (chosen_X, chosen_Y, lotes
+    sin reparar) o None si la construcción no cubre todos los lotes.
+    """
+    X_dom, Y_dom = model["X_dom"], model["Y_dom"]
+    X_win, Y_win = key_windows([(b, u, t) for b, keys in X_dom.items() for (u, t) in keys],
+                               [(b, v, t) for b, keys in Y_dom.items() for (v, t) in keys])
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+    chosen_X, chosen_Y, forced, _ = build_plan(len(batches), X_win, Y_win, proc_by_ui, batch_info,
+                                               truck_classes(trucks), params)
+    if forced:
+        rep_X, rep_Y, _, stuck = repair_plan(chosen_X, chosen_Y, X_win, Y_win, proc_by_ui, batch_info, params)
+        if len(stuck) < len(forced):
+            chosen_X, chosen_Y, forced = rep_X, rep_Y, stuck
+    if len(chosen_X) < len(batches) or len(chosen_Y) < len(batches):
+        return None
+
+    for (b, u), var in model["A"].items():
+        var.setInitialValue(1 if chosen_X[b][1] == u else 0)
+    for (b, v), var in model["W"].items():
+        var.setInitialValue(1 if chosen_Y[b][1] == v else 0)
+    for b in range(len(batches)):
+        model["S"][b].setInitialValue(chosen_X[b][2])
+        model["D"][b].setInitialValue(chosen_Y[b][2])
+    for (b, b2), var in model["O"].items():
+        var.setInitialValue(1 if chosen_X[b][2] <= chosen_X[b2][2] else 0)
+    for (first, second), var in model["Z"].items():
+        same = chosen_Y[first][1] == chosen_Y[second][1]
+        var.setInitialValue(1 if same and chosen_Y[first][2] < chosen_Y[second][2] else 0)
+
+    values = start_values(chosen_X, chosen_Y, batches, trucks, units, params)
+    for fam in ["Slack_Setting", "Slack_MaxTard", "Slack_Lag"]:
+        for key, var in model[fam].items():
+            var.setInitialValue(values[fam].get(key, 0.0))
+    for fam in ["T_tard", "V_used"]:
+        for key, var in data.shared[fam].items():
+            var.setInitialValue(values[fam].get(key, 0.0))
+    return chosen_X, chosen_Y, forced
+
+
+def solve(time_limit=7200.0):
+    print("\n=== CELDA 11 (TIEMPO CONTINUO): SOLVE MILP ===")
+    start_time = time.time()
+
+    try:
+        prob = data.shared['prob']
+        model = data.shared['continuous_model']
+    except KeyError as e:
+        print(f"Error crítico: Falta {e} en data.shared. Ejecuta cell7_continuous.run() primero.")
+        return
+
+    params = data.shared['params']
+    start = warm_start(model, data.shared['batches_list'], data.shared['trucks_list'],
+                       data.shared['units_list'], params)
+    if start is None:
+        print("Warm start de cell8 incompleto: HiGHS parte de cero.")
+    else:
+        print(f"Warm start de cell8 cargado ({len(start[2])} lotes sin reparar).")
+        data.shared['warm_X'], data.shared['warm_Y'] = start[0], start[1]
+
+    # Mismas opciones que cell11 (hilos, presolve y solver_profile), los valores iniciales vía setSolution
+    # y las reglas de corte anytime (stop_gap, stop_stall_sec, stop_sla_sec)
+    solver = HiGHSWarmStart(timeLimit=time_limit, msg=False, log_file="solver_highs_continuous.log",
+                            anytime=(lambda: cell11_anytime.continuous_decoder(model), params),
+                            telemetry=params, **highs_options(solver_profile(params)))
+    prob.solve(solver)
+
+    status = solve_status(prob)
+    if data.shared['anytime_report']["stop_reason"]:
+        status = "Interrupted"
+    print("\n--- SOLVER FINALIZADO ---")
+    print(f"Estado Final: {status}")
+    print(f"Tiempo Total: {time.time() - start_time:.2f} segundos")
+    print(f"Costo Objetivo: {pulp.value(prob.objective)}")
+    if status != "Optimal":
+        print("ADVERTENCIA: La solución puede no ser óptima (Time Limit o Infeasible).")
+
+    def get_val(v):
+        return v.varValue if v.varValue is not None else 0.0
+
+    # Mismo formato que cell11: (b, u, arranque) y (b, v, salida), con los tiempos continuos
+    chosen_X = {b: (b, u, round(get_val(model["S"][b]), 3))
+                for (b, u), var in model["A"].items() if get_val(var) > 0.5}
+    chosen_Y = {b: (b, v, round(get_val(model["D"][b]), 3))
+                for (b, v), var in model["W"].items() if get_val(var) > 0.5}
+    used_trucks_set = {key[1] for key in chosen_Y.values()}
+
+    data.shared["chosen_X"] = chosen_X
+    data.shared["chosen_Y"] = chosen_Y
+    data.shared["Tt_frac"] = {b: get_val(var) for b, var in data.shared['T_tard'].items()}
+    data.shared["V_used_frac"] = {v: get_val(var) for v, var in data.shared['V_used'].items()}
+
+    print(f"Resumen Solución: {len(chosen_X)} lotes producidos, {len(chosen_Y)} lotes transportados.")
+    print(f"Flota utilizada: {len(used_trucks_set)} camiones.")
+    print("=== CELDA 11 (TIEMPO CONTINUO): FIN ===")
@@ -0,0 +1,98 @@
+# cell7_fleet.py -- Agregación de camiones idénticos en clases de flota
+import heapq
+import math
+from collections import defaultdict
+
+from cell5 import batch_view
+
+# Columnas que definen si dos camiones son intercambiables
+CLASS_COLUMNS = ["capacity_m3", "min_load_m3", "fixed_cost", "var_cost_per_km"]
+
+
+def truck_classes(trucks):
+    """Agrupa trucks_list en clases de camiones idénticos (misma capacidad, carga mínima y costos)."""
+    groups = defaultdict(list)
+    for v_idx, truck in enumerate(trucks):
+        key = tuple(float(truck.get(col, 0) or 0) for col in CLASS_COLUMNS)
+        groups[key].append(v_idx)
+
+    classes = []
+    for key, members in groups.items():
+        entry = dict(zip(CLASS_COLUMNS, key))
+        entry["members"] = members
+        entry["count"] = len(members)
+        classes.append(entry)
+    return classes
+
+
+def class_of_truck(classes):
+    """Índice de camión -> índice de clase."""
+    return {v: c for c, cls in enumerate(classes) for v in cls["members"]}
+
+
+def class_domains(Y_dom, classes):
+    """Dominios (v, t) por lote -> dominios (c, t) por clase, sin duplicados."""
+    class_of = class_of_truck(classes)
+    out = {}
+    for b, keys in Y_dom.items():
+        seen = set()
+        out[b] = []
+        for (v, t) in keys:
+            ct = (class_of[v], t)
+            if ct not in seen:
+                seen.add(ct)
+                out[b].append(ct)
+    return out
+
+
+def assign_trucks(class_Y, classes, batches, params):
+    """
+    Coloreo de intervalos por clase: asigna un camión concreto a cada viaje (b, c, t).
+    El intervalo ocupado es el mismo que en Cap_Truck (lavado + ida + descarga + vuelta,
+    redondeado a la grilla delta), por lo que el número de camiones por clase es el máximo
+    de viajes simultáneos. Devuelve {b: (b, v, t)} con el mismo formato que chosen_Y.
+    """
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    k_wash = int(math.ceil(wash / delta))
+
+    travel_b = batch_view(batches)["travel"]
+    trips_by_class = defaultdict(list)
+    for b, (_, c, t) in class_Y.items():
+        travel = travel_b[b]
+        start = t - k_wash * delta
+        end = t + int(math.ceil((2 * travel + unload) / delta)) * delta
+        trips_by_class[c].append((start, end, b, t))
+
+    chosen_Y = {}
+    for c, trips in trips_by_class.items():
+        trips.sort()
+        free = list(classes[c]["members"])   # camiones aún sin usar, en orden de ID
+        busy = []                            # heap (fin, camión) de camiones ya usados
+        idle = []                            # camiones usados y libres en este instante
+        for (start, end, b, t) in trips:
+            while busy and busy[0][0] <= start:
+                heapq.heappush(idle, heapq.heappop(busy)[1])
+            if idle:
+                v = heapq.heappop(idle)
+            elif free:
+                v = free.pop(0)
+            else:
+                # Más viajes simultáneos que camiones en la clase: se reutiliza el que se libera antes
+                print(f"ADVERTENCIA: clase {c} sin camión libre para el lote {b} en t={t}")
+                v = heapq.heappop(busy)[1]
+            heapq.heappush(busy, (end, v))
+            chosen_Y[b] = (b, v, t)
+    return chosen_Y
+
+
+def decode_fleet(class_Y, classes, batches, params):
+    """
+    Solución del modelo agregado (Y por clase) -> IDs de camión concretos por coloreo de intervalos
+    (assign_trucks) y V_used por camión. Devuelve (chosen_Y, V_used_frac).
+    """
+    chosen_Y = assign_trucks(class_Y, classes, batches, params)
+    used = {key[1] for key in chosen_Y.values()}
+    n_trucks = sum(cls["count"] for cls in classes)
+    return chosen_Y, {v: (1.0 if v in used else 0.0) for v in range(n_trucks)}
@@ -0,0 +1,91 @@
+# cell7_flow.py -- Circulación de camiones como flujo entero en una red tiempo-espacio de la planta
+import math
+import pulp
+from collections import defaultdict
+
+from cell5 import batch_view
+
+
+def trip_arcs(Y, batches, params):
+    """
+    Arcos de viaje de la red: para cada Y (b, c, t) el slot en que el camión deja la planta
+    (inicio del lavado, recortado a T1) y el slot en que vuelve a estar disponible
+    (t + ida + descarga + vuelta redondeado a delta; None si vuelve después de T2).
+    Es la misma ocupación que las filas Cap_Truck y que cell7_fleet.assign_trucks.
+    """
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    k_wash = int(math.ceil(wash / delta))
+
+    travel_b = batch_view(batches)["travel"]
+    arcs = {}
+    for (b, c, t) in Y:
+        travel = travel_b[b]
+        leave = max(T1, t - k_wash * delta)
+        back = t + int(math.ceil((2 * travel + unload) / delta)) * delta
+        arcs[(b, c, t)] = (leave, back if back <= T2 else None)
+    return arcs
+
+
+def add_flow_rows(prob, Y, N_used, classes, batches, params, time_points):
+    """
+    Reemplaza las filas Cap_Truck por conservación de flujo por clase y slot:
+        I[c, t] = I[c, t - delta] + vueltas(c, t) - salidas(c, t),   I[c, T1 - delta] = N_used[c]
+    I es el inventario de camiones libres en planta. Cada Y aparece en dos filas (salida y vuelta)
+    en lugar de una por slot ocupado. Devuelve (I, arcs).
+    """
+    arcs = trip_arcs(Y, batches, params)
+    leaving = defaultdict(list)
+    returning = defaultdict(list)
+    for key, (leave, back) in arcs.items():
+        leaving[(key[1], leave)].append(Y[key])
+        if back is not None:
+            returning[(key[1], back)].append(Y[key])
+
+    I = {}
+    for c in range(len(classes)):
+        prev = N_used[c]
+        for t in time_points:
+            I[(c, t)] = pulp.LpVariable(f"Idle_c{c}_t{t}", lowBound=0)
+            prob += I[(c, t)] == prev + pulp.lpSum(returning[(c, t)]) - pulp.lpSum(leaving[(c, t)]), f"Flow_c{c}_t{t}"
+            prev = I[(c, t)]
+    return I, arcs
+
+
+def inventory_profile(class_Y, n_used, arcs, time_points):
+    """Valores de I para un plan por clase {b: (b, c, t)} con n_used[c] camiones (warm start de cell8)."""
+    delta_by_slot = defaultdict(int)
+    for key in class_Y.values():
+        leave, back = arcs[key]
+        delta_by_slot[(key[1], leave)] -= 1
+        if back is not None:
+            delta_by_slot[(key[1], back)] += 1
+
+    values = {}
+    for c, n in n_used.items():
+        level = n
+        for t in time_points:
+            level += delta_by_slot[(c, t)]
+            values[(c, t)] = float(level)
+    return values
+
+
+def network_stats(arcs, classes, time_points, batches, params):
+    """Filas y no-ceros de la red frente a las filas Cap_Truck por clase que reemplaza."""
+    from cell7 import truck_slots
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+
+    travel_b = batch_view(batches)["travel"]
+    clique_rows, clique_nnz = set(), 0
+    for (b, c, t) in arcs:
+        slots = truck_slots(t, travel_b[b], unload, wash, delta, T1, T2)
+        clique_rows.update((c, s) for s in slots)
+        clique_nnz += len(slots)
+    n_flow = len(classes) * len(time_points)
+    flow_nnz = sum(2 if back is not None else 1 for (_, back) in arcs.values()) + 2 * n_flow
+    return {"rows": n_flow, "nnz": flow_nnz, "clique_rows": len(clique_rows), "clique_nnz": clique_nnz}
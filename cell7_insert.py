@@ -0,0 +1,336 @@
+# cell7_insert.py -- Inserción incremental de pedidos en el modelo matricial en memoria (sin reconstruir)
+import data
+import copy
+import time
+import numpy as np
+import pandas as pd
+
+import cell6
+import cell7_matrix
+from cell7 import variable_domains, MAX_LAG, PENALTY
+from cell5 import add_sites, attach_batches
+from cell7_fleet import truck_classes
+from cell7_matrix import build_arrays, INF
+from cell8 import key_windows, batch_table, build_plan, plan_cost
+from cell8_warmstart import repair_plan
+
+# Familias de filas compartidas entre lotes: las claves (recurso, t) ya existentes se reutilizan
+SHARED_ROW_FAMILIES = ("Cap_Unit", "Cap_Truck")
+# Familias por par consecutivo (sitio, i) de la secuencia de un sitio (Eq. 13 / Eq. 14)
+SEQUENCE_FAMILIES = ("Eq13_Seq", "Eq14_Lag", "Slack_Lag")
+# Estado compartido que la inserción modifica y que se restaura si no hay plan completo
+SOLUTION_KEYS = ("chosen_X", "chosen_Y", "Tt_frac", "V_used_frac", "warm_X", "warm_Y")
+
+
+def offset_key(family, key, b0, seq_offset=None):
+    """
+    Clave local del sub-modelo de pedidos nuevos -> clave global (lotes desplazados en b0).
+    seq_offset = {sitio: lotes ya planificados}: en un sitio existente los pares (sitio, i) de los
+    lotes nuevos siguen a los del plan.
+    """
+    if family in ("X", "Y"):
+        return (key[0] + b0,) + tuple(key[1:])
+    if family in SEQUENCE_FAMILIES:
+        return (key[0], key[1] + (seq_offset or {}).get(key[0], 0))
+    if isinstance(key, tuple):
+        return key          # (u, t) o (v, t): no dependen del índice de lote
+    return key + b0         # filas / columnas por lote
+
+
+def link_sequence(h, idx, row_index, site, i, b_last, b_first, unload):
+    """
+    Eq. 13 / Eq. 14 del par (site, i) entre el último lote ya planificado del sitio (b_last) y el
+    primero de los pedidos nuevos (b_first), con su columna Slack_Lag.
+    """
+    slack = h.getNumCol()
+    h.addCol(PENALTY, 0.0, INF, 0, np.zeros(0, dtype=np.int32), np.zeros(0))
+    terms = [(j, float(key[2])) for key, j in idx["Y"].items() if key[0] == b_first]
+    terms += [(j, -float(key[2])) for key, j in idx["Y"].items() if key[0] == b_last]
+    cols = np.array([j for j, _ in terms] * 2 + [slack], dtype=np.int32)
+    vals = np.array([v for _, v in terms] * 2 + [-1.0])
+    r0 = h.getNumRow()
+    h.addRows(2, np.array([unload, -INF]), np.array([INF, MAX_LAG + unload]), len(cols),
+              np.array([0, len(terms)], dtype=np.int32), cols, vals)
+    row_index["Eq13_Seq"][(site, i)] = r0
+    row_index["Eq14_Lag"][(site, i)] = r0 + 1
+    idx["Slack_Lag"][(site, i)] = slack
+
+
+def stage_solution(batches, trucks, units, params):
+    """
+    (costo de cell8.plan_cost, estado compartido) de la última solución de cell7_matrix.solve,
+    o None si no planifica todos los lotes.
+    """
+    chosen_X, chosen_Y = data.shared.get('chosen_X', {}), data.shared.get('chosen_Y', {})
+    if not len(chosen_X) == len(chosen_Y) == len(batches):
+        return None
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    cost = plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_table(batches), trucks, params)
+    return cost, {key: data.shared.get(key) for key in SOLUTION_KEYS}
+
+
+def fix_dispatched(h, idx, chosen_X, chosen_Y, fix_before):
+    """Fija X e Y de los lotes cuyo camión ya salió (salida < fix_before). Devuelve cuántos."""
+    cols = [idx["X"][chosen_X[b]] for b, key in chosen_Y.items() if key[2] < fix_before and b in chosen_X]
+    cols += [idx["Y"][key] for key in chosen_Y.values() if key[2] < fix_before]
+    if cols:
+        h.changeColsBounds(len(cols), np.array(cols, dtype=np.int32), np.ones(len(cols)), np.ones(len(cols)))
+    return len(cols) // 2
+
+
+def local_window_bounds(h, idx, chosen_X, chosen_Y, radius):
+    """Cierra (cota superior 0) las columnas X/Y de lotes planificados a más de radius min de su plan."""
+    closed = [j for fam, chosen in (("X", chosen_X), ("Y", chosen_Y))
+              for key, j in idx[fam].items()
+              if key[0] in chosen and abs(key[2] - chosen[key[0]][2]) > radius]
+    closed = np.array(closed, dtype=np.int32)
+    if len(closed):
+        h.changeColsBounds(len(closed), closed, np.zeros(len(closed)), np.zeros(len(closed)))
+    return closed
+
+
+def lost_demand(df_new, site_keys, df_new_batches):
+    """m³ pedidos por sitio que no quedan en ningún lote (cell6 descarta los lotes que no caben en un camión)."""
+    ordered = pd.to_numeric(df_new["demand_m3"], errors="coerce").fillna(0).groupby(site_keys.to_numpy()).sum()
+    batched = df_new_batches["volume"].groupby(
+        df_new_batches["site_id"].astype(str).str.strip().str.lower().to_numpy()).sum()
+    lost = ordered - batched.reindex(ordered.index, fill_value=0)
+    return lost[lost > 1e-6]
+
+
+def seed_plan(chosen_X, chosen_Y, b0, idx, batches, trucks, units, params, fix_before):
+    """
+    Warm start completo de la inserción: construcción de cell8 solo para los lotes nuevos (b >= b0)
+    en los huecos que deja el plan actual, reparada en la grilla contra ese plan (fixed en build_plan
+    y repair_plan). Si algún lote nuevo no cabe, se reconstruye todo lo no despachado con solo los
+    viajes despachados fijos y se queda el intento con menos lotes sin reparar.
+    Devuelve (chosen_X, chosen_Y, lotes sin reparar).
+    """
+    X_win, Y_win = key_windows(idx["X"].keys(), idx["Y"].keys())
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    batch_info = batch_table(batches)
+    classes = truck_classes(trucks)
+    new_win = ({b: w for b, w in X_win.items() if b >= b0}, {b: w for b, w in Y_win.items() if b >= b0})
+    planned = sorted(set(chosen_X) & set(chosen_Y))
+    fixed = {b: (chosen_X[b], chosen_Y[b]) for b in planned}
+    # build_plan recorre los índices globales y salta los lotes sin ventana (los del plan actual)
+    new_X, new_Y, _, _ = build_plan(len(batches), *new_win, proc_by_ui, batch_info, classes, params,
+                                    fixed=fixed)
+    rep_X, rep_Y, _, stuck = repair_plan(new_X, new_Y, *new_win, proc_by_ui, batch_info, params, fixed=fixed)
+    best = ({**chosen_X, **rep_X}, {**chosen_Y, **rep_Y}, stuck)
+    if stuck:
+        # Sin huecos para los lotes nuevos: cell8 reconstruye lo no despachado alrededor de lo que ya salió
+        dispatched = {b: fixed[b] for b in planned if fix_before is not None and chosen_Y[b][2] < fix_before}
+        free_win = ({b: w for b, w in X_win.items() if b not in dispatched},
+                    {b: w for b, w in Y_win.items() if b not in dispatched})
+        all_X, all_Y, _, _ = build_plan(len(batches), *free_win, proc_by_ui, batch_info, classes, params,
+                                        fixed=dispatched)
+        all_X, all_Y, _, all_stuck = repair_plan(all_X, all_Y, *free_win, proc_by_ui, batch_info, params,
+                                                 fixed=dispatched)
+        if len(all_stuck) < len(stuck):
+            best = ({**all_X, **{b: x for b, (x, _) in dispatched.items()}},
+                    {**all_Y, **{b: y for b, (_, y) in dispatched.items()}}, all_stuck)
+    return best
+
+
+def insert_orders(new_sites, fix_before=None, time_limit=30.0):
+    """
+    Agrega pedidos nuevos (filas con las columnas de construction_sites.csv) al modelo de
+    cell7_matrix ya resuelto y vuelve a resolver:
+    - los lotes se generan con la lógica de cell6 (build_batches); un pedido en un sitio que ya está
+      en el plan suma su demanda a ese sitio: sus lotes van al final de la secuencia del sitio (Eq. 13 /
+      Eq. 14 enlazadas con el último lote ya planificado) y usan los datos del sitio existente
+      (ventana, viaje, distancia, tipo de concreto),
+    - si cell6 descarta parte de la demanda nueva (lotes que no caben en un camión) no se inserta nada,
+    - solo se agregan sus columnas y filas; las filas Cap_Unit / Cap_Truck existentes reciben
+      los coeficientes de las columnas nuevas,
+    - con fix_before (min) quedan fijados los viajes que ya salieron antes de ese instante,
+    - warm start completo: los lotes nuevos se construyen con cell8 alrededor del plan actual (seed_plan),
+    - etapa 1: los lotes ya planificados solo se mueven +-insert_radius_min de ese warm start;
+      etapa 2: modelo completo con warm start de la etapa 1.
+    time_limit (s, reloj de pared desde la llegada de los pedidos) se reparte entre las dos etapas.
+    Devuelve True con un plan completo; si no, deja el modelo y el plan anteriores y devuelve False.
+    """
+    print("\n=== CELDA 7 (INSERCIÓN): PEDIDOS NUEVOS SOBRE EL MODELO EN MEMORIA ===")
+    start_time = time.time()
+    deadline = start_time + time_limit
+
+    model = data.shared.get('matrix_model')
+    if model is None or "row_index" not in model:
+        print("Error: la inserción requiere el modelo matricial en memoria (cell7_matrix.run() o la caché con model_builder = 'matrix').")
+        return False
+    if data.shared.get('fleet_classes'):
+        print("Error: la inserción no soporta transport_model = 'fleet_class'.")
+        return False
+
+    params = data.shared['params']
+    h = model["highs"]
+    idx, row_index = model["col_index"], model["row_index"]
+    trucks = data.shared['trucks_list']
+    units = data.shared['units_list']
+    batches = data.shared['batches_list']
+    time_points = data.shared["time_points"]
+
+    instance = data.shared['instance']
+    df_new = pd.DataFrame(new_sites)
+    site_keys = df_new["site_id"].astype(str).str.strip().str.lower()
+    at_existing = site_keys.isin(list(instance["site_index"])).to_numpy()
+
+    # 1. Lotes de los pedidos nuevos (misma lógica que cell6); toda la demanda nueva debe quedar en lotes
+    df_new_batches, _ = cell6.build_batches(df_new.copy(), data.shared['df_trucks'], params.get("batch_sizing", "max_cap"))
+    lost = lost_demand(df_new, site_keys, df_new_batches)
+    if len(lost):
+        print(f"Error: {lost.sum():.2f} m³ de los pedidos nuevos no quedan en ningún lote "
+              f"(cell6 descarta los lotes que no caben en un camión): {lost.round(2).to_dict()}. "
+              "No se inserta nada; con batch_sizing = 'fleet_mix' toda la demanda queda en lotes.")
+        return False
+
+    # Estado previo: se restaura si la inserción no termina con un plan completo
+    n_rows_old, n_cols_old = h.getNumRow(), h.getNumCol()
+    lp = h.getLp()
+    old_bounds = (np.array(lp.col_lower_), np.array(lp.col_upper_))
+    old_idx = {family: dict(keys) for family, keys in idx.items()}
+    old_row_index = {family: dict(keys) for family, keys in row_index.items()}
+    old_instance = copy.deepcopy(instance)
+    old_shared = {key: data.shared.get(key) for key in SOLUTION_KEYS}
+    old_frames = {key: data.shared[key].copy() for key in ("df_sites", "df_batches")}
+
+    b0 = len(batches)
+    old_sites = pd.Series([str(b["site_id"]).strip().lower() for b in batches], dtype=object)
+    batch_sites = df_new_batches["site_id"].astype(str).str.strip().str.lower()
+    seq_offset, links = {}, []
+    for site in sorted(set(site_keys[at_existing])):
+        # Sitio ya planificado: los lotes nuevos siguen numerándose después de los del plan
+        old = np.flatnonzero(old_sites.to_numpy() == site)
+        new = np.flatnonzero(batch_sites.to_numpy() == site)
+        seq_offset[site] = len(old)
+        df_new_batches.loc[new, "batch_id"] = [f"{df_new_batches.at[j, 'site_id']}_b{len(old) + k + 1}"
+                                               for k, j in enumerate(new)]
+        if len(old) and len(new):
+            links.append((site, len(old) - 1, int(old[-1]), b0 + int(new[0])))
+        extra = float(pd.to_numeric(df_new.loc[site_keys == site, "demand_m3"], errors="coerce").fillna(0).sum())
+        instance["demand"][instance["site_index"][site]] += extra
+        df_sites = data.shared['df_sites']
+        df_sites.loc[df_sites["site_id"].astype(str).str.strip().str.lower() == site, "demand_m3"] += extra
+    if at_existing.any():
+        print(f"Pedidos en sitios existentes (se agregan a su secuencia): {sorted(set(site_keys[at_existing]))}")
+    new_batches = df_new_batches.to_dict("records")
+    if not at_existing.all():
+        add_sites(instance, df_new[~at_existing], params)
+
+    # 2. Sub-modelo solo con los lotes nuevos (índices locales 0..n-1)
+    X_dom, Y_dom = variable_domains(new_batches, trucks, units, params, time_points,
+                                    prune=params.get("prune_domains", False))
+    sub = build_arrays(new_batches, trucks, units, params, X_dom, Y_dom)
+    A = sub["A"]
+
+    # 3. Filas: las Cap_* existentes se reutilizan, el resto se agregan al final
+    row_map = np.empty(A.shape[0], dtype=np.int64)
+    added_rows = []
+    for family, keys in sub["row_index"].items():
+        old = row_index.setdefault(family, {})
+        for key, r in keys.items():
+            g_key = offset_key(family, key, b0, seq_offset)
+            if family in SHARED_ROW_FAMILIES and g_key in old:
+                row_map[r] = old[g_key]
+            else:
+                row_map[r] = n_rows_old + len(added_rows)
+                old[g_key] = row_map[r]
+                added_rows.append(r)
+    added_rows = np.array(added_rows, dtype=np.int64)
+    h.addRows(len(added_rows), sub["row_lower"][added_rows], sub["row_upper"][added_rows],
+              0, np.zeros(len(added_rows) + 1, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0))
+
+    # 4. Columnas (sin V_used: los camiones son los mismos) con sus coeficientes en filas viejas y nuevas
+    v_cols = set(sub["col_index"]["V_used"].values())
+    keep = np.array([j for j in range(A.shape[1]) if j not in v_cols], dtype=np.int64)
+    A_new = A[:, keep].tocsc()
+    h.addCols(len(keep), sub["cost"][keep], sub["col_lower"][keep], sub["col_upper"][keep], A_new.nnz,
+              A_new.indptr.astype(np.int32), row_map[A_new.indices].astype(np.int32), A_new.data.astype(np.float64))
+    col_map = {int(j): n_cols_old + p for p, j in enumerate(keep)}
+    binaries = np.array([col_map[int(j)] for j in keep if sub["integrality"][j]], dtype=np.int32)
+    h.changeColsIntegrality(len(binaries), binaries, np.ones(len(binaries), dtype=np.uint8))
+
+    for family, keys in sub["col_index"].items():
+        if family == "V_used":
+            continue
+        target = idx.setdefault(family, {})
+        for key, j in keys.items():
+            target[offset_key(family, key, b0, seq_offset)] = col_map[j]
+    for link in links:
+        link_sequence(h, idx, row_index, *link, params.get("unload_time", 30))
+
+    batches.extend(new_batches)
+    data.shared['df_sites'] = pd.concat([data.shared['df_sites'], df_new[~at_existing]], ignore_index=True)
+    data.shared['df_batches'] = pd.concat([data.shared['df_batches'], df_new_batches], ignore_index=True)
+    attach_batches(data.shared['instance'], data.shared['df_batches'])
+    print(f"Pedidos nuevos: {len(df_new)} sitios, {len(new_batches)} lotes -> "
+          f"+{len(keep)} columnas, +{len(added_rows)} filas ({A_new.nnz} no-ceros) "
+          f"en {time.time() - start_time:.2f} s.")
+
+    # 5. Viajes despachados fijados; el resto del plan actual se reoptimiza en dos etapas
+    chosen_X = data.shared.get('chosen_X', {})
+    chosen_Y = data.shared.get('chosen_Y', {})
+    if fix_before is not None:
+        n_fixed = fix_dispatched(h, idx, chosen_X, chosen_Y, fix_before)
+        print(f"Viajes despachados fijados (salida < {fix_before}): {n_fixed}")
+
+    # Warm start completo: con solo el plan actual (solución parcial) HiGHS no completa los lotes nuevos
+    seed_X, seed_Y, stuck = seed_plan(chosen_X, chosen_Y, b0, idx, batches, trucks, units, params, fix_before)
+    print(f"Warm start de la inserción: {len(seed_Y)}/{len(batches)} lotes, {len(stuck)} sin reparar.")
+    data.shared['warm_X'], data.shared['warm_Y'] = seed_X, seed_Y
+
+    # Etapa 1 (reparación local): los lotes ya planificados solo pueden moverse +-radius minutos del warm start
+    radius = params.get("insert_radius_min", 60)
+    closed = local_window_bounds(h, idx, {b: seed_X[b] for b in seed_X if b < b0},
+                                 {b: seed_Y[b] for b in seed_Y if b < b0}, radius)
+    print(f"Etapa 1: plan actual +-{radius} min ({len(closed)} columnas cerradas).")
+    best = None
+    remaining = deadline - time.time()
+    if remaining > 0:
+        cell7_matrix.solve(time_limit=remaining / 2)
+        best = stage_solution(batches, trucks, units, params)
+        if best is not None:
+            data.shared['warm_X'] = dict(data.shared['chosen_X'])
+            data.shared['warm_Y'] = dict(data.shared['chosen_Y'])
+
+    # Etapa 2: modelo completo con la solución de la etapa 1 como warm start, con el tiempo que queda;
+    # se queda el mejor plan completo de las dos etapas
+    if len(closed):
+        h.changeColsBounds(len(closed), closed, np.zeros(len(closed)), np.ones(len(closed)))
+    remaining = deadline - time.time()
+    if remaining > 0:
+        print("Etapa 2: modelo completo con warm start de la etapa 1.")
+        cell7_matrix.solve(time_limit=remaining)
+        result = stage_solution(batches, trucks, units, params)
+        if result is not None and (best is None or result[0] < best[0]):
+            best = result
+
+    if best is None:
+        # Sin plan completo: se descartan filas, columnas y lotes nuevos y vuelve el plan anterior
+        h.deleteRows(h.getNumRow() - n_rows_old, np.arange(n_rows_old, h.getNumRow(), dtype=np.int32))
+        h.deleteCols(h.getNumCol() - n_cols_old, np.arange(n_cols_old, h.getNumCol(), dtype=np.int32))
+        h.changeColsBounds(n_cols_old, np.arange(n_cols_old, dtype=np.int32), *old_bounds)
+        for current, previous in ((idx, old_idx), (row_index, old_row_index)):
+            for family in list(current):
+                if family not in previous:
+                    del current[family]
+            for family, keys in previous.items():
+                current[family].clear()
+                current[family].update(keys)
+        del batches[b0:]
+        instance.clear()
+        instance.update(old_instance)
+        for key, value in old_shared.items():
+            if value is None:
+                data.shared.pop(key, None)
+            else:
+                data.shared[key] = value
+        data.shared.update(old_frames)
+        print(f"Error: la inserción no encontró un plan completo en {time.time() - start_time:.2f} s; "
+              "se conservan el modelo y el plan anteriores.")
+        return False
+
+    data.shared.update(best[1])
+    print(f"Inserción resuelta en {time.time() - start_time:.2f} s desde la llegada de los pedidos.")
+    return True
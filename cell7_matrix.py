@@ -0,0 +1,628 @@
+# cell7_matrix.py -- Constructor matricial del modelo de cell7 (NumPy/SciPy -> highspy, sin objetos PuLP)
+import data
+import os
+import json
+import math
+import time
+import numpy as np
+import scipy.sparse as sp
+from collections import defaultdict
+
+from cell5 import batch_view
+from cell7 import variable_domains, prune_report, MAX_LAG, PENALTY
+from cell7_fleet import class_of_truck, assign_trucks, truck_classes, decode_fleet
+import cell11_anytime
+import cell11_telemetry
+from cell8_warmstart import start_values, matrix_start, log_offset, report_acceptance
+
+INF = np.inf
+# Perfiles de opciones de HiGHS escritos por tune_highs.py (params solver_profile)
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "solver_profiles")
+# Hilos de HiGHS sin perfil: hasta 4, nunca más que los CPU disponibles (con más hilos que núcleos
+# el presolve puede no volver a tiempo de chequear time_limit)
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+
+
+def build_arrays(batches, trucks, units, params, X_dom, Y_dom, occupancy_delta=None):
+    """
+    Misma formulación que cell7.run() pero como arrays de columnas/filas:
+    One_Prod, One_Trip, Eq7_Sync, Eq8_ShelfLife, Def_Tard, Limit_Tard,
+    Cap_Unit, Cap_Truck, Eq13_Seq y Eq14_Lag.
+    Con occupancy_delta, Cap_Unit / Cap_Truck se reemplazan por una relajación de capacidad en
+    minutos por ventanas de slots (Cap_Unit_Win / Cap_Truck_Win), válida para la grilla fina
+    occupancy_delta: se usa al resolver el mismo modelo en una grilla más gruesa.
+    Devuelve un dict con la matriz CSC, cotas, costos, integralidad y los índices
+    (b,u,t) -> columna, (b,v,t) -> columna y familia -> {clave: fila}.
+    """
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    wait = params.get("wait_before_departure", 0)
+    max_tardiness = params.get("max_tardiness_allowed", 120)
+    setting_time_limit = params.get("setting_time", 90)
+    alpha = params.get("alpha", 1.0)
+    beta = params.get("beta", 1.0)
+
+    B, V = len(batches), len(trucks)
+    view = batch_view(batches)
+    site_ids = view["site_id"]
+    travel_b = view["travel"].astype(float)
+    dist_b = view["dist"]
+    tw_end_b = view["tw_end"].astype(float)
+    proc_u = np.array([float(u.get("process_time_min", 0)) for u in units])
+    cost_v = np.array([float(t.get("var_cost_per_km", 0)) for t in trucks])
+    fixed_v = np.array([float(t.get("fixed_cost", 0)) for t in trucks])
+
+    # Safety Net: lote sin camión con capacidad suficiente -> camión más grande en T1
+    # (sobre una copia: los dominios del llamador no cambian)
+    Y_dom = dict(Y_dom)
+    for b in range(B):
+        if not Y_dom[b]:
+            v_max = max(range(V), key=lambda i: float(trucks[i]["capacity_m3"]))
+            Y_dom[b] = [(v_max, T1)]
+
+    # ------------------------------------------------------------
+    # COLUMNAS
+    # ------------------------------------------------------------
+    xb = np.array([b for b in range(B) for _ in X_dom[b]], dtype=np.int64)
+    xu = np.array([u for b in range(B) for (u, _) in X_dom[b]], dtype=np.int64)
+    xt = np.array([t for b in range(B) for (_, t) in X_dom[b]], dtype=np.int64)
+    yb = np.array([b for b in range(B) for _ in Y_dom[b]], dtype=np.int64)
+    yv = np.array([v for b in range(B) for (v, _) in Y_dom[b]], dtype=np.int64)
+    yt = np.array([t for b in range(B) for (_, t) in Y_dom[b]], dtype=np.int64)
+
+    batches_by_site = defaultdict(list)
+    for i, s in enumerate(site_ids): batches_by_site[s].append(i)
+    pairs = [(site, i, idx[i], idx[i + 1]) for site, idx in batches_by_site.items() for i in range(len(idx) - 1)]
+    P = len(pairs)
+
+    nX, nY = len(xb), len(yb)
+    col_X = 0
+    col_Y = col_X + nX
+    col_tard = col_Y + nY
+    col_sset = col_tard + B
+    col_smax = col_sset + B
+    col_slag = col_smax + B
+    col_vused = col_slag + P
+    num_col = col_vused + V
+
+    cost = np.zeros(num_col)
+    cost[col_Y:col_Y + nY] = alpha * 2 * dist_b[yb] * cost_v[yv]
+    cost[col_tard:col_tard + B] = beta
+    cost[col_sset:col_vused] = PENALTY
+    cost[col_vused:] = alpha * fixed_v
+
+    col_lower = np.zeros(num_col)
+    col_upper = np.full(num_col, INF)
+    col_upper[col_X:col_tard] = 1
+    col_upper[col_vused:] = 1
+    integrality = np.zeros(num_col, dtype=np.int32)
+    integrality[col_X:col_tard] = 1
+    integrality[col_vused:] = 1
+
+    # ------------------------------------------------------------
+    # FILAS (tripletes COO por familia)
+    # ------------------------------------------------------------
+    rows, cols, vals = [], [], []
+    row_lower, row_upper = [], []
+    row_index = {}
+    n_rows = 0
+
+    def add_family(name, keys, lower, upper):
+        nonlocal n_rows
+        row_index[name] = {k: n_rows + i for i, k in enumerate(keys)}
+        row_lower.append(np.broadcast_to(np.asarray(lower, dtype=float), (len(keys),)))
+        row_upper.append(np.broadcast_to(np.asarray(upper, dtype=float), (len(keys),)))
+        n_rows += len(keys)
+        return n_rows - len(keys)
+
+    def add_entries(r, c, v):
+        rows.append(np.asarray(r, dtype=np.int64))
+        cols.append(np.asarray(c, dtype=np.int64))
+        vals.append(np.broadcast_to(np.asarray(v, dtype=float), (len(rows[-1]),)))
+
+    def add_window_capacity(name, res_cols, res, start, end):
+        """
+        Relajación de capacidad para grillas gruesas: un arranque en el slot s representa uno en
+        [s, s + delta) de la grilla fina. Los trabajos de un recurso que arrancan en una ventana
+        de k slots son disjuntos y terminan antes de k*delta - occupancy_delta + d_max, así que
+        la suma de sus duraciones no puede superar ese valor (k = 1..ceil(d_max / delta)).
+        """
+        start = np.maximum(start, T1)
+        dur = np.minimum(end, T2 + occupancy_delta) - start
+        slot = (start - T1) // delta
+        d_max = np.zeros(int(res.max()) + 1 if len(res) else 0)
+        np.maximum.at(d_max, res, dur)
+        k_max = np.ceil(d_max / delta).astype(np.int64)
+        parts = []
+        for k in range(1, int(k_max.max()) + 1 if len(k_max) else 1):
+            for shift in range(k):
+                ok = (slot - shift >= 0) & (k_max[res] >= k)
+                parts.append((res[ok], np.full(ok.sum(), k), slot[ok] - shift, res_cols[ok], dur[ok]))
+        if not parts:
+            return
+        res_k, k_k, w_k, col_k, dur_k = (np.concatenate(a) for a in zip(*parts))
+        keys, inv = np.unique(np.stack([res_k, k_k, w_k], axis=1), axis=0, return_inverse=True)
+        upper = keys[:, 1] * delta + d_max[keys[:, 0]] - occupancy_delta
+        r0 = add_family(name, [tuple(int(x) for x in k) for k in keys], -INF, upper)
+        add_entries(r0 + inv.ravel(), col_k, dur_k)
+
+    x_cols = np.arange(col_X, col_X + nX)
+    y_cols = np.arange(col_Y, col_Y + nY)
+    b_range = np.arange(B)
+    x_finish = xt + proc_u[xu]
+
+    r0 = add_family("One_Prod", list(range(B)), 1, 1)
+    add_entries(r0 + xb, x_cols, 1.0)
+    r0 = add_family("One_Trip", list(range(B)), 1, 1)
+    add_entries(r0 + yb, y_cols, 1.0)
+
+    # Eq 7: finish_prod + wash + wait <= depart
+    r0 = add_family("Eq7_Sync", list(range(B)), -INF, -(wash + wait))
+    add_entries(r0 + xb, x_cols, x_finish)
+    add_entries(r0 + yb, y_cols, -yt)
+
+    # Eq 8: depart + travel + unload - finish_prod <= setting + slack
+    r0 = add_family("Eq8_ShelfLife", list(range(B)), -INF, setting_time_limit - travel_b - unload)
+    add_entries(r0 + yb, y_cols, yt)
+    add_entries(r0 + xb, x_cols, -x_finish)
+    add_entries(r0 + b_range, col_sset + b_range, -1.0)
+
+    # Tardanza: depart + travel + unload - tw_end <= T_tard <= max_tard + slack
+    r0 = add_family("Def_Tard", list(range(B)), -INF, tw_end_b - travel_b - unload)
+    add_entries(r0 + yb, y_cols, yt)
+    add_entries(r0 + b_range, col_tard + b_range, -1.0)
+    r0 = add_family("Limit_Tard", list(range(B)), -INF, max_tardiness)
+    add_entries(r0 + b_range, col_tard + b_range, 1.0)
+    add_entries(r0 + b_range, col_smax + b_range, -1.0)
+
+    if occupancy_delta:
+        # Grilla gruesa: capacidad en minutos por ventanas de slots (ocupación redondeada a occupancy_delta)
+        proc_occ = np.ceil(proc_u[xu] / occupancy_delta) * occupancy_delta
+        add_window_capacity("Cap_Unit_Win", x_cols, xu, xt, xt + proc_occ)
+        wash_occ = math.ceil(wash / occupancy_delta) * occupancy_delta
+        trip_occ = np.ceil((2 * travel_b[yb] + unload) / occupancy_delta) * occupancy_delta
+        add_window_capacity("Cap_Truck_Win", y_cols, yv, yt - wash_occ, yt + trip_occ)
+    else:
+        # Capacidad Unidades: cada X ocupa ceil(proc/delta) slots de su unidad
+        n_slots = np.ceil(proc_u[xu] / delta).astype(np.int64)
+        occ_col = np.repeat(x_cols, n_slots)
+        occ_k = np.arange(n_slots.sum()) - np.repeat(np.cumsum(n_slots) - n_slots, n_slots)
+        occ_s = np.repeat(xt, n_slots) + occ_k * delta
+        occ_u = np.repeat(xu, n_slots)
+        keep = occ_s <= T2
+        keys, inv = np.unique(np.stack([occ_u[keep], occ_s[keep]], axis=1), axis=0, return_inverse=True)
+        r0 = add_family("Cap_Unit", [tuple(int(x) for x in k) for k in keys], -INF, 1)
+        add_entries(r0 + inv.ravel(), occ_col[keep], 1.0)
+
+        # Capacidad Camiones: lavado antes de salir + ida + descarga + vuelta
+        k_before = int(math.ceil(wash / delta))
+        k_after = np.ceil((2 * travel_b[yb] + unload) / delta).astype(np.int64)
+        n_slots = k_before + k_after
+        occ_col = np.repeat(y_cols, n_slots)
+        occ_k = np.arange(n_slots.sum()) - np.repeat(np.cumsum(n_slots) - n_slots, n_slots) - k_before
+        occ_s = np.repeat(yt, n_slots) + occ_k * delta
+        occ_v = np.repeat(yv, n_slots)
+        keep = (occ_s >= T1) & (occ_s <= T2)
+        keys, inv = np.unique(np.stack([occ_v[keep], occ_s[keep]], axis=1), axis=0, return_inverse=True)
+        r0 = add_family("Cap_Truck", [tuple(int(x) for x in k) for k in keys], -INF, 1)
+        add_entries(r0 + inv.ravel(), occ_col[keep], 1.0)
+
+    # Secuencia: los términos de salida de cada lote se calculan una sola vez
+    y_order = np.argsort(yb, kind="stable")
+    y_start = np.searchsorted(yb[y_order], np.arange(B + 1))
+    dep_cols = [y_cols[y_order[y_start[b]:y_start[b + 1]]] for b in range(B)]
+    dep_coef = [yt[y_order[y_start[b]:y_start[b + 1]]].astype(float) for b in range(B)]
+
+    pair_keys = [(site, i) for (site, i, _, _) in pairs]
+    r_seq = add_family("Eq13_Seq", pair_keys, unload, INF)
+    r_lag = add_family("Eq14_Lag", pair_keys, -INF, MAX_LAG + unload)
+    for p, (site, i, b_curr, b_next) in enumerate(pairs):
+        for r in (r_seq + p, r_lag + p):
+            add_entries(np.full(len(dep_cols[b_next]), r), dep_cols[b_next], dep_coef[b_next])
+            add_entries(np.full(len(dep_cols[b_curr]), r), dep_cols[b_curr], -dep_coef[b_curr])
+        add_entries([r_lag + p], [col_slag + p], -1.0)
+
+    A = sp.coo_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_rows, num_col)
+    ).tocsc()
+    A.sum_duplicates()
+
+    col_index = {
+        "X": {(int(b), int(u), int(t)): col_X + j for j, (b, u, t) in enumerate(zip(xb, xu, xt))},
+        "Y": {(int(b), int(v), int(t)): col_Y + j for j, (b, v, t) in enumerate(zip(yb, yv, yt))},
+        "T_tard": {b: col_tard + b for b in range(B)},
+        "Slack_Setting": {b: col_sset + b for b in range(B)},
+        "Slack_MaxTard": {b: col_smax + b for b in range(B)},
+        "Slack_Lag": {k: col_slag + p for p, k in enumerate(pair_keys)},
+        "V_used": {v: col_vused + v for v in range(V)},
+    }
+
+    return {
+        "A": A,
+        "cost": cost,
+        "col_lower": col_lower,
+        "col_upper": col_upper,
+        "integrality": integrality,
+        "row_lower": np.concatenate(row_lower) if row_lower else np.zeros(0),
+        "row_upper": np.concatenate(row_upper) if row_upper else np.zeros(0),
+        "col_index": col_index,
+        "row_index": row_index,
+    }
+
+
+def to_highs(model):
+    """Pasa el modelo matricial a highspy en una sola llamada (passModel)."""
+    import highspy
+
+    A = model["A"]
+    h = highspy.Highs()
+    h.passModel(
+        A.shape[1], A.shape[0], A.nnz, 1, 1, 0.0,
+        model["cost"], model["col_lower"], model["col_upper"],
+        model["row_lower"], model["row_upper"],
+        A.indptr.astype(np.int32), A.indices.astype(np.int32), A.data.astype(np.float64),
+        model["integrality"]
+    )
+    return h
+
+
+def solver_profile(params):
+    """
+    Opciones de HiGHS del perfil params['solver_profile'] (solver_profiles/<nombre>.json, escrito por
+    tune_highs.py), o {} sin perfil. cell11 y configure_highs las aplican sobre sus valores por defecto.
+    """
+    name = params.get("solver_profile")
+    if not name:
+        return {}
+    path = os.path.join(PROFILE_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        print(f"ADVERTENCIA: perfil de solver '{name}' no encontrado en {PROFILE_DIR}; se usan las opciones por defecto.")
+        return {}
+    with open(path) as f:
+        return json.load(f)["options"]
+
+
+def configure_highs(h, time_limit=7200.0, log_file="solver_highs.log"):
+    """Opciones de solve comunes (DEFAULT_THREADS hilos, presolve, log a archivo) más las del perfil."""
+    # time_limit de HiGHS se mide desde el inicio de cada run() (getRunTime() sí es acumulado)
+    h.setOptionValue("time_limit", float(time_limit))
+    h.setOptionValue("threads", DEFAULT_THREADS)
+    h.setOptionValue("presolve", "on")
+    h.setOptionValue("log_file", log_file)
+    for key, value in solver_profile(data.shared.get('params', {})).items():
+        h.setOptionValue(key, value)
+
+
+def warm_start_columns(model):
+    """
+    Warm start de cell8 (warm_X / warm_Y) como (columnas, valores) del modelo matricial: X/Y del plan y,
+    con el plan completo, V_used, T_tard y slacks exactos. None si no hay warm start.
+    """
+    warm_X = data.shared.get('warm_X', {})
+    warm_Y = data.shared.get('warm_Y', {})
+    if not (warm_X and warm_Y):
+        return None
+    fleet_classes = data.shared.get('fleet_classes')
+    values = start_values(warm_X, warm_Y, data.shared['batches_list'], data.shared['trucks_list'],
+                          data.shared['units_list'], data.shared['params'], fleet_classes)
+    ws = matrix_start(model["col_index"], warm_X, warm_Y, values, fleet_classes)
+    return (np.fromiter(ws.keys(), dtype=np.int32, count=len(ws)),
+            np.fromiter(ws.values(), dtype=np.float64, count=len(ws)))
+
+
+def occupancy_violations(chosen_X, chosen_Y, row_index, units, batches, params):
+    """
+    Barrido de intervalos por unidad y por camión sobre la solución decodificada: devuelve las filas
+    Cap_Unit / Cap_Truck de los slots ocupados por más de un trabajo (misma ocupación que build_arrays).
+    """
+    T1 = params["T1"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    k_before = int(math.ceil(wash / delta)) * delta
+
+    travel_b = batch_view(batches)["travel"]
+    jobs = defaultdict(list)
+    for (b, u, t) in chosen_X.values():
+        jobs[("Cap_Unit", u)].append((t, t + int(math.ceil(float(units[u]["process_time_min"]) / delta)) * delta))
+    for (b, v, t) in chosen_Y.values():
+        jobs[("Cap_Truck", v)].append((t - k_before, t + int(math.ceil((2 * travel_b[b] + unload) / delta)) * delta))
+
+    rows = set()
+    for (family, res), intervals in jobs.items():
+        keys = row_index.get(family, {})
+        intervals.sort()
+        reach = -INF
+        for (start, end) in intervals:
+            if start < reach:
+                # [start, min(end, reach)) queda ocupado dos veces; se agregan todos los slots del
+                # trabajo que solapa para que la siguiente ronda no lo corra apenas un slot
+                for slot in range(start, end, delta):
+                    if slot >= T1 and (res, slot) in keys:
+                        rows.add(keys[(res, slot)])
+            reach = max(reach, end)
+    return rows
+
+
+def recolor_trucks(chosen_Y, trucks, batches, params):
+    """
+    Reasigna camiones idénticos por coloreo de intervalos (cell7_fleet.assign_trucks).
+    Devuelve None si en algún slot una clase tiene más viajes simultáneos que camiones.
+    """
+    T1 = params["T1"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    unload = params.get("unload_time", 30)
+    classes = truck_classes(trucks)
+    class_of = class_of_truck(classes)
+
+    travel_b = batch_view(batches)["travel"]
+    load = defaultdict(int)
+    for (b, v, t) in chosen_Y.values():
+        for s in range(t - int(math.ceil(wash / delta)) * delta,
+                       t + int(math.ceil((2 * travel_b[b] + unload) / delta)) * delta, delta):
+            if s >= T1:
+                load[(class_of[v], s)] += 1
+    if any(n > classes[c]["count"] for (c, _), n in load.items()):
+        return None
+    class_Y = {b: (b, class_of[v], t) for b, (_, v, t) in chosen_Y.items()}
+    return assign_trucks(class_Y, classes, batches, params)
+
+
+def unsupported_options(params):
+    """Avisa de las opciones de construcción de cell7 que build_arrays no implementa (se ignoran)."""
+    if params.get("transport_model", "per_truck") != "per_truck":
+        print("ADVERTENCIA: el modelo matricial usa camiones individuales (transport_model ignorado; "
+              "fleet_class / flow requieren model_builder = 'pulp').")
+    if params.get("strengthen_formulation", False):
+        print("ADVERTENCIA: el modelo matricial no tiene las filas de strengthen_formulation (opción ignorada).")
+
+
+def decode_solution(model, col_value):
+    """Valores de columna -> chosen_X / chosen_Y / Tt_frac / V_used_frac (mismo formato que cell11)."""
+    idx = model["col_index"]
+    chosen_X = {key[0]: key for key, j in idx["X"].items() if col_value[j] > 0.5}
+    chosen_Y = {key[0]: key for key, j in idx["Y"].items() if col_value[j] > 0.5}
+    Tt_frac = {b: float(col_value[j]) for b, j in idx["T_tard"].items()}
+    V_used_frac = {v: float(col_value[j]) for v, j in idx["V_used"].items()}
+    return chosen_X, chosen_Y, Tt_frac, V_used_frac
+
+
+def run():
+    print("=== CELDA 7 (MATRICIAL): CONSTRUCCIÓN MODELO NUMPY/SCIPY -> HIGHS ===")
+    start_time = time.time()
+
+    params = data.shared['params']
+    batches = data.shared['df_batches'].to_dict("records")
+    trucks = data.shared['df_trucks'].to_dict("records")
+    units = data.shared['df_units'].to_dict("records")
+
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    time_points = list(range(T1, T2 + 1, delta))
+    prune = params.get("prune_domains", False)
+    unsupported_options(params)
+
+    print(f"Generando columnas para {len(batches)} lotes...")
+    X_dom, Y_dom = variable_domains(batches, trucks, units, params, time_points, prune=prune)
+    if prune:
+        data.shared['prune_report'] = prune_report(batches, trucks, units, params, time_points, X_dom, Y_dom)
+
+    model = build_arrays(batches, trucks, units, params, X_dom, Y_dom)
+    model["highs"] = to_highs(model)
+
+    A = model["A"]
+    n_int = int(model["integrality"].sum())
+    print(f"Modelo matricial: {A.shape[1]} columnas ({n_int} binarias), {A.shape[0]} filas, {A.nnz} no-ceros.")
+    print(f"Tiempo de construcción: {time.time() - start_time:.2f} s")
+
+    idx = model["col_index"]
+    data.shared['matrix_model'] = model
+    data.shared['X'] = idx["X"]           # (b,u,t) -> columna
+    data.shared['Y'] = idx["Y"]           # (b,v,t) -> columna
+    data.shared['T_tard'] = idx["T_tard"]
+    data.shared['V_used'] = idx["V_used"]
+    data.shared['units_list'] = units
+    data.shared['batches_list'] = batches
+    data.shared['trucks_list'] = trucks
+    data.shared["time_points"] = time_points
+    data.shared['model_builder'] = "matrix"
+    data.shared['fleet_classes'] = None
+
+    print("Modelo matricial guardado en data.shared['matrix_model'].")
+
+
+def solve(time_limit=7200.0):
+    print("\n=== CELDA 11 (MATRICIAL): SOLVE HIGHSPY DIRECTO ===")
+    start_time = time.time()
+
+    try:
+        model = data.shared['matrix_model']
+    except KeyError as e:
+        print(f"Error crítico: Falta {e} en data.shared. Ejecuta cell7_matrix.run() primero.")
+        return
+
+    h = model["highs"]
+    configure_highs(h, time_limit)
+
+    # Warm start de cell8
+    fleet_classes = data.shared.get('fleet_classes')
+    log_start = None
+    start = warm_start_columns(model)
+    if start is not None:
+        h.setSolution(len(start[0]), *start)
+        log_start = log_offset("solver_highs.log")
+        print(f"Warm start inyectado ({len(data.shared['warm_Y'])} lotes).")
+
+    # Filas de ocupación perezosas: Cap_Unit / Cap_Truck libres hasta que una solución las viole
+    lazy, repaired_Y, lazy_fallback = None, None, None
+    if data.shared['params'].get("lazy_occupancy", False):
+        if "row_index" not in model:
+            print("ADVERTENCIA: lazy_occupancy requiere el índice de filas del modelo matricial; se resuelve completo.")
+        else:
+            lazy = np.array([r for fam in ("Cap_Unit", "Cap_Truck") for r in model["row_index"].get(fam, {}).values()],
+                            dtype=np.int32)
+            lazy_upper = np.asarray(h.getLp().row_upper_)[lazy]
+            h.changeRowsBounds(len(lazy), lazy, np.full(len(lazy), -INF), np.full(len(lazy), INF))
+            print(f"Ocupación perezosa: {len(lazy)} filas Cap_Unit/Cap_Truck desactivadas.")
+            check = (model["row_index"], data.shared['units_list'], data.shared['batches_list'], data.shared['params'])
+            # Mejor incumbente que ya cumple todas las filas perezosas: respaldo si el tiempo se acaba
+            # con filas violadas (las rondas solo ven las filas agregadas hasta ese momento)
+            clean = {"objective": INF, "col_value": None, "chosen_Y": None}
+
+            def on_lazy_incumbent(e):
+                objective = e.data_out.objective_function_value
+                if objective >= clean["objective"] - 1e-9:
+                    return
+                col_value = np.asarray(e.data_out.mip_solution)
+                chosen_X, chosen_Y, _, _ = decode_solution(model, col_value)
+                recolored = recolor_trucks(chosen_Y, data.shared['trucks_list'], data.shared['batches_list'], data.shared['params'])
+                if not occupancy_violations(chosen_X, recolored if recolored is not None else chosen_Y, *check):
+                    clean.update(objective=objective, col_value=col_value.copy(), chosen_Y=recolored)
+            h.cbMipImprovingSolution.subscribe(on_lazy_incumbent)
+
+    # Carrera de configuraciones en procesos separados (cell11_portfolio) en lugar de un solo run()
+    portfolio = None
+    if data.shared['params'].get("solver_portfolio", False):
+        if lazy is not None:
+            print("ADVERTENCIA: solver_portfolio no se combina con lazy_occupancy; se resuelve con un solo HiGHS.")
+        else:
+            import cell11_portfolio   # importa cell11_lns, que importa este módulo
+            portfolio = cell11_portfolio.race(h, data.shared['params'],
+                                              data.shared['params'].get("portfolio_time_sec", time_limit), start)
+
+    # Incumbentes publicados en cuanto aparecen y reglas de corte (stop_gap / stop_stall_sec / stop_sla_sec)
+    anytime = cell11_anytime.attach(h, lambda col_value: decode_solution(model, col_value)[:2],
+                                    data.shared['params'])
+    # Serie de progreso del solve (telemetry_file / telemetry_prom_file), también en las rondas perezosas
+    telemetry = cell11_telemetry.attach(h, data.shared['params'], "matrix") if portfolio is None else None
+    if portfolio is None:
+        h.run()
+    if log_start is not None and portfolio is None:
+        report_acceptance(data.shared.get('warm_start_report'), "solver_highs.log", log_start)
+
+    if lazy is not None:
+        import highspy
+        upper_of = dict(zip(lazy.tolist(), lazy_upper))
+        pending = set(upper_of)
+        rounds, n_added = 1, 0
+        lazy_ok = False
+        while h.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+            col_value = np.asarray(h.getSolution().col_value)
+            chosen_X, chosen_Y, _, _ = decode_solution(model, col_value)
+            # Solapes entre camiones idénticos: se resuelven recoloreando, sin agregar filas Cap_Truck
+            recolored = recolor_trucks(chosen_Y, data.shared['trucks_list'], data.shared['batches_list'], data.shared['params'])
+            repaired_Y = recolored
+            if recolored is not None:
+                chosen_Y = recolored
+            violated = occupancy_violations(chosen_X, chosen_Y, *check) & pending
+            if not violated:
+                lazy_ok = True
+                break
+            remaining = time_limit - (time.time() - start_time)
+            if remaining <= 0 or anytime["stop_reason"]:
+                print(f"ADVERTENCIA: sin tiempo para otra ronda; la solución viola {len(violated)} filas de ocupación.")
+                break
+            rows = np.array(sorted(violated), dtype=np.int32)
+            h.changeRowsBounds(len(rows), rows, np.full(len(rows), -INF), np.array([upper_of[r] for r in rows]))
+            pending -= violated
+            n_added += len(rows)
+            unit_rows = set(model["row_index"].get("Cap_Unit", {}).values())
+            n_unit = len(violated & unit_rows)
+            print(f"  Ronda {rounds}: {len(rows)} filas violadas agregadas ({n_unit} Cap_Unit, "
+                  f"{len(rows) - n_unit} Cap_Truck; {n_added} en total).")
+
+            # Re-solve: la familia sin violaciones de la ronda anterior pasa como solución parcial
+            keep = []
+            if not violated & unit_rows:
+                keep = [model["col_index"]["X"][key] for key in chosen_X.values()]
+            elif violated <= unit_rows:
+                keep = [model["col_index"]["Y"][key] for key in chosen_Y.values()]
+            if keep:
+                h.setSolution(len(keep), np.array(keep, dtype=np.int32), np.ones(len(keep)))
+            configure_highs(h, remaining)
+            h.run()
+            rounds += 1
+            repaired_Y = None
+
+        h.cbMipImprovingSolution.unsubscribe(on_lazy_incumbent)
+        print(f"Ocupación perezosa: {rounds} rondas, {n_added} de {len(lazy)} filas agregadas.")
+
+        if not lazy_ok:
+            # La última solución viola filas no agregadas (o no hay solución): su objetivo es una cota
+            # inferior, no un plan. Se entrega el mejor plan que cumple todas las filas de ocupación
+            candidates = []
+            if clean["col_value"] is not None:
+                candidates.append((clean["objective"], "el mejor incumbente sin violaciones", clean["col_value"],
+                                   clean["chosen_Y"]))
+            warm_X, warm_Y = data.shared.get('warm_X', {}), data.shared.get('warm_Y', {})
+            if (start is not None and len(warm_Y) == len(data.shared['batches_list'])
+                    and not occupancy_violations(warm_X, warm_Y, *check)):
+                warm = np.zeros(h.getNumCol())
+                warm[start[0]] = start[1]
+                candidates.append((float(model["cost"] @ warm), "el warm start de cell8", warm, None))
+            lazy_fallback = min(candidates, key=lambda c: c[0]) if candidates else None
+        data.shared['lazy_report'] = {"rounds": rounds, "rows_added": n_added, "rows_total": len(lazy),
+                                      "complete": lazy_ok,
+                                      "fallback": lazy_fallback[1] if lazy_fallback is not None else None}
+    cell11_anytime.detach(h, anytime)
+    cell11_telemetry.detach(h, telemetry)
+
+    if portfolio is None:
+        status = h.modelStatusToString(h.getModelStatus())
+        obj_val = h.getInfo().objective_function_value
+        col_value = np.asarray(h.getSolution().col_value)
+    else:
+        status = "Optimal" if portfolio["proven"] else ("Infeasible" if portfolio["infeasible"] else "Time limit reached")
+        obj_val = portfolio["objective"]
+        col_value = portfolio["col_value"] if portfolio["col_value"] is not None else np.zeros(0)
+    if lazy is not None and not data.shared['lazy_report']["complete"]:
+        # Nunca "Optimal" con filas perezosas violadas
+        if status == "Optimal":
+            status = "Time limit reached"
+        if lazy_fallback is None:
+            print("ADVERTENCIA: ninguna solución cumple todas las filas de ocupación (ni incumbente ni warm start).")
+            obj_val, col_value = None, np.zeros(0)
+        else:
+            obj_val, label, col_value, repaired_Y = lazy_fallback
+            print(f"Ocupación perezosa: la última solución viola filas sin agregar; se entrega {label} "
+                  f"(objetivo {obj_val:.1f}).")
+    end_time = time.time()
+
+    print("\n--- SOLVER FINALIZADO ---")
+    print(f"Estado Final: {status}")
+    print(f"Tiempo Total: {end_time - start_time:.2f} segundos")
+    print(f"Costo Objetivo: {obj_val}")
+
+    if status != "Optimal":
+        print("ADVERTENCIA: La solución puede no ser óptima (Time Limit o Infeasible).")
+
+    if lazy is not None and pending:
+        # El modelo en memoria vuelve a quedar completo para solves posteriores
+        rows = np.array(sorted(pending), dtype=np.int32)
+        h.changeRowsBounds(len(rows), rows, np.full(len(rows), -INF), np.array([upper_of[r] for r in rows]))
+    if len(col_value) != h.getNumCol():
+        print("ADVERTENCIA: El solver no devolvió solución.")
+        return
+
+    chosen_X, chosen_Y, Tt_frac, V_used_frac = decode_solution(model, col_value)
+    if repaired_Y is not None:
+        # Ocupación perezosa: camiones reasignados por coloreo (el LP no ve qué camión idéntico se usa)
+        chosen_Y = repaired_Y
+        used_trucks_set = {key[1] for key in chosen_Y.values()}
+        V_used_frac = {v: (1.0 if v in used_trucks_set else 0.0) for v in V_used_frac}
+    if fleet_classes:
+        # Modo agregado: Y es por clase -> IDs de camión concretos por coloreo de intervalos
+        chosen_Y, V_used_frac = decode_fleet(chosen_Y, fleet_classes, data.shared['batches_list'], data.shared['params'])
+    data.shared["chosen_X"] = chosen_X
+    data.shared["chosen_Y"] = chosen_Y
+    data.shared["Tt_frac"] = Tt_frac
+    data.shared["V_used_frac"] = V_used_frac
+
+    used_trucks_set = {key[1] for key in chosen_Y.values()}
+    print(f"Resumen Solución: {len(chosen_X)} lotes producidos, {len(chosen_Y)} lotes transportados.")
+    print(f"Flota utilizada: {len(used_trucks_set)} camiones.")
+    print("=== CELDA 11 (MATRICIAL): FIN ===")
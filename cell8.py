@@ -5,6 +5,445 @@ from copy import deepcopy
 from collections import defaultdict
 import shutil
 import math
+import bisect
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cell7_fleet import class_of_truck, truck_classes
+import cell7_flow
+import cell8_warmstart
+import cell8_store
+import numpy as np
+from cell5 import batch_view
+from cell7 import PENALTY, MAX_LAG
+
+
+# --- Índices de huecos libres: listas ordenadas de intervalos [inicio, fin) ---
+# Por recurso, los huecos libres; por grupo de recursos idénticos (clase de camión, unidades con
+# igual tiempo de proceso) un "pool" con el frente (fin del último trabajo, recurso) y los huecos
+# interiores ordenados por fin, para elegir recurso e inicio con búsquedas binarias.
+
+def free_gaps():
+    """Recurso libre en todo el día: un único hueco (-inf, inf)."""
+    return [[-math.inf], [math.inf]]
+
+
+def latest_fit(gaps, lo, hi, length):
+    """Último inicio s en [lo, hi] con [s, s + length) libre en un recurso."""
+    starts, ends = gaps
+    j = bisect.bisect_right(starts, hi) - 1
+    while j >= 0:
+        s = min(hi, ends[j] - length)
+        if s < lo:
+            return None
+        if s >= starts[j]:
+            return s
+        j -= 1
+    return None
+
+
+def reserve(gaps, s, e):
+    """
+    Ocupa [s, e) en un recurso: recorta los huecos que lo intersecan (también si ya estaba ocupado
+    en parte). Devuelve (huecos quitados, huecos agregados) como listas de (inicio, fin).
+    """
+    starts, ends = gaps
+    i = j = bisect.bisect_right(ends, s)
+    new_starts, new_ends = [], []
+    while j < len(starts) and starts[j] < e:
+        if starts[j] < s:
+            new_starts.append(starts[j]); new_ends.append(s)
+        if ends[j] > e:
+            new_starts.append(e); new_ends.append(ends[j])
+        j += 1
+    removed = list(zip(starts[i:j], ends[i:j]))
+    starts[i:j] = new_starts
+    ends[i:j] = new_ends
+    return removed, list(zip(new_starts, new_ends))
+
+
+def new_pool(members):
+    return {"gaps": {m: free_gaps() for m in members},
+            "frontier": sorted((-math.inf, m) for m in members),   # (inicio del hueco final, recurso)
+            "holes": []}                                             # (fin, inicio, recurso)
+
+
+def pool_earliest(pool, lo, hi, length, rng=None):
+    """
+    Inicio más temprano s en [lo, hi] con [s, s + length) libre en algún recurso del pool.
+    Devuelve (s, recurso, nuevo) o None; nuevo = el recurso no tiene trabajos todavía.
+    A igual inicio se prefiere rellenar un hueco interior y luego el frente más ajustado
+    (con rng, un recurso ya usado al azar entre los libres en lo).
+    """
+    best = None
+    holes = pool["holes"]
+    i = bisect.bisect_left(holes, (lo + length,))
+    while i < len(holes):
+        end, start, m = holes[i]
+        s = max(lo, start)
+        if s <= hi and s + length <= end and (best is None or s < best[0]):
+            best = (s, m, False)
+            if s == lo:
+                return best
+        i += 1
+
+    frontier = pool["frontier"]
+    j = bisect.bisect_right(frontier, (lo, math.inf)) - 1
+    if j >= 0:
+        n_new = bisect.bisect_right(frontier, (-math.inf, math.inf))
+        if rng is not None and j >= n_new:
+            j = rng.randint(n_new, j)
+        busy_end, m = frontier[j]
+        s = lo
+    elif frontier:
+        busy_end, m = frontier[0]
+        s = busy_end
+    else:
+        return best
+    if s <= hi and (best is None or s < best[0]):
+        best = (s, m, busy_end == -math.inf)
+    return best
+
+
+def pool_reserve(pool, m, s, e):
+    """Ocupa [s, e) en el recurso m y actualiza el frente y los huecos del pool."""
+    removed, added = reserve(pool["gaps"][m], s, e)
+    for (gs, ge) in removed:
+        if ge == math.inf:
+            pool["frontier"].pop(bisect.bisect_left(pool["frontier"], (gs, m)))
+        else:
+            pool["holes"].pop(bisect.bisect_left(pool["holes"], (ge, gs, m)))
+    for (gs, ge) in added:
+        if ge == math.inf:
+            bisect.insort(pool["frontier"], (gs, m))
+        else:
+            bisect.insort(pool["holes"], (ge, gs, m))
+
+
+def construct(batches_order, X_win, Y_win, proc_by_ui, batch_info, classes, params, rng=None, rcl_min=0,
+              fixed=None):
+    """
+    Constructiva con huecos: cada lote toma la unidad que termina antes dentro de su ventana
+    (arrancando justo a tiempo para su salida y rellenando huecos anteriores al último trabajo),
+    el camión que sale antes desde max(fin + lavado + espera, secuencia del sitio) y luego la
+    producción se corre lo más tarde posible antes de la salida (setting time).
+    La ocupación es la de Cap_Unit / Cap_Truck (grilla delta). Si un lote no cabe en su ventana
+    se coloca en el recurso que se libera antes, recortado a la ventana (solape forzado).
+    Con rng (GRASP) la unidad y el camión se sortean entre los grupos que terminan / salen a lo
+    sumo rcl_min minutos después del mejor. fixed = {b: ((b,u,t), (b,v,t))} son decisiones ya tomadas
+    (plan actual de cell7_insert): ocupan sus recursos y marcan la secuencia de su sitio.
+    Devuelve (chosen_X, chosen_Y, lotes con solape forzado).
+    """
+    T1 = params.get("T1", 420)
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 0)
+    wait = params.get("wait_before_departure", 0)
+    unload_time = params.get("unload_time", 20)
+    k_wash = int(math.ceil(wash / delta)) * delta
+
+    def align_up(x):
+        return T1 + math.ceil((x - T1) / delta - 1e-9) * delta
+
+    def align_down(x):
+        return T1 + math.floor((x - T1) / delta + 1e-9) * delta
+
+    # Unidades idénticas (mismo tiempo de proceso) comparten pool y ventana
+    unit_groups = defaultdict(list)
+    for u, p in sorted(proc_by_ui.items()):
+        unit_groups[p].append(u)
+    unit_pools = [(p, int(math.ceil(p / delta)) * delta, members[0], new_pool(members))
+                  for p, members in sorted(unit_groups.items())]
+    unit_pool_of = {u: pool for (_, _, _, pool) in unit_pools for u in pool["gaps"]}
+    truck_pools = [(cls["members"][0], new_pool(cls["members"])) for cls in classes]
+    truck_pool_of = {v: pool for (_, pool) in truck_pools for v in pool["gaps"]}
+    site_last_unload = {}
+    for b, ((_, u, tx), (_, v, ty)) in (fixed or {}).items():
+        travel = batch_info[b]["travel"]
+        pool_reserve(unit_pool_of[u], u, tx, tx + int(math.ceil(proc_by_ui[u] / delta)) * delta)
+        pool_reserve(truck_pool_of[v], v, ty - k_wash, ty + int(math.ceil((2 * travel + unload_time) / delta)) * delta)
+        site_id = batch_info[b]["site_id"]
+        site_last_unload[site_id] = max(site_last_unload.get(site_id, -math.inf), ty + travel + unload_time)
+
+    chosen_X, chosen_Y = {}, {}
+    forced_batches = []
+    for b in batches_order:
+        if not X_win.get(b) or not Y_win.get(b):
+            continue
+        info = batch_info[b]
+        travel = info["travel"]
+        dep_seq = site_last_unload.get(info["site_id"], -math.inf) - travel   # Eq. 13
+        allowed = [(rep, pool) for rep, pool in truck_pools if rep in Y_win[b]]
+        dep_first = min(Y_win[b][rep][0] for rep, _ in allowed)
+        target = max(dep_seq, dep_first) - wash - wait
+
+        # A. Producción: grupo de unidades que termina antes, arrancando justo a tiempo si se puede
+        hits_x = []
+        for proc, occ, rep, pool in unit_pools:
+            if rep not in X_win[b]:
+                continue
+            lo, hi = X_win[b][rep]
+            hit = pool_earliest(pool, min(max(lo, align_up(target - proc)), hi), hi, occ, rng)
+            if hit is None:
+                hit = pool_earliest(pool, lo, hi, occ, rng)
+            if hit is not None:
+                hits_x.append((hit[0] + proc, hit[1], hit[0]))
+        best_x = None
+        if hits_x:
+            best_x = min(hits_x)[1:]
+            if rng is not None:
+                best_x = rng.choice([h for h in hits_x if h[0] <= min(hits_x)[0] + rcl_min])[1:]
+        forced = best_x is None
+        if forced:
+            # Sin hueco en la ventana: la unidad que se libera antes, recortada a su ventana
+            hits = [(pool_earliest(pool, X_win[b][rep][0], math.inf, occ), rep)
+                    for _, occ, rep, pool in unit_pools if rep in X_win[b]]
+            (s, u, _), rep = min(hits)
+            best_x = (u, min(X_win[b][rep][1], s))
+        ux, tx = best_x
+        occ_x = int(math.ceil(proc_by_ui[ux] / delta)) * delta
+
+        # B. Transporte: salida más temprana; a igual salida, camión ya usado
+        dep_lo = align_up(max(tx + proc_by_ui[ux] + wash + wait, dep_seq))
+        trip_len = int(math.ceil((2 * travel + unload_time) / delta)) * delta
+        hits_y = []
+        for rep, pool in allowed:
+            lo, hi = Y_win[b][rep]
+            hit = pool_earliest(pool, max(lo, dep_lo) - k_wash, hi - k_wash, k_wash + trip_len, rng)
+            if hit is not None:
+                hits_y.append((hit[0] + k_wash, hit[2], hit[1]))
+        best_y = None
+        if hits_y:
+            ty, new, vy = min(hits_y)
+            if rng is not None:
+                ty, new, vy = rng.choice([h for h in hits_y if h[0] <= min(hits_y)[0] + rcl_min])
+            best_y = (vy, ty, new)
+        if best_y is None:
+            # Sin hueco en la ventana: el camión que se libera antes, recortado a su ventana
+            forced = True
+            hits = [(pool_earliest(pool, max(Y_win[b][rep][0], dep_lo) - k_wash, math.inf, k_wash + trip_len), rep)
+                    for rep, pool in allowed]
+            (s, v, new), rep = min(hits)
+            best_y = (v, min(Y_win[b][rep][1], s + k_wash), new)
+        vy, ty, _ = best_y
+
+        # C. Producción lo más tarde posible antes de la salida (misma unidad, sin invadir huecos)
+        lo, hi = X_win[b][ux]
+        late = latest_fit(unit_pool_of[ux]["gaps"][ux], tx, min(hi, align_down(ty - wash - wait - proc_by_ui[ux])), occ_x)
+        if late is not None and not forced:
+            tx = late
+
+        pool_reserve(unit_pool_of[ux], ux, tx, tx + occ_x)
+        pool_reserve(truck_pool_of[vy], vy, ty - k_wash, ty + trip_len)
+        site_last_unload[info["site_id"]] = max(site_last_unload.get(info["site_id"], -math.inf),
+                                                ty + travel + unload_time)
+        chosen_X[b] = (b, ux, tx)
+        chosen_Y[b] = (b, vy, ty)
+        if forced:
+            forced_batches.append(b)
+    return chosen_X, chosen_Y, forced_batches
+
+
+def key_windows(X_keys, Y_keys, fleet_classes=None):
+    """
+    Ventanas [primer t, último t] por lote y recurso: los dominios de cell7 son contiguos en la grilla.
+    Con clases de flota (Y por clase) la ventana se copia a cada camión concreto de la clase.
+    """
+    X_win = defaultdict(dict)
+    for (b, u, t) in X_keys:
+        lo, hi = X_win[b].get(u, (t, t))
+        X_win[b][u] = (min(lo, t), max(hi, t))
+
+    Y_win = defaultdict(dict)
+    for (b, v, t) in Y_keys:
+        for m in (fleet_classes[v]["members"] if fleet_classes else [v]):
+            lo, hi = Y_win[b].get(m, (t, t))
+            Y_win[b][m] = (min(lo, t), max(hi, t))
+    return X_win, Y_win
+
+
+def batch_table(batches_list):
+    """Sitio, viaje, distancia, fin de ventana y tiempo de fraguado de cada lote (de la instancia de cell5)."""
+    view = batch_view(batches_list)
+    return {
+        b_idx: {
+            "site_id": view["site_id"][b_idx],
+            "travel": float(view["travel"][b_idx]),
+            "dist": float(view["dist"][b_idx]),
+            "tw_end": int(view["tw_end"][b_idx]),
+            "setting_time": int(view["setting"][b_idx]),
+        }
+        for b_idx in range(len(batches_list))
+    }
+
+
+def plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks, params):
+    """Objetivo de cell7 (transporte, costo fijo, tardanza y slacks penalizados) de un plan completo."""
+    alpha, beta = params.get("alpha", 1.0), params.get("beta", 1.0)
+    unload = params.get("unload_time", 30)
+    setting = params.get("setting_time", 90)
+    max_tardiness = params.get("max_tardiness_allowed", 120)
+
+    transport = sum(2 * batch_info[b]["dist"] * float(trucks[v].get("var_cost_per_km", 0))
+                    for (b, v, _) in chosen_Y.values())
+    fixed = sum(float(trucks[v].get("fixed_cost", 0)) for v in {v for (_, v, _) in chosen_Y.values()})
+    tardiness, slacks = 0.0, 0.0
+    last_by_site = {}
+    for b in sorted(chosen_Y):
+        info = batch_info[b]
+        _, u, tx = chosen_X[b]
+        arrival_finish = chosen_Y[b][2] + info["travel"] + unload
+        tard = max(0.0, arrival_finish - info["tw_end"])
+        tardiness += tard
+        slacks += max(0.0, tard - max_tardiness)
+        slacks += max(0.0, arrival_finish - (tx + proc_by_ui[u]) - setting)
+        if info["site_id"] in last_by_site:
+            slacks += max(0.0, arrival_finish - unload - last_by_site[info["site_id"]] - MAX_LAG)
+        last_by_site[info["site_id"]] = arrival_finish
+    return alpha * (transport + fixed) + beta * tardiness + PENALTY * slacks
+
+
+def build_plan(n_batches, X_win, Y_win, proc_by_ui, batch_info, classes, params, rng=None, deadline=None,
+               fixed=None):
+    """
+    Orden por tw_end; si un lote queda con solape forzado, su sitio entero (en orden, por Eq. 13)
+    pasa adelante y se reconstruye, hasta heuristic_retries veces. Con rng el tw_end de cada sitio
+    se perturba hasta grasp_order_noise_min y las elecciones usan la lista restringida de construct.
+    Con deadline (time.time()) no se empiezan reintentos pasada esa hora. fixed: decisiones ya tomadas
+    (ver construct). Devuelve (chosen_X, chosen_Y, lotes forzados, pasadas).
+    """
+    noise = defaultdict(float)
+    if rng is not None:
+        for info in batch_info.values():
+            noise.setdefault(info["site_id"], rng.uniform(0, params.get("grasp_order_noise_min", 60)))
+    rcl_min = params.get("grasp_rcl_min", 20)
+    priority = defaultdict(int)
+    best = None
+    for attempt in range(1 + params.get("heuristic_retries", 20)):
+        order = sorted(range(n_batches), key=lambda b: (-priority[batch_info[b]["site_id"]],
+                                                         batch_info[b]["tw_end"] + noise[batch_info[b]["site_id"]]))
+        result = construct(order, X_win, Y_win, proc_by_ui, batch_info, classes, params, rng, rcl_min, fixed)
+        if best is None or len(result[2]) < len(best[2]):
+            best = result
+        if not result[2] or (deadline is not None and time.time() >= deadline):
+            break
+        for b in result[2]:
+            priority[batch_info[b]["site_id"]] += 1
+    return best + (attempt + 1,)
+
+
+def grasp_worker(seeds, deadline, context):
+    """Arranques GRASP de un proceso hasta agotar sus semillas o el tiempo. Devuelve el mejor y cuántos corrió."""
+    n_batches, X_win, Y_win, proc_by_ui, batch_info, classes, trucks, params = context
+    best, n_done = None, 0
+    for seed in seeds:
+        if time.time() >= deadline:
+            break
+        chosen_X, chosen_Y, forced, _ = build_plan(n_batches, X_win, Y_win, proc_by_ui, batch_info, classes,
+                                                   params, random.Random(seed), deadline)
+        score = (len(forced), plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks, params))
+        if best is None or score < best[0]:
+            best = (score, seed, chosen_X, chosen_Y, forced)
+        n_done += 1
+    return best, n_done
+
+
+def grasp(context, deterministic, params, deadline=None):
+    """
+    Multi-arranque aleatorizado en un pool de procesos (grasp_workers, grasp_time_sec).
+    deterministic = (score, chosen_X, chosen_Y, forced) de la construcción por tw_end.
+    deadline (time.time()) recorta grasp_time_sec si llega antes.
+    """
+    n_starts = params.get("grasp_starts", 0)
+    workers = max(1, min(params.get("grasp_workers", os.cpu_count() or 1), n_starts))
+    start = time.time()
+    deadline = min(start + params.get("grasp_time_sec", 30), deadline if deadline is not None else float("inf"))
+    seeds = [list(range(w, n_starts, workers)) for w in range(workers)]
+
+    if workers == 1:
+        results = [grasp_worker(seeds[0], deadline, context)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(grasp_worker, seeds, [deadline] * workers, [context] * workers))
+
+    n_done = sum(n for _, n in results)
+    best = min((r for r, _ in results if r is not None), default=None, key=lambda r: r[0])
+    print(f"GRASP: {n_done} arranques en {time.time() - start:.1f} s ({workers} procesos). "
+          f"Determinista: {deterministic[0][1]:.1f} ({deterministic[0][0]} forzados)"
+          + (f", mejor: {best[0][1]:.1f} ({best[0][0]} forzados, semilla {best[1]})." if best else "."))
+    data.shared['grasp_report'] = {"starts": n_done, "workers": workers, "deterministic": deterministic[0][1],
+                                   "best": best[0][1] if best else None, "seed": best[1] if best else None}
+    if best is not None and best[0] < deterministic[0]:
+        return best[2], best[3], best[4]
+    return deterministic[1:]
+
+
+def inject_start(chosen_X, chosen_Y, values):
+    """
+    Valores iniciales de todas las variables del modelo PuLP: X, Y, V_used, T_tard, slacks
+    (values de cell8_warmstart.start_values) e inventario de la red tiempo-espacio si existe.
+    """
+    prob = data.shared['prob']
+    fleet_classes = data.shared.get('fleet_classes')
+    class_of = class_of_truck(fleet_classes) if fleet_classes else {}
+
+    chosen_X_keys = set(chosen_X.values())
+    for key, var in data.shared['X'].items():
+        var.setInitialValue(1.0 if key in chosen_X_keys else 0.0)
+    if fleet_classes:
+        chosen_keys = {(b, class_of[v], t) for (b, v, t) in chosen_Y.values()}
+    else:
+        chosen_keys = set(chosen_Y.values())
+    for key, var in data.shared['Y'].items():
+        var.setInitialValue(1.0 if key in chosen_keys else 0.0)
+    for v, var in data.shared['V_used'].items():
+        var.setInitialValue(values["V_used"].get(v, 0.0))
+    for b, var in data.shared['T_tard'].items():
+        var.setInitialValue(values["T_tard"].get(b, 0.0))
+
+    # Slacks por nombre (mismos nombres que cell7)
+    slacks_map = {v.name: v for v in prob.variables() if v.name.startswith("Slack_")}
+    names = [(f"Slack_Setting_b{b}", val) for b, val in values["Slack_Setting"].items()]
+    names += [(f"Slack_MaxTard_b{b}", val) for b, val in values["Slack_MaxTard"].items()]
+    names += [(f"Slack_Lag_{site}_{i}", val) for (site, i), val in values["Slack_Lag"].items()]
+    for name, val in names:
+        if name in slacks_map:
+            slacks_map[name].setInitialValue(val)
+
+    flow_inventory = data.shared.get('flow_inventory')
+    if flow_inventory and len(chosen_Y) == len(data.shared['batches_list']):
+        # Red tiempo-espacio: camiones libres en planta por clase y slot según el plan heurístico
+        class_Y = {b: (b, class_of[v], t) for (b, v, t) in chosen_Y.values()}
+        n_used = {c: int(values["V_used"][c]) for c in range(len(fleet_classes))}
+        arcs = cell7_flow.trip_arcs(class_Y.values(), data.shared['batches_list'],
+                                    data.shared['params'])
+        idle = cell7_flow.inventory_profile(class_Y, n_used, arcs, data.shared['time_points'])
+        for key, var in flow_inventory.items():
+            var.setInitialValue(idle[key])
+
+
+def check_start(chosen_X, chosen_Y):
+    """
+    Valores del plan completo y filas del modelo que viola, por familia ({} si es factible).
+    Con PuLP los valores quedan inyectados en las variables; con el modelo matricial se evalúa A x
+    (None si el modelo matricial no tiene la matriz de filas).
+    """
+    values = cell8_warmstart.start_values(chosen_X, chosen_Y, data.shared['batches_list'], data.shared['trucks_list'],
+                                          data.shared['units_list'], data.shared['params'],
+                                          data.shared.get('fleet_classes'))
+    if data.shared.get('model_builder') != "matrix":
+        inject_start(chosen_X, chosen_Y, values)
+        return values, cell8_warmstart.pulp_row_violations(data.shared['prob'])
+
+    model = data.shared['matrix_model']
+    if "A" not in model or "row_index" not in model:
+        return values, None
+    ws = cell8_warmstart.matrix_start(model["col_index"], chosen_X, chosen_Y, values, data.shared.get('fleet_classes'))
+    x = np.zeros(model["A"].shape[1])
+    x[list(ws)] = list(ws.values())
+    return values, cell8_warmstart.matrix_row_violations(model["A"], model["row_lower"], model["row_upper"],
+                                                         model["row_index"], x)
+
 
 def run():
     print("\n=== CELDA 8 (Repair v4 - Cleaned): Inicio ===")
@@ -12,11 +451,6 @@ def run():
     try:
         X = data.shared['X']
         Y = data.shared['Y']
-        T_tard_vars = data.shared['T_tard']
-        V_used_vars = data.shared['V_used']
-        prob = data.shared['prob']
-        # Recuperamos solo las variables que realmente existen en el modelo
-        slacks_map = {v.name: v for v in prob.variables() if "Slack" in v.name}
     except Exception as e:
         print(f"Error recuperando variables: {e}")
         return
@@ -24,203 +458,79 @@ def run():
     units_list = data.shared['units_list']
     batches_list = data.shared['batches_list']
     trucks_list = data.shared['trucks_list']
-    site_map = data.shared['site_map']
     params = data.shared['params']
 
     print(f"Variables recuperadas: {len(batches_list)} lotes.")
 
     U = len(units_list)
-    V_count = len(trucks_list)
     B = len(batches_list)
     
     proc_by_ui = {ui: int(units_list[ui].get("process_time_min", 0)) for ui in range(U)}
-    wash = params.get("wash_time", 0)
-    wait = params.get("wait_before_departure", 0)
-    unload_time = params.get("unload_time", 20) 
-    max_tardiness = params.get("max_tardiness_allowed", 120) 
-    max_time_lag = 60 
-    T1 = params.get("T1", 420)
-    T2 = params.get("T2", 1020)
     
-    X_by_b = defaultdict(list)
-    for (b,u,t) in X.keys(): X_by_b[b].append((u,t))
-    for b in X_by_b: X_by_b[b].sort(key=lambda x: x[1])
-
-    Y_by_b = defaultdict(list)
-    for (b,v,t) in Y.keys(): Y_by_b[b].append((v,t))
-    for b in Y_by_b: Y_by_b[b].sort(key=lambda x: x[1])
-
-    batch_info = {}
-    for b_idx, b_data in enumerate(batches_list):
-        site_id = str(b_data["site_id"]).strip().lower()
-        site_data = site_map.get(site_id, {})
-        
-        # Parser HH:MM
-        raw_end = site_data.get("tw_end_h", T2/60)
-        tw_end = T2
-        s_val = str(raw_end).strip()
-        if ":" in s_val:
-            try:
-                hh, mm = s_val.split(":")
-                tw_end = int(hh) * 60 + int(mm)
-            except: pass
-        else:
-            try:
-                f_val = float(s_val)
-                tw_end = int(f_val * 60) if f_val <= 24.0 else int(f_val)
-            except: pass
-        
-        ctype = str(site_data.get("concrete_type", "p6")).strip().lower()
-        st_map = {"p1":108, "p2":108, "p3":114, "p4":114, "p5":114, "p6":90, "p7":108, "p8":126}
-        
-        batch_info[b_idx] = {
-            "site_id": site_id,
-            "travel": float(site_data.get("travel_time_min", 0)),
-            "tw_end": tw_end,
-            "setting_time": st_map.get(ctype, 90)
-        }
-
-    batches_order = sorted(list(range(B)), key=lambda b: batch_info[b]["tw_end"])
+    # Modo agregado (cell7_fleet): Y es (b, clase, t) -> candidatos por camión concreto de la clase
+    fleet_classes = data.shared.get('fleet_classes')
 
-    unit_next_free = {ui: T1 for ui in range(U)}
-    site_last_unload = defaultdict(int) 
-    truck_busy_until = {v: T1 for v in range(V_count)} 
-    
-    chosen_X = {}
-    chosen_Y = {}
+    X_win, Y_win = key_windows(X.keys(), Y.keys(), fleet_classes)
+    batch_info = batch_table(batches_list)
 
     print("Construyendo solución factible (Heurística)...")
+    t_place = time.time()
+    classes = truck_classes(trucks_list)
+    chosen_X, chosen_Y, forced_batches, passes = build_plan(B, X_win, Y_win, proc_by_ui, batch_info, classes, params)
+    print(f"Heurística completada. Lotes asignados: {len(chosen_X)}/{B} "
+          f"(colocación en {time.time() - t_place:.3f} s, {passes} pasadas, "
+          f"{len(forced_batches)} con solape forzado)")
 
-    for b in batches_order:
-        # A. Producción
-        best_x = None
-        candidates_x = X_by_b.get(b, [])
-        if not candidates_x: continue 
-
-        for (ui, t) in candidates_x:
-            if t >= unit_next_free[ui]:
-                best_x = (b, ui, t)
-                break
-        if not best_x: 
-             (panic_u, panic_t) = candidates_x[-1]
-             best_x = (b, panic_u, panic_t)
-        
-        (bx, ux, tx) = best_x
-        prod_finish = tx + proc_by_ui[ux]
-        
-        # B. Transporte
-        info = batch_info[b]
-        travel = info["travel"]
-        prev_finish = site_last_unload[info["site_id"]]
-        
-        # Restricciones lógicas para la heurística:
-        min_dep_seq = prev_finish - travel 
-        min_dep_prod = prod_finish + wash + wait
-        min_dep = max(min_dep_prod, min_dep_seq)
-        
-        candidates_y = Y_by_b.get(b, [])
-        best_y = None
-        
-        for (v, t) in candidates_y:
-            if t >= min_dep:
-                if t - wash >= truck_busy_until[v]:
-                    best_y = (b, v, t)
-                    break
-        
-        # Fallback si no encontramos hueco perfecto
-        if not best_y and candidates_y:
-            for (v, t) in candidates_y:
-                if t >= min_dep_prod: 
-                      best_y = (b, v, t)
-                      break
-        if not best_y and candidates_y:
-             (panic_v, panic_t) = candidates_y[-1]
-             best_y = (b, panic_v, panic_t)
-
-        if best_y:
-            chosen_X[b] = best_x
-            chosen_Y[b] = best_y
-            
-            unit_next_free[ux] = max(unit_next_free[ux], prod_finish)
-            (_, vy, ty) = best_y
-            trip_end = ty + travel + unload_time + travel
-            truck_busy_until[vy] = max(truck_busy_until[vy], trip_end)
-            this_unload_finish = ty + travel + unload_time
-            site_last_unload[info["site_id"]] = max(site_last_unload[info["site_id"]], this_unload_finish)
-
-    print(f"Heurística completada. Lotes asignados: {len(chosen_X)}/{B}")
-
-    # 4. Inyectar Solución
-    print("Inyectando Warm Start (Solo variables activas)...")
-
-    for (b, u, t), var in X.items():
-        var.setInitialValue(1.0 if chosen_X.get(b) == (b, u, t) else 0.0)
-        
-    used_trucks_indices = set()
-    for (b, v, t), var in Y.items():
-        val = 1.0 if chosen_Y.get(b) == (b, v, t) else 0.0
-        var.setInitialValue(val)
-        if val > 0.5: used_trucks_indices.add(v)
-
-    for v, var in V_used_vars.items():
-        var.setInitialValue(1.0 if v in used_trucks_indices else 0.0)
-
-    # Calculamos Slacks solo para lo que sigue siendo Soft
-    batches_by_site = defaultdict(list)
-    for b in range(B):
-        if b in chosen_Y:
-            site_id = batch_info[b]["site_id"]
-            batches_by_site[site_id].append(b)
-    
-    for b in range(B):
-        if b not in chosen_Y: continue
-        
-        (_, _, ty) = chosen_Y[b]
-        (_, _, tx) = chosen_X[b]
-        info = batch_info[b]
-        
-        arrival = ty + info["travel"]
-        arrival_finish = arrival + unload_time
-        (_, ux, _) = chosen_X[b]
-        prod_finish = tx + proc_by_ui[ux]
-
-        tard = max(0, arrival - info["tw_end"])
-        if b in T_tard_vars: T_tard_vars[b].setInitialValue(tard)
-        
-        # Slack Max Tardiness (Soft)
-        violation_tard = tard - max_tardiness
-        slack_tard = max(0, violation_tard + 10)
-        s_name_tard = f"Slack_MaxTard_b{b}"
-        if s_name_tard in slacks_map: slacks_map[s_name_tard].setInitialValue(slack_tard)
-
-        # Slack Setting Time (Soft)
-        violation = (arrival_finish - prod_finish) - info["setting_time"]
-        slack_val = max(0, violation + 10) 
-        s_name = f"Slack_Setting_b{b}"
-        if s_name in slacks_map: slacks_map[s_name].setInitialValue(slack_val)
-        
-        # Slack Sync: ELIMINADO (Ahora es Hard Constraint)
-        # Si la heurística violó esto, HiGHS descartará el warm start, pero no crashea.
-
-    # Slacks Secuencia
-    for site, b_list in batches_by_site.items():
-        b_list.sort()
-        for i in range(len(b_list) - 1):
-            b_curr = b_list[i]
-            b_next = b_list[i+1]
-            
-            (_, _, ty_c) = chosen_Y[b_curr]
-            finish_curr = ty_c + batch_info[b_curr]["travel"] + unload_time
-            (_, _, ty_n) = chosen_Y[b_next]
-            start_next = ty_n + batch_info[b_next]["travel"]
-            
-            # Slack Seq: ELIMINADO (Ahora es Hard Constraint)
-            
-            # Slack Lag (Juntas frías) - Sigue siendo Soft
-            gap = start_next - finish_curr
-            violation_lag = gap - max_time_lag
-            s_lag = max(0, violation_lag + 10)
-            s_name_lag = f"Slack_Lag_{site}_{i}"
-            if s_name_lag in slacks_map: slacks_map[s_name_lag].setInitialValue(s_lag)
-
-    print("=== CELDA 8: Fin (Solución limpia inyectada) ===\n")
\ No newline at end of file
+    if params.get("grasp_starts", 0) > 0 and len(chosen_X) == B:
+        # Multi-arranque: variantes aleatorizadas en paralelo, gana la de menor objetivo de cell7
+        score = (len(forced_batches), plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks_list, params))
+        context = (B, X_win, Y_win, proc_by_ui, batch_info, classes, trucks_list, params)
+        chosen_X, chosen_Y, forced_batches = grasp(context, (score, chosen_X, chosen_Y, forced_batches), params)
+
+    if params.get("solution_store", False) and len(chosen_X) == B and len(chosen_Y) == B:
+        # Plan guardado más parecido (días anteriores / re-planes): mapeado, reparado y usado si mejora
+        chosen_X, chosen_Y, forced_batches = cell8_store.offer(chosen_X, chosen_Y, forced_batches, X_win, Y_win,
+                                                               proc_by_ui, batch_info, params)
+
+    # 4. Verificación contra las filas duras del modelo y reparación en la grilla delta
+    if len(chosen_X) == B and len(chosen_Y) == B:
+        values, before = check_start(chosen_X, chosen_Y)
+        after, moved, stuck = before, [], []
+        if before and params.get("warm_start_repair", True):
+            rep_X, rep_Y, moved, stuck = cell8_warmstart.repair_plan(chosen_X, chosen_Y, X_win, Y_win, proc_by_ui,
+                                                                     batch_info, params)
+            if params.get("strengthen_formulation", False) and not fleet_classes:
+                rep_Y = cell8_warmstart.order_identical_trucks(rep_Y, trucks_list)
+            rep_values, rep_after = check_start(rep_X, rep_Y)
+            if rep_after is not None and sum(rep_after.values()) <= sum(before.values()):
+                chosen_X, chosen_Y, values, after = rep_X, rep_Y, rep_values, rep_after
+            else:
+                values, after = check_start(chosen_X, chosen_Y)   # se restauran los valores del plan original
+                moved, stuck = [], stuck
+        report = {"rows_checked": before is not None, "violations_before": before, "moved": moved,
+                  "unrepaired": stuck, "violations_after": after, "feasible": after == {} if after is not None else None,
+                  "accepted": None, "objective": None, "checked_feasible": None}
+        data.shared['warm_start_report'] = report
+        if before is None:
+            print("Warm start: modelo sin matriz de filas; se pasa sin verificar.")
+        else:
+            print(f"Warm start: filas violadas {before or 'ninguna'}"
+                  + (f" -> reparación ({len(moved)} lotes movidos, {len(stuck)} sin reparar): {after or 'ninguna'}"
+                     if before else "")
+                  + (". Factible en todas las filas del modelo." if not after else ". NO es factible."))
+    else:
+        data.shared['warm_start_report'] = None
+
+    data.shared['warm_X'] = chosen_X
+    data.shared['warm_Y'] = chosen_Y
+
+    if data.shared.get('model_builder') == "matrix":
+        # Sin objetos PuLP: cell7_matrix.solve() pasa warm_X / warm_Y a highspy
+        print("Modelo matricial: warm start guardado en data.shared (warm_X, warm_Y).")
+        print("=== CELDA 8: Fin ===\n")
+        return
+
+    if len(chosen_X) < B or len(chosen_Y) < B:
+        inject_start(chosen_X, chosen_Y, cell8_warmstart.start_values(
+            chosen_X, chosen_Y, batches_list, trucks_list, units_list, params, fleet_classes))
+    print("=== CELDA 8: Fin (Solución inyectada en todas las variables) ===\n")
@@ -0,0 +1,167 @@
+# cell8_store.py -- Almacén local de planes resueltos: el más parecido a la instancia nueva se ofrece como warm start
+import data
+import os
+import json
+import time
+import hashlib
+
+import cell8
+import cell8_warmstart
+
+
+def store_dir(params):
+    path = params.get("solution_store_dir", "solution_store")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def fingerprint(params):
+    """Huella de la instancia de cell5: demanda por sitio, camiones, unidades y horizonte."""
+    instance = data.shared['instance']
+    return {
+        "sites": {s: float(d) for s, d in zip(instance["site_ids"], instance["demand"])},
+        "trucks": list(instance["truck_ids"]),
+        "units": list(instance["unit_ids"]),
+        "horizon": [params["T1"], params["T2"], params.get("delta_min", 10)],
+    }
+
+
+def similarity(a, b):
+    """Jaccard ponderado por demanda sobre los sitios, desempatado por la fracción de camiones compartidos."""
+    sites = set(a["sites"]) | set(b["sites"])
+    common = sum(min(a["sites"].get(s, 0.0), b["sites"].get(s, 0.0)) for s in sites)
+    total = sum(max(a["sites"].get(s, 0.0), b["sites"].get(s, 0.0)) for s in sites)
+    trucks = set(a["trucks"]) | set(b["trucks"])
+    return (common / total if total else 0.0,
+            len(set(a["trucks"]) & set(b["trucks"])) / len(trucks) if trucks else 0.0)
+
+
+def save(params=None):
+    """
+    Guarda el plan final de data.shared (chosen_X / chosen_Y) con IDs estables (lote, sitio, unidad,
+    camión y minutos), su objetivo de cell7 y la huella de la instancia. Solo planes completos.
+    Conserva las solution_store_max entradas más recientes.
+    """
+    params = params or data.shared['params']
+    chosen_X, chosen_Y = data.shared.get('chosen_X', {}), data.shared.get('chosen_Y', {})
+    batches, units, trucks = data.shared['batches_list'], data.shared['units_list'], data.shared['trucks_list']
+    if len(chosen_X) < len(batches) or len(chosen_Y) < len(batches):
+        print(f"Almacén de soluciones: plan incompleto ({len(chosen_Y)}/{len(batches)} lotes); no se guarda.")
+        return None
+
+    proc_by_ui = {u: int(unit.get("process_time_min", 0)) for u, unit in enumerate(units)}
+    objective = cell8.plan_cost(chosen_X, chosen_Y, proc_by_ui, cell8.batch_table(batches), trucks, params)
+    plan = []
+    for b, batch in enumerate(batches):
+        _, u, tx = chosen_X[b]
+        _, v, ty = chosen_Y[b]
+        plan.append({"batch_id": str(batch.get("batch_id", "")), "site_id": str(batch["site_id"]).strip().lower(),
+                     "unit_id": str(units[u]["unit_id"]).strip(), "tx": int(tx),
+                     "truck_id": str(trucks[v]["truck_id"]).strip(), "ty": int(ty)})
+    fp = fingerprint(params)
+    key = hashlib.sha256(json.dumps(fp, sort_keys=True).encode("utf-8")).hexdigest()
+    entry = {"key": key, "saved": time.time(), "objective": objective, "fingerprint": fp, "plan": plan}
+
+    directory = store_dir(params)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d_%H%M%S')}_{key[:12]}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(entry, f)
+    os.replace(path + ".tmp", path)
+
+    entries = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in entries[:max(0, len(entries) - params.get("solution_store_max", 200))]:
+        os.remove(os.path.join(directory, name))
+    print(f"Almacén de soluciones: plan guardado ({len(plan)} lotes, objetivo {objective:.1f}) en {path}")
+    return path
+
+
+def nearest(params):
+    """Entrada guardada más parecida a la instancia actual (la más reciente ante empates), o None."""
+    directory = store_dir(params)
+    fp = fingerprint(params)
+    best = None
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            entry = json.load(f)
+        score = (*similarity(fp, entry["fingerprint"]), entry["saved"])
+        if score[0] > 0 and (best is None or score > best[0]):
+            best = (score, entry)
+    return best
+
+
+def snap(t, lo, hi, delta):
+    """Minuto t llevado al punto de la grilla de [lo, hi] más cercano."""
+    return min(hi, max(lo, lo + round((t - lo) / delta) * delta))
+
+
+def map_plan(entry, fallback_X, fallback_Y, X_win, Y_win, params):
+    """
+    Plan guardado -> claves (b, u, t) / (b, v, t) de la instancia actual. Los lotes se emparejan por
+    batch_id (o por sitio y posición dentro del sitio), unidades y camiones por ID; los tiempos se
+    llevan a la ventana de cada lote. Unidades o camiones que ya no existen pasan al de ventana más
+    cercana; los lotes sin pareja toman el plan de la heurística. Devuelve (chosen_X, chosen_Y, mapeados).
+    """
+    delta = params.get("delta_min", 10)
+    batches, units, trucks = data.shared['batches_list'], data.shared['units_list'], data.shared['trucks_list']
+    unit_of = {str(unit["unit_id"]).strip(): u for u, unit in enumerate(units)}
+    truck_of = {str(truck["truck_id"]).strip(): v for v, truck in enumerate(trucks)}
+    by_id = {rec["batch_id"]: rec for rec in entry["plan"] if rec["batch_id"]}
+    by_pos, count = {}, {}
+    for rec in entry["plan"]:
+        k = count[rec["site_id"]] = count.get(rec["site_id"], 0) + 1
+        by_pos[(rec["site_id"], k)] = rec
+
+    def pick(windows, preferred, t):
+        if preferred in windows:
+            return preferred
+        return min(windows, key=lambda r: (0 if windows[r][0] <= t <= windows[r][1]
+                                           else min(abs(t - windows[r][0]), abs(t - windows[r][1])), r))
+
+    chosen_X, chosen_Y = dict(fallback_X), dict(fallback_Y)
+    mapped, count = 0, {}
+    for b, batch in enumerate(batches):
+        site = str(batch["site_id"]).strip().lower()
+        k = count[site] = count.get(site, 0) + 1
+        rec = by_id.get(str(batch.get("batch_id", ""))) or by_pos.get((site, k))
+        if rec is None or rec["site_id"] != site or not X_win.get(b) or not Y_win.get(b):
+            continue
+        u = pick(X_win[b], unit_of.get(rec["unit_id"]), rec["tx"])
+        v = pick(Y_win[b], truck_of.get(rec["truck_id"]), rec["ty"])
+        chosen_X[b] = (b, u, snap(rec["tx"], *X_win[b][u], delta))
+        chosen_Y[b] = (b, v, snap(rec["ty"], *Y_win[b][v], delta))
+        mapped += 1
+    return chosen_X, chosen_Y, mapped
+
+
+def offer(chosen_X, chosen_Y, forced, X_win, Y_win, proc_by_ui, batch_info, params):
+    """
+    Plan guardado más parecido, mapeado a la instancia y reparado en la grilla (repair_plan de
+    cell8_warmstart). Reemplaza al plan de la heurística si tiene menos lotes sin reparar o, a igual
+    cantidad, menor objetivo de cell7. Devuelve (chosen_X, chosen_Y, lotes con solape forzado).
+    """
+    found = nearest(params)
+    if found is None:
+        print("Almacén de soluciones: sin planes guardados para estos sitios.")
+        return chosen_X, chosen_Y, forced
+    (site_sim, truck_sim, _), entry = found
+    map_X, map_Y, mapped = map_plan(entry, chosen_X, chosen_Y, X_win, Y_win, params)
+    rep_X, rep_Y, moved, stuck = cell8_warmstart.repair_plan(map_X, map_Y, X_win, Y_win, proc_by_ui, batch_info, params)
+
+    trucks = data.shared['trucks_list']
+    heuristic = (len(forced), cell8.plan_cost(chosen_X, chosen_Y, proc_by_ui, batch_info, trucks, params))
+    stored = (len(stuck), cell8.plan_cost(rep_X, rep_Y, proc_by_ui, batch_info, trucks, params))
+    use = stored < heuristic
+    data.shared['store_report'] = {"similarity": site_sim, "truck_similarity": truck_sim, "mapped": mapped,
+                                   "moved": len(moved), "unrepaired": len(stuck), "stored_objective": entry["objective"],
+                                   "heuristic_cost": heuristic[1], "store_cost": stored[1], "used": use}
+    print(f"Almacén de soluciones: plan del {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['saved']))} "
+          f"(sitios {site_sim:.0%}, camiones {truck_sim:.0%}), {mapped}/{len(batch_info)} lotes mapeados, "
+          f"{len(moved)} movidos al reparar, {len(stuck)} sin reparar: costo {stored[1]:.1f} "
+          f"frente a {heuristic[1]:.1f} de la heurística -> {'se usa el guardado' if use else 'se usa la heurística'}.")
+    if use:
+        return rep_X, rep_Y, stuck
+    return chosen_X, chosen_Y, forced
@@ -0,0 +1,259 @@
+# cell8_warmstart.py -- Warm start verificado contra las filas duras del modelo (reparación en la grilla delta)
+import re
+import math
+import heapq
+from collections import Counter, defaultdict
+
+from cell5 import batch_view
+from cell7 import unit_slots, truck_slots, MAX_LAG
+from cell7_fleet import truck_classes, class_of_truck
+
+# Línea del log de HiGHS cuando la solución inicial entra como incumbente
+HIGHS_START_OK = re.compile(r"MIP start solution is feasible, objective value is (\S+)")
+# Chequeo que HiGHS hace de una solución inicial completa antes del presolve
+HIGHS_START_CHECK = re.compile(r"Assessing feasibility of MIP.*?Col\s+infeasibilities\s+(\d+).*?"
+                               r"Integer infeasibilities\s+(\d+).*?Row\s+infeasibilities\s+(\d+)", re.S)
+# Línea del log de HiGHS cuando recibió valores iniciales (completos o parciales)
+HIGHS_START_SEEN = ("user-supplied values", "MIP start solution")
+
+
+def start_values(chosen_X, chosen_Y, batches, trucks, units, params, fleet_classes=None):
+    """
+    Valores exactos de las columnas continuas y de V_used para un plan (mismas definiciones que cell7):
+    T_tard, Slack_MaxTard, Slack_Setting por lote, Slack_Lag por par (sitio, i) y V_used por camión
+    (o N_used por clase en el modelo agregado). Devuelve {familia: {clave: valor}}.
+    """
+    unload = params.get("unload_time", 30)
+    setting = params.get("setting_time", 90)
+    max_tardiness = params.get("max_tardiness_allowed", 120)
+
+    values = {"T_tard": {}, "Slack_MaxTard": {}, "Slack_Setting": {}, "Slack_Lag": {}, "V_used": {}}
+    arrival_finish = {}
+    view = batch_view(batches)
+    batches_by_site = defaultdict(list)
+    for b, site_id in enumerate(view["site_id"]):
+        batches_by_site[site_id].append(b)
+        if b not in chosen_Y or b not in chosen_X:
+            continue
+        _, u, tx = chosen_X[b]
+        arrival_finish[b] = chosen_Y[b][2] + float(view["travel"][b]) + unload
+        tard = max(0.0, arrival_finish[b] - float(view["tw_end"][b]))
+        values["T_tard"][b] = tard
+        values["Slack_MaxTard"][b] = max(0.0, tard - max_tardiness)
+        finish = tx + float(units[u].get("process_time_min", 0))
+        values["Slack_Setting"][b] = max(0.0, arrival_finish[b] - finish - setting)
+
+    for site, b_list in batches_by_site.items():
+        for i in range(len(b_list) - 1):
+            if b_list[i] in arrival_finish and b_list[i + 1] in arrival_finish:
+                gap = arrival_finish[b_list[i + 1]] - unload - arrival_finish[b_list[i]]
+                values["Slack_Lag"][(site, i)] = max(0.0, gap - MAX_LAG)
+
+    used = {v for (_, v, _) in chosen_Y.values()}
+    if fleet_classes:
+        values["V_used"] = {c: float(sum(1 for m in cls["members"] if m in used)) for c, cls in enumerate(fleet_classes)}
+    else:
+        values["V_used"] = {v: (1.0 if v in used else 0.0) for v in range(len(trucks))}
+    return values
+
+
+def repair_plan(chosen_X, chosen_Y, X_win, Y_win, proc_by_ui, batch_info, params, fixed=None):
+    """
+    Re-temporiza el plan sobre la grilla delta contra las filas duras de cell7 con X/Y:
+    Cap_Unit y Cap_Truck por slots (unit_slots / truck_slots, lavado incluido), Eq7_Sync y Eq13_Seq.
+    Los lotes se recorren por salida, respetando el orden de cada sitio; cada uno conserva su
+    producción y su salida si están libres. Si no, la producción pasa al slot libre más cercano
+    (misma unidad primero) y la salida se corre hacia adelante en la grilla, primero con su camión y
+    después con los ya usados. fixed = {b: ((b,u,t), (b,v,t))} son decisiones ya tomadas (lotes
+    congelados del horizonte rodante): ocupan sus slots y marcan la secuencia de su sitio sin moverse.
+    Devuelve (chosen_X, chosen_Y, lotes movidos, lotes sin reparar).
+    """
+    T1, T2 = params["T1"], params["T2"]
+    delta = params.get("delta_min", 10)
+    wash = params.get("wash_time", 10)
+    wait = params.get("wait_before_departure", 0)
+    unload = params.get("unload_time", 30)
+
+    def align_up(x):
+        return T1 + int(math.ceil((x - T1) / delta)) * delta
+
+    by_site = defaultdict(list)
+    for b in sorted(chosen_Y):
+        by_site[batch_info[b]["site_id"]].append(b)
+    heap = [(chosen_Y[q[0]][2], q[0], site) for site, q in by_site.items()]
+    heapq.heapify(heap)
+    next_pos = {site: 1 for site in by_site}
+
+    unit_busy, truck_busy = defaultdict(set), defaultdict(set)
+    used_trucks = set()
+    last_dep = {}
+    for b, ((_, u, tx), (_, v, ty)) in (fixed or {}).items():
+        unit_busy[u].update(unit_slots(tx, proc_by_ui[u], delta, T2))
+        truck_busy[v].update(truck_slots(ty, batch_info[b]["travel"], unload, wash, delta, T1, T2))
+        used_trucks.add(v)
+        last_dep[batch_info[b]["site_id"]] = max(last_dep.get(batch_info[b]["site_id"], -math.inf), ty)
+    new_X, new_Y = dict(chosen_X), dict(chosen_Y)
+    moved, stuck = [], []
+    while heap:
+        _, b, site = heapq.heappop(heap)
+        if next_pos[site] < len(by_site[site]):
+            nxt = by_site[site][next_pos[site]]
+            heapq.heappush(heap, (chosen_Y[nxt][2], nxt, site))
+            next_pos[site] += 1
+        info = batch_info[b]
+
+        # 1. Producción: la original si sus slots están libres, si no el slot libre más cercano
+        _, u0, tx0 = chosen_X[b]
+        prod = None
+        if not unit_busy[u0].intersection(unit_slots(tx0, proc_by_ui[u0], delta, T2)):
+            prod = (u0, tx0)
+        else:
+            candidates = sorted((u != u0, abs(t - tx0), t > tx0, u, t)
+                                for u, (lo, hi) in X_win[b].items() for t in range(lo, hi + 1, delta))
+            for *_, u, t in candidates:
+                if not unit_busy[u].intersection(unit_slots(t, proc_by_ui[u], delta, T2)):
+                    prod = (u, t)
+                    break
+        if prod is None:
+            prod = (u0, tx0)
+            stuck.append(b)
+        u, tx = prod
+        unit_busy[u].update(unit_slots(tx, proc_by_ui[u], delta, T2))
+
+        # 2. Salida: desde max(original, Eq7, Eq13) hacia adelante, primero el camión original
+        _, v0, ty0 = chosen_Y[b]
+        dep_min = max(tx + proc_by_ui[u] + wash + wait, last_dep.get(site, -math.inf) + unload)
+        trucks_b = sorted(Y_win[b], key=lambda v: (v != v0, v not in used_trucks, v))
+        hi_all = max((hi for (_, hi) in Y_win[b].values()), default=ty0)
+        trip = None
+        t = align_up(max(ty0, dep_min))
+        while trip is None and t <= hi_all:
+            for v in trucks_b:
+                lo, hi = Y_win[b][v]
+                slots = truck_slots(t, info["travel"], unload, wash, delta, T1, T2)
+                if lo <= t <= hi and not truck_busy[v].intersection(slots):
+                    trip = (v, t)
+                    break
+            t += delta
+        if trip is None:
+            trip = (v0, ty0)
+            if b not in stuck:
+                stuck.append(b)
+        v, ty = trip
+        truck_busy[v].update(truck_slots(ty, info["travel"], unload, wash, delta, T1, T2))
+        used_trucks.add(v)
+        last_dep[site] = ty
+
+        if (u, tx) != (u0, tx0) or (v, ty) != (v0, ty0):
+            moved.append(b)
+        new_X[b], new_Y[b] = (b, u, tx), (b, v, ty)
+    return new_X, new_Y, moved, stuck
+
+
+def matrix_start(col_index, chosen_X, chosen_Y, values, fleet_classes=None):
+    """
+    Columna -> valor del warm start en el modelo matricial. X/Y solo de los lotes del plan (si faltan
+    lotes es una solución parcial que HiGHS completa); con el plan completo también las familias de
+    values presentes en col_index.
+    """
+    if fleet_classes:
+        # Modelo agregado: Y y V_used son por clase de camión
+        class_of = class_of_truck(fleet_classes)
+        chosen = {"X": set(chosen_X.values()), "Y": {(b, class_of[v], t) for (b, v, t) in chosen_Y.values()}}
+    else:
+        chosen = {"X": set(chosen_X.values()), "Y": set(chosen_Y.values())}
+    # Claves por familia: X (b, u, t) e Y (b, v, t) pueden coincidir como tuplas
+    ws = {j: (1.0 if key in chosen[fam] else 0.0) for fam in ("X", "Y") for key, j in col_index[fam].items()
+          if key[0] in chosen_Y}
+    if len(chosen_Y) == len(col_index["T_tard"]):
+        for fam, vals in values.items():
+            for key, val in vals.items():
+                if key in col_index.get(fam, {}):
+                    ws[col_index[fam][key]] = val
+    return ws
+
+
+def order_identical_trucks(chosen_Y, trucks):
+    """
+    Renombra camiones idénticos para que los de menor índice tengan más viajes (filas Sym_Used /
+    Sym_Trips de la formulación reforzada). Intercambiar jornadas completas no cambia costos ni ocupación.
+    """
+    trips = Counter(v for (_, v, _) in chosen_Y.values())
+    rename = {}
+    for cls in truck_classes(trucks):
+        ranked = sorted(cls["members"], key=lambda m: (-trips[m], m))
+        rename.update(zip(ranked, cls["members"]))
+    return {b: (b, rename.get(v, v), t) for b, (_, v, t) in chosen_Y.items()}
+
+
+def row_family(name):
+    """Familia de una fila por su nombre (Eq7_Sync_b3 -> Eq7_Sync, Cap_Unit_(0,_430) -> Cap_Unit)."""
+    match = re.match(r"[A-Za-z0-9]+_[A-Za-z]+", name)
+    return match.group(0) if match else name
+
+
+def pulp_row_violations(prob, eps=1e-6):
+    """Filas del modelo PuLP violadas por los valores iniciales de las variables, contadas por familia."""
+    violated = Counter()
+    for name, constraint in prob.constraints.items():
+        if constraint.value() is None or not constraint.valid(eps):
+            violated[row_family(name)] += 1
+    return dict(violated)
+
+
+def matrix_row_violations(A, row_lower, row_upper, row_index, x, eps=1e-6):
+    """Mismo chequeo sobre el modelo matricial: actividad A x contra las cotas de cada fila."""
+    activity = A @ x
+    bad = set(((activity < row_lower - eps) | (activity > row_upper + eps)).nonzero()[0].tolist())
+    violated = Counter()
+    for fam, rows in row_index.items():
+        n = sum(1 for r in rows.values() if r in bad)
+        if n:
+            violated[fam] = n
+    return dict(violated)
+
+
+def log_offset(log_path):
+    """Tamaño actual del log (HiGHS agrega al final): el reporte lee solo lo escrito por el próximo solve."""
+    try:
+        with open(log_path, "rb") as f:
+            return f.seek(0, 2)
+    except OSError:
+        return 0
+
+
+def solver_acceptance(log_path, offset=0):
+    """
+    Lee el log de HiGHS desde offset. accepted es True si la solución inicial entró como incumbente,
+    False si HiGHS recibió valores iniciales y los descartó, y None si no hubo warm start (o no hay log).
+    checked_feasible es el resultado del chequeo previo de HiGHS para una solución completa (None si no lo hizo).
+    """
+    try:
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            text = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return {"accepted": None, "objective": None, "checked_feasible": None}
+    check = HIGHS_START_CHECK.search(text)
+    checked = None if check is None else all(int(n) == 0 for n in check.groups())
+    match = HIGHS_START_OK.search(text)
+    if match:
+        return {"accepted": True, "objective": float(match.group(1)), "checked_feasible": checked}
+    if checked is False or any(marker in text for marker in HIGHS_START_SEEN):
+        return {"accepted": False, "objective": None, "checked_feasible": checked}
+    return {"accepted": None, "objective": None, "checked_feasible": checked}
+
+
+def report_acceptance(report, log_path, offset):
+    """Completa el reporte de data.shared['warm_start_report'] con lo que dice el log del solve."""
+    if report is None:
+        return
+    report.update(solver_acceptance(log_path, offset))
+    if report["accepted"]:
+        print(f"Warm start aceptado por HiGHS como incumbente inicial (objetivo {report['objective']:.1f}).")
+    elif report["accepted"] is False:
+        print("ADVERTENCIA: HiGHS descartó el warm start (ver el log del solver).")
+    elif report["checked_feasible"]:
+        print("Warm start: HiGHS lo verificó factible, pero el solve terminó antes de cargarlo como incumbente.")
+    else:
+        print("Warm start: el log de HiGHS no informa la solución inicial.")
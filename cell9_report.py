@@ -17,8 +17,9 @@ def run():
         print("No hay solución cargada en memoria.")
         return
 
-    # Verificar estado del solver
-    print(f"Estado del Solver: {pulp.LpStatus[prob.status]}")
+    # Verificar estado del solver (un corte por time limit no se informa como "Optimal")
+    from cell11 import solve_status
+    print(f"Estado del Solver: {solve_status(prob)}")
     print(f"Función Objetivo Final: {pulp.value(prob.objective):,.2f}")
 
     # 1. Análisis de Slacks (¿Por qué cuesta 20 Millones?)
@@ -1,20 +1,68 @@
+import data
 import cell2
 import cell5
 import cell6
 import cell7
+import cell7_cache
+import cell7_continuous
+import cell7_matrix
 import cell8
+import cell8_store
 import cell9
 import cell10_checker
 import cell11
+import cell11_colgen
+import cell11_heuristic
+import cell11_lns
+import cell11_multires
+import cell11_rolling
 import cell12_gantt
 
 if __name__ == "__main__":
     cell2.run()
     cell5.run()
     cell6.run()
-    cell7.run()
-    cell8.run()
-    cell9.run()
-    cell11.run()
+    params = data.shared['params']
+    if params.get("solve_mode", "monolithic") == "rolling_horizon":
+        # Sub-MILPs por ventana de tiempo; construye y resuelve por su cuenta
+        cell11_rolling.run()
+    elif params.get("solve_mode", "monolithic") == "multi_resolution":
+        # Grilla gruesa -> vecindario en la grilla fina con warm start
+        cell11_multires.run()
+    elif params.get("solve_mode", "monolithic") == "column_generation":
+        # Maestro de jornadas de camión sobre el modelo matricial; cell8 aporta las jornadas iniciales
+        cell7_matrix.run()
+        cell8.run()
+        cell11_colgen.run()
+    elif params.get("solve_mode", "monolithic") == "heuristic":
+        # Solo construcción de cell8 (+ GRASP opcional) dentro de heuristic_budget_sec; sin modelo ni MILP
+        cell11_heuristic.run()
+    elif params.get("solve_mode", "monolithic") == "lns":
+        # Fix-and-optimize sobre el modelo matricial partiendo del warm start de cell8
+        cell7_matrix.run()
+        cell8.run()
+        cell11_lns.run()
+    elif params.get("model_builder", "pulp") == "continuous":
+        # Formulación de tiempo continuo: sin grilla; el warm start es el plan de cell8 sobre los dominios de la grilla
+        cell7_continuous.run()
+        cell7_continuous.solve(params.get("continuous_time_sec", 7200))
+    else:
+        if params.get("model_cache", False):
+            # Recarga el modelo si las entradas no cambiaron (lo deja listo para highspy)
+            cell7_cache.run()
+        elif params.get("model_builder", "pulp") == "matrix":
+            # Modelo NumPy/SciPy pasado directamente a highspy (sin PuLP)
+            cell7_matrix.run()
+        else:
+            cell7.run()
+        cell8.run()
+        if data.shared['model_builder'] == "matrix":
+            cell7_matrix.solve()
+        else:
+            cell9.run()
+            cell11.run()
     cell10_checker.run()
+    if params.get("solution_store", False):
+        # Plan final al almacén: warm start de los próximos días y re-planes (cell8_store)
+        cell8_store.save()
     cell12_gantt.run()
\ No newline at end of file
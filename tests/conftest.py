@@ -0,0 +1,34 @@
+# conftest.py -- Ruta del repositorio e instancia mínima en data.shared para los tests
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data
+
+
+@pytest.fixture
+def instance(monkeypatch):
+    """
+    Instancia mínima con los arrays que usa cell5.batch_view: sitio "a" a 12 min y sitio "b" a 30 min.
+    Se deja en data.shared['instance'] y se restaura al terminar el test.
+    """
+    instance = {
+        "site_ids": ["a", "b"],
+        "site_index": {"a": 0, "b": 1},
+        "tw_start": np.array([480, 720], dtype=np.int64),
+        "tw_end": np.array([540, 780], dtype=np.int64),
+        "travel": np.array([12, 30], dtype=np.int64),
+        "dist": np.array([10.0, 30.0]),
+        "setting": np.array([90, 90], dtype=np.int64),
+    }
+    monkeypatch.setitem(data.shared, "instance", instance)
+    return instance
+
+
+@pytest.fixture
+def params():
+    return {"T1": 420, "T2": 1020, "delta_min": 10, "wash_time": 10, "unload_time": 30}
@@ -0,0 +1,72 @@
+# test_cell6.py -- cell6.build_batches vectorizado contra el bucle por sitio original
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import cell6
+from bench_cell6 import order_book
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reference_batches(df_sites, df_trucks):
+    """Bucle por sitio de la versión original: camiones llenos + resto, fusión con el vecino y descarte."""
+    cap = float(df_trucks["capacity_m3"].max())
+    min_load = float(df_trucks["min_load_m3"].min())
+    rows = []
+    for site, demand in zip(df_sites["site_id"], pd.to_numeric(df_sites["demand_m3"], errors="coerce").fillna(0)):
+        rem = float(demand)
+        if rem <= 0:
+            continue
+        n_full = int(rem // cap)
+        chunks = [cap] * n_full
+        last = rem - n_full * cap
+        if last > 0 and last < min_load and chunks and chunks[-1] + last <= cap:
+            chunks[-1] += last
+            last = 0
+        if last > 0:
+            chunks.append(last)
+        rows += [[site, idx, round(float(vol), 6)] for idx, vol in enumerate(chunks, start=1)]
+
+    df = pd.DataFrame(rows, columns=["site_id", "idx", "volume"])
+    small = df[df["volume"] < min_load]
+    if not small.empty:
+        df = df.sort_values(["site_id", "idx"]).reset_index(drop=True)
+        pos = {(s, i): k for k, (s, i) in enumerate(zip(df["site_id"], df["idx"]))}
+        drop = []
+        for site, idx, vol in small.itertuples(index=False):
+            target = pos.get((site, idx - 1), pos.get((site, idx + 1)))
+            if target is not None:
+                df.at[target, "volume"] = float(df.at[target, "volume"]) + float(vol)
+                drop.append(pos[(site, idx)])
+        df = df.drop(index=drop)
+    df = df[df["volume"] <= cap]
+    df["batch_id"] = [f"{s}_b{i}" for s, i in zip(df["site_id"], df["idx"])]
+    return df[["site_id", "batch_id", "volume"]].reset_index(drop=True)
+
+
+def fleet(min_load):
+    df_trucks = pd.read_csv(os.path.join(ROOT, "trucks.csv"))
+    df_trucks["min_load_m3"] = min_load
+    return df_trucks
+
+
+@pytest.mark.parametrize("df_sites", [
+    pd.read_csv(os.path.join(ROOT, "construction_sites.csv")),
+    order_book(300, seed=1),
+    order_book(2000, seed=2),
+    # Sin vecino para fusionar, demanda nula y restos bajo la carga mínima
+    pd.DataFrame({"site_id": ["x1", "x2", "x3", "x4"], "demand_m3": [1, 7.5, 0, 14.5]}),
+], ids=["construction_sites", "order_book_300", "order_book_2000", "edge_cases"])
+@pytest.mark.parametrize("min_load", [0, 2, 3.5])
+def test_matches_per_site_loop(df_sites, min_load):
+    expected = reference_batches(df_sites.copy(), fleet(min_load))
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_batches, site_map = cell6.build_batches(df_sites.copy(), fleet(min_load))
+
+    pd.testing.assert_frame_equal(df_batches[["site_id", "batch_id", "volume"]].reset_index(drop=True),
+                                  expected, check_dtype=False)
+    assert set(site_map) == {str(s).strip() for s in df_sites["site_id"]}
@@ -0,0 +1,74 @@
+# test_cell8_gaps.py -- Índices de huecos libres de cell8 contra un modelo por celdas enteras
+import random
+
+import pytest
+
+from cell8 import free_gaps, latest_fit, new_pool, pool_earliest, pool_reserve, reserve
+
+
+def fits(busy, s, length):
+    return not any(c in busy for c in range(s, s + length))
+
+
+def random_jobs(rng, n):
+    jobs = []
+    for _ in range(n):
+        s = rng.randrange(0, 150)
+        jobs.append((s, s + rng.randrange(1, 25)))
+    return jobs
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_reserve_and_latest_fit_match_cells(seed):
+    rng = random.Random(seed)
+    gaps, busy = free_gaps(), set()
+    # Las reservas pueden solapar trabajos previos: reserve recorta lo que siga libre
+    for (s, e) in random_jobs(rng, 8):
+        reserve(gaps, s, e)
+        busy.update(range(s, e))
+
+    starts, ends = gaps
+    assert starts == sorted(starts) and all(a < b for a, b in zip(starts, ends))
+    assert all(e < s for e, s in zip(ends, starts[1:]))
+    for c in range(-5, 200):
+        inside = any(a <= c < b for a, b in zip(starts, ends))
+        assert inside == (c not in busy)
+
+    for _ in range(50):
+        lo = rng.randrange(-10, 180)
+        hi = lo + rng.randrange(0, 40)
+        length = rng.randrange(1, 30)
+        expected = next((s for s in range(hi, lo - 1, -1) if fits(busy, s, length)), None)
+        assert latest_fit(gaps, lo, hi, length) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_pool_earliest_matches_cells(seed):
+    rng = random.Random(seed)
+    members = [0, 1, 2]
+    pool = new_pool(members)
+    busy = {m: set() for m in members}
+    # Trabajos colocados como en construct: en el recurso e inicio que devuelve pool_earliest
+    for _ in range(10):
+        lo = rng.randrange(0, 150)
+        length = rng.randrange(1, 25)
+        found = pool_earliest(pool, lo, lo + 30, length)
+        if found is None:
+            continue
+        s, m, _ = found
+        pool_reserve(pool, m, s, s + length)
+        busy[m].update(range(s, s + length))
+
+    for _ in range(50):
+        lo = rng.randrange(-10, 180)
+        hi = lo + rng.randrange(0, 40)
+        length = rng.randrange(1, 30)
+        candidates = [s for s in range(lo, hi + 1) if any(fits(busy[m], s, length) for m in members)]
+        found = pool_earliest(pool, lo, hi, length)
+        if not candidates:
+            assert found is None
+            continue
+        s, m, new = found
+        assert s == candidates[0]
+        assert fits(busy[m], s, length)
+        assert new == (not busy[m])
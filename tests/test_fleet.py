@@ -0,0 +1,64 @@
+# test_fleet.py -- Coloreo de intervalos de cell7_fleet.assign_trucks
+import math
+
+from cell7_fleet import assign_trucks, truck_classes
+
+TRUCKS = [{"capacity_m3": 8, "min_load_m3": 2, "fixed_cost": 100, "var_cost_per_km": 1}] * 4
+
+
+def trip(batches, params, b, t):
+    """Intervalo [inicio, fin) del viaje, igual que Cap_Truck."""
+    delta = params["delta_min"]
+    travel = 12 if batches[b]["site_id"] == "a" else 30
+    return (t - math.ceil(params["wash_time"] / delta) * delta,
+            t + math.ceil((2 * travel + params["unload_time"]) / delta) * delta)
+
+
+def peak(intervals):
+    events = sorted([(s, 1) for s, _ in intervals] + [(e, -1) for _, e in intervals])
+    level = best = 0
+    for _, step in events:
+        level += step
+        best = max(best, level)
+    return best
+
+
+def test_no_overlap_and_peak_trucks(instance, params):
+    batches = [{"site_id": "a"}, {"site_id": "a"}, {"site_id": "b"}, {"site_id": "a"}, {"site_id": "b"}]
+    starts = [480, 490, 500, 560, 600]
+    classes = truck_classes(TRUCKS)
+    class_Y = {b: (b, 0, t) for b, t in enumerate(starts)}
+
+    chosen = assign_trucks(class_Y, classes, batches, params)
+
+    assert set(chosen) == set(class_Y)
+    assert all(chosen[b][0] == b and chosen[b][2] == starts[b] for b in chosen)
+    by_truck = {}
+    for b, (_, v, t) in chosen.items():
+        by_truck.setdefault(v, []).append(trip(batches, params, b, t))
+    for intervals in by_truck.values():
+        intervals.sort()
+        assert all(e <= s for (_, e), (s, _) in zip(intervals, intervals[1:]))
+    assert len(by_truck) == peak([trip(batches, params, b, t) for b, t in enumerate(starts)])
+
+
+def test_reuses_trucks_in_id_order(instance, params):
+    batches = [{"site_id": "a"}] * 3
+    # Viajes a "a" ocupan [t-10, t+60): el tercero empieza cuando termina el primero
+    class_Y = {0: (0, 0, 480), 1: (1, 0, 500), 2: (2, 0, 550)}
+
+    chosen = assign_trucks(class_Y, truck_classes(TRUCKS), batches, params)
+
+    assert [chosen[b][1] for b in range(3)] == [0, 1, 0]
+
+
+def test_warns_when_class_is_short(instance, params, capsys):
+    batches = [{"site_id": "b"}] * 3
+    class_Y = {b: (b, 0, 480) for b in range(3)}
+    classes = truck_classes(TRUCKS[:2])
+
+    chosen = assign_trucks(class_Y, classes, batches, params)
+
+    assert len(chosen) == 3
+    assert {v for _, v, _ in chosen.values()} == {0, 1}
+    assert "ADVERTENCIA" in capsys.readouterr().out
@@ -0,0 +1,113 @@
+# test_insert.py -- Inserción de pedidos nuevos en el modelo matricial en memoria (cell7_insert)
+import contextlib
+import io
+import json
+
+import pytest
+
+pytest.importorskip("highspy")
+
+import data
+import cell5
+import cell6
+import cell7_insert
+import cell7_matrix
+import cell8
+
+SITES = ("site_id,demand_m3,tw_start_h,tw_end_h,concrete_type,dist_km,travel_time_min\n"
+         "a,10,8:00,9:00,p1,10,12\n"
+         "b,5,9:00,10:00,p1,20,20\n"
+         "c,8,10:00,11:00,p1,15,18\n")
+TRUCKS = ("truck_id,capacity_m3,min_load_m3,fixed_cost,var_cost_per_km\n"
+          "v1,5,2,70,8\n"
+          "v2,5,2,70,8\n"
+          "v3,8,2,90,9\n")
+UNITS = "unit_id,process_time_min,capacity_m3\nu1,20,N/A\n"
+PARAMS = {"T1": 420, "T2": 900, "wash_time": 10, "unload_time": 30, "wait_before_departure": 0,
+          "setting_time": 90, "max_tardiness_allowed": 120, "alpha": 1.0, "beta": 1.0,
+          "model_builder": "matrix"}
+
+
+def order(site_id, demand, tw_start, tw_end):
+    return {"site_id": site_id, "demand_m3": demand, "tw_start_h": tw_start, "tw_end_h": tw_end,
+            "concrete_type": "p1", "dist_km": 12, "travel_time_min": 15}
+
+
+@pytest.fixture
+def solved(tmp_path, monkeypatch):
+    """Instancia chica resuelta con cell7_matrix en un data.shared propio (los logs quedan en tmp_path)."""
+    (tmp_path / "construction_sites.csv").write_text(SITES)
+    (tmp_path / "trucks.csv").write_text(TRUCKS)
+    (tmp_path / "units.csv").write_text(UNITS)
+    (tmp_path / "params.json").write_text(json.dumps(PARAMS))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data, "shared", {})
+    with contextlib.redirect_stdout(io.StringIO()):
+        cell5.run(str(tmp_path))
+        cell6.run()
+        cell7_matrix.run()
+        cell8.run()
+        cell7_matrix.solve(time_limit=20)
+    assert len(data.shared["chosen_Y"]) == len(data.shared["batches_list"])
+    return data.shared
+
+
+def insert(new_sites, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return cell7_insert.insert_orders(new_sites, **kwargs)
+
+
+def snapshot(shared):
+    model = shared["matrix_model"]
+    return {
+        "plan": (dict(shared["chosen_X"]), dict(shared["chosen_Y"])),
+        "shape": (model["highs"].getNumRow(), model["highs"].getNumCol()),
+        "index": {family: dict(keys) for family, keys in model["col_index"].items()},
+        "batches": len(shared["batches_list"]),
+        "demand": list(shared["instance"]["demand"]),
+        "sites": shared["df_sites"]["demand_m3"].tolist(),
+        "warm": (shared.get("warm_X"), shared.get("warm_Y")),
+    }
+
+
+def test_insert_plans_every_batch(solved):
+    b0 = len(solved["batches_list"])
+
+    assert insert([order("n", 7, "11:00", "12:00")], time_limit=20)
+
+    chosen_X, chosen_Y = solved["chosen_X"], solved["chosen_Y"]
+    assert len(solved["batches_list"]) > b0
+    assert set(chosen_X) == set(chosen_Y) == set(range(len(solved["batches_list"])))
+    # Un camión no sale dos veces en el mismo instante
+    departures = [(v, t) for (_, v, t) in chosen_Y.values()]
+    assert len(departures) == len(set(departures))
+
+
+def test_lost_demand_leaves_everything_unchanged(solved):
+    before = snapshot(solved)
+
+    # 9 m³ con max_cap: 8 + 1 se fusiona en un lote de 9 que cell6 descarta por no caber en ningún camión
+    assert not insert([order("a", 9, "8:00", "9:00")], time_limit=20)
+
+    assert snapshot(solved) == before
+
+
+def test_failed_solve_restores_model_and_plan(solved, monkeypatch):
+    before = snapshot(solved)
+    monkeypatch.setattr(cell7_matrix, "solve", lambda time_limit: data.shared.update(chosen_X={}, chosen_Y={}))
+
+    assert not insert([order("n", 7, "11:00", "12:00")], time_limit=20)
+
+    assert snapshot(solved) == before
+
+
+def test_dispatched_trips_stay_fixed(solved):
+    chosen_X, chosen_Y = dict(solved["chosen_X"]), dict(solved["chosen_Y"])
+    fix_before = sorted(key[2] for key in chosen_Y.values())[1] + 1
+    dispatched = [b for b, key in chosen_Y.items() if key[2] < fix_before]
+
+    assert insert([order("n", 7, "8:00", "9:00")], fix_before=fix_before, time_limit=20)
+
+    for b in dispatched:
+        assert solved["chosen_X"][b] == chosen_X[b]
+        assert solved["chosen_Y"][b] == chosen_Y[b]
@@ -0,0 +1,43 @@
+# test_occupancy.py -- Filas Cap_Unit / Cap_Truck violadas por una solución decodificada (cell7_matrix)
+from cell7_matrix import occupancy_violations
+
+UNITS = [{"process_time_min": 25}, {"process_time_min": 40}]
+BATCHES = [{"site_id": "a"}, {"site_id": "a"}, {"site_id": "b"}]
+
+
+def row_index(params, n_res=2):
+    """Una fila por (recurso, slot) en la grilla [T1, T2), numeradas por familia."""
+    slots = range(params["T1"], params["T2"], params["delta_min"])
+    index = {}
+    for family in ("Cap_Unit", "Cap_Truck"):
+        keys = [(r, s) for r in range(n_res) for s in slots]
+        index[family] = {key: (family, i) for i, key in enumerate(keys)}
+    return index
+
+
+def test_disjoint_jobs_have_no_violations(instance, params):
+    # Unidad 0: [480, 510) y [510, 540); camión 0: [470, 540) y [540, 610)
+    chosen_X = {0: (0, 0, 480), 1: (1, 0, 510)}
+    chosen_Y = {0: (0, 0, 480), 1: (1, 0, 550)}
+
+    assert occupancy_violations(chosen_X, chosen_Y, row_index(params), UNITS, BATCHES, params) == set()
+
+
+def test_unit_overlap_returns_rows_of_overlapping_job(instance, params):
+    rows_by = row_index(params)
+    chosen_X = {0: (0, 1, 480), 1: (1, 1, 500), 2: (2, 0, 500)}
+
+    rows = occupancy_violations(chosen_X, {}, rows_by, UNITS, BATCHES, params)
+
+    # Unidad 1 (40 min): [480, 520) y [500, 540) -> todos los slots del segundo trabajo
+    assert rows == {rows_by["Cap_Unit"][(1, s)] for s in range(500, 540, 10)}
+
+
+def test_truck_overlap_clips_slots_before_T1(instance, params):
+    rows_by = row_index(params)
+    # Camión 1: a "a" [410, 480) y a "b" [410, 510); el que solapa empieza antes de T1
+    chosen_Y = {0: (0, 1, 420), 2: (2, 1, 420)}
+
+    rows = occupancy_violations({}, chosen_Y, rows_by, UNITS, BATCHES, params)
+
+    assert rows == {rows_by["Cap_Truck"][(1, s)] for s in range(420, 510, 10)}
@@ -0,0 +1,98 @@
+# test_portfolio.py -- Lectura del archivo -solu de CBC en cell11_portfolio
+import numpy as np
+import pytest
+
+import data
+from cell11_portfolio import race, read_cbc_solution
+
+
+def solution_file(tmp_path, text):
+    path = tmp_path / "member.sol"
+    path.write_text(text)
+    return str(path)
+
+
+def test_optimal(tmp_path):
+    path = solution_file(tmp_path, "Optimal - objective value 17401.00000000\n"
+                                   "      0 c0                      1                       0\n"
+                                   "      2 c2                    3.5                      12\n")
+
+    status, proven, objective, col_value = read_cbc_solution(path, 4)
+
+    assert (status, proven, objective) == ("Optimal", True, 17401.0)
+    assert list(col_value) == [1.0, 0.0, 3.5, 0.0]
+
+
+def test_stopped_on_time_is_not_proven(tmp_path):
+    # CBC marca con ** los valores no enteros o fuera de cota
+    path = solution_file(tmp_path, "Stopped on time - objective value 18020.50000000\n"
+                                   "      1 c1                      1                       0\n"
+                                   "**    3 c3                    0.5                       0\n")
+
+    status, proven, objective, col_value = read_cbc_solution(path, 4)
+
+    assert (status, proven, objective) == ("Stopped on time", False, 18020.5)
+    assert list(col_value) == [0.0, 1.0, 0.0, 0.5]
+
+
+@pytest.mark.parametrize("header, proven", [
+    ("Infeasible - objective value 0.00000000", False),
+    ("Stopped on time - objective value 1e+50", False),
+    ("Stopped on time (no integer solution - continuous used) - objective value 13367.33333333", False),
+])
+def test_without_incumbent(tmp_path, header, proven):
+    path = solution_file(tmp_path, header + "\n      0 c0                      1                       0\n")
+
+    status, got_proven, objective, col_value = read_cbc_solution(path, 1)
+
+    assert got_proven == proven
+    assert objective is None and col_value is None
+
+
+def test_missing_file(tmp_path):
+    assert read_cbc_solution(str(tmp_path / "missing.sol"), 3) is None
+
+
+def test_header_without_objective(tmp_path):
+    # Sin "objective value" no hay incumbente que leer
+    path = solution_file(tmp_path, "Stopped on time\n")
+
+    assert read_cbc_solution(path, 2) == ("Stopped on time", False, None, None)
+
+
+def binary_model(rhs):
+    """x0 + x1 >= rhs con x binarias, mínimo x0 + 2 x1: rhs = 3 es infactible."""
+    highspy = pytest.importorskip("highspy")
+    h = highspy.Highs()
+    h.silent()
+    h.addVars(2, np.zeros(2), np.ones(2))
+    h.changeColsCost(2, np.array([0, 1], dtype=np.int32), np.array([1.0, 2.0]))
+    h.changeColsIntegrality(2, np.array([0, 1], dtype=np.int32), np.array([highspy.HighsVarType.kInteger] * 2))
+    h.addRow(rhs, highspy.kHighsInf, 2, np.array([0, 1], dtype=np.int32), np.ones(2))
+    return h
+
+
+PORTFOLIO = {"solver_portfolio_configs": [{"name": "highs_s0", "solver": "highs"}, {"name": "cbc", "solver": "cbc"}]}
+
+
+def test_race_infeasible_has_no_winner(tmp_path, monkeypatch, capsys):
+    # El log de CBC se escribe en el directorio actual
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(data.shared, "params", {})
+
+    report = race(binary_model(3.0), PORTFOLIO, 20)
+
+    assert report["infeasible"] and report["winner"] is None and not report["proven"]
+    assert report["objective"] is None and report["col_value"] is None
+    assert "infactible" in capsys.readouterr().out
+
+
+def test_race_proven_optimum_wins(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(data.shared, "params", {})
+
+    report = race(binary_model(1.0), PORTFOLIO, 20)
+
+    assert report["proven"] and not report["infeasible"]
+    assert report["objective"] == pytest.approx(1.0)
+    assert list(np.round(report["col_value"])) == [1.0, 0.0]
@@ -0,0 +1,40 @@
+# test_telemetry.py -- Filas de la tabla de progreso de HiGHS -> registros de cell11_telemetry
+import json
+
+import cell11_telemetry
+
+# Extracto del log de HiGHS (solver_highs.log): encabezados, filas con y sin letra de evento
+LOG = """\
+        Nodes      |    B&B Tree     |            Objective Bounds              |  Dynamic Constraints |       Work
+Src  Proc. InQueue |  Leaves   Expl. | BestBound       BestSol              Gap |   Cuts   InLp Confl. | LpIters     Time
+
+ J       0       0         0   0.00%   -inf            634030565          Large        0      0      0         0     1.8s
+         0       0         0   0.00%   13367.333333    634030565        100.00%        0      0      2      1556     2.3s
+ H       0       0         0   0.00%   13421.040407    17401            22.87%      1805    281      2     13362     8.3s
+        14       3         6  41.50%   13580.5         17401            21.96%      1902    295     11     20411    12.0s
+
+Solving report
+"""
+
+
+def test_parse_rows(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    state = cell11_telemetry.start({"telemetry_file": str(path)}, "test")
+
+    cell11_telemetry.parse_rows(LOG, state)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["event"] for r in records] == ["incumbent", "progress", "incumbent", "progress"]
+    assert [r["t"] for r in records] == [1.8, 2.3, 8.3, 12.0]
+    assert [r["nodes"] for r in records] == [0, 0, 0, 14]
+    assert [r["primal"] for r in records] == [634030565.0, 634030565.0, 17401.0, 17401.0]
+    # -inf y "Large" no son valores finitos: quedan en null
+    assert records[0]["dual"] is None and records[0]["gap"] is None
+    assert records[1]["gap"] == 1.0
+    assert records[3]["dual"] == 13580.5 and abs(records[3]["gap"] - 0.2196) < 1e-12
+    assert state["samples"] == 4 and state["first_incumbent_sec"] == 1.8
+    assert all(r["source"] == "test" and r["run_id"] == state["run_id"] for r in records)
+
+
+def test_start_without_outputs():
+    assert cell11_telemetry.start({}, "test") is None
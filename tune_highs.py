@@ -0,0 +1,181 @@
+# tune_highs.py -- Ajuste de opciones de HiGHS sobre un corpus de instancias; escribe un perfil para cell11
+# Uso: python tune_highs.py carpeta_instancias [--budget-sec 3600] [--run-sec 120] [--target-gap 0.01]
+#                           [--threads N] [--profile tuned] [--seed 0] [--out tuning_results.csv]
+# Cada subcarpeta de carpeta_instancias es una instancia: construction_sites.csv (o .parquet / .arrow),
+# trucks.csv, units.csv y params.json. El perfil queda en solver_profiles/<profile>.json y se usa con
+# "solver_profile": "<profile>" en params.json. Los hilos del tuning (por defecto los de producción,
+# cell7_matrix.DEFAULT_THREADS) quedan como metadato y no entran en las opciones del perfil.
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import contextlib
+import numpy as np
+import pandas as pd
+
+import data
+import cell5
+import cell6
+import cell7_matrix
+import cell8
+from cell11_lns import lp_arrays, highs_from_arrays
+
+# Espacio de búsqueda: opciones de HiGHS que cell11 deja en su valor por defecto
+SEARCH_SPACE = {
+    "presolve": ["on", "off"],
+    "mip_heuristic_effort": [0.05, 0.15, 0.3, 0.6],
+    "mip_detect_symmetry": [True, False],
+    "mip_allow_restart": [True, False],
+    "mip_heuristic_run_feasibility_jump": [True, False],
+    "mip_lp_age_limit": [10, 20],
+}
+
+
+def load_instance(folder):
+    """Pipeline hasta el warm start de cell8 sobre el modelo matricial. Devuelve (arrays, warm start) o None."""
+    data.shared.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cell5.run(folder)
+        if 'params' not in data.shared:
+            return None
+        data.shared['params']["model_builder"] = "matrix"
+        cell6.run()
+        cell7_matrix.run()
+        cell8.run()
+    model = data.shared['matrix_model']
+    return lp_arrays(model["highs"]), cell7_matrix.warm_start_columns(model)
+
+
+def configurations(seed):
+    """Configuración por defecto primero y después el resto de la grilla en orden aleatorio."""
+    keys = list(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    rng = random.Random(seed)
+    rng.shuffle(grid)
+    return [{}] + [config for config in grid if config]
+
+
+def run_config(arrays, start, options, run_sec, target_gap, threads):
+    """Un solve: segundos hasta gap <= target_gap (None si no llega), gap y objetivo finales."""
+    import highspy
+
+    h = highs_from_arrays(arrays)
+    h.setOptionValue("threads", threads)
+    for key, value in options.items():
+        h.setOptionValue(key, value)
+    h.setOptionValue("time_limit", float(run_sec))
+    if start is not None:
+        h.setSolution(len(start[0]), *start)
+    reached = {"sec": None}
+
+    def on_interrupt(e):
+        if reached["sec"] is None and e.data_out.mip_gap <= target_gap:
+            reached["sec"] = round(e.data_out.running_time, 2)
+
+    h.cbMipInterrupt.subscribe(on_interrupt)
+    begin = time.time()
+    h.run()
+    seconds = time.time() - begin
+    status = h.getModelStatus()
+    if reached["sec"] is None and status == highspy.HighsModelStatus.kOptimal:
+        reached["sec"] = round(seconds, 2)   # óptimo entre dos callbacks
+    feasible = h.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible
+    return {
+        "status": h.modelStatusToString(status),
+        "time_to_target_sec": reached["sec"],
+        "final_gap": h.getInfo().mip_gap if feasible else None,
+        "objective": h.getInfo().objective_function_value if feasible else None,
+        "seconds": round(seconds, 2),
+    }
+
+
+def score(rows, run_sec):
+    """PAR2 (las corridas que no llegan al gap objetivo cuentan 2 x run_sec) y gap final medio (sin solución = 1)."""
+    par2 = np.mean([r["time_to_target_sec"] if r["time_to_target_sec"] is not None else 2 * run_sec for r in rows])
+    gap = np.mean([min(r["final_gap"], 1.0) if r["final_gap"] is not None else 1.0 for r in rows])
+    return float(par2), float(gap)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajuste de opciones de HiGHS sobre un corpus de instancias")
+    parser.add_argument("instances")
+    parser.add_argument("--budget-sec", type=float, default=3600)
+    parser.add_argument("--run-sec", type=float, default=120)
+    parser.add_argument("--target-gap", type=float, default=0.01)
+    parser.add_argument("--threads", type=int, default=cell7_matrix.DEFAULT_THREADS)
+    parser.add_argument("--profile", default="tuned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="tuning_results.csv")
+    args = parser.parse_args(argv)
+    start_time = time.time()
+
+    # 1. Instancias: el modelo y el warm start se arman una vez; cada corrida parte de un Highs nuevo
+    corpus = {}
+    for name in sorted(os.listdir(args.instances)):
+        folder = os.path.join(args.instances, name)
+        if os.path.isdir(folder):
+            instance = load_instance(folder)
+            if instance is None:
+                print(f"ADVERTENCIA: {folder} no tiene los CSV o params.json; se omite.")
+            else:
+                corpus[name] = instance
+    if not corpus:
+        print(f"Error: ninguna instancia en {args.instances}")
+        return
+    print(f"{len(corpus)} instancias, gap objetivo {args.target_gap:.2%}, {args.run_sec:.0f} s por corrida, "
+          f"presupuesto {args.budget_sec:.0f} s.")
+
+    # 2. Búsqueda: se prueban configuraciones mientras alcance el presupuesto para correrlas en todo el corpus.
+    # Una configuración se abandona en cuanto su PAR2 parcial ya supera el total de la mejor
+    results, scores = [], []
+    best_total = np.inf
+    for k, options in enumerate(configurations(args.seed)):
+        if k and time.time() - start_time + len(corpus) * args.run_sec > args.budget_sec:
+            break
+        rows, total = [], 0.0
+        for name, (arrays, start) in corpus.items():
+            row = run_config(arrays, start, options, args.run_sec, args.target_gap, args.threads)
+            rows.append(row)
+            results.append({"config": k, "instance": name, **row, "options": json.dumps(options)})
+            total += row["time_to_target_sec"] if row["time_to_target_sec"] is not None else 2 * args.run_sec
+            if total > best_total:
+                break
+        if len(rows) < len(corpus):
+            print(f"  Config {k}: descartada tras {len(rows)} instancias {options}")
+            continue
+        par2, gap = score(rows, args.run_sec)
+        best_total = min(best_total, total)
+        scores.append((par2, gap, k, options))
+        print(f"  Config {k}: PAR2 {par2:.1f} s, gap final medio {gap:.2%} {options or '(por defecto)'}")
+
+    # 3. Resultados por corrida y perfil recomendado (mejor PAR2, desempate por gap final)
+    pd.DataFrame(results).to_csv(args.out, index=False)
+    par2, gap, k, options = min(scores, key=lambda s: (s[0], s[1], s[2]))
+    baseline = next(s for s in scores if s[2] == 0)
+    profile = {
+        "name": args.profile,
+        "options": options,
+        "tuning_threads": args.threads,
+        "target_gap": args.target_gap,
+        "run_sec": args.run_sec,
+        "instances": list(corpus),
+        "par2_sec": round(par2, 2),
+        "mean_final_gap": gap,
+        "default_par2_sec": round(baseline[0], 2),
+        "configs_tried": len({r["config"] for r in results}),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    os.makedirs(cell7_matrix.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(cell7_matrix.PROFILE_DIR, f"{args.profile}.json")
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"Perfil recomendado (config {k}): PAR2 {par2:.1f} s frente a {baseline[0]:.1f} s por defecto -> {path}")
+    print(f"Corridas en {args.out}; usar con \"solver_profile\": \"{args.profile}\" en params.json.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])